@@ -0,0 +1,129 @@
+from typing import NamedTuple, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from constants import ACTION
+
+if TYPE_CHECKING:
+    from game import Game
+    from player import Mask
+    from topology import BoardTopology
+
+
+class Action(NamedTuple):
+    """
+    One move in the game, as taken by Game.apply_action(). What target and extra mean depends on the type:
+        - ROLL: target is the dice total, or -1 to have the game roll the dice
+        - BUILD_ROAD: target is an edge id
+        - BUILD_SETTLEMENT, BUILD_CITY: target is a vertex id
+        - MOVE_ROBBER: target is a tile id, extra is the player to steal from (-1 if nobody)
+        - EXCHANGE: target is the resource given to the bank, extra is the resource received
+        - END_TURN: no target
+    """
+    type: ACTION
+    player_id: int
+    target: int = -1
+    extra: int = -1
+
+
+class ActionSpace:
+    """
+    Numbers every action a player can take in games on one board topology, so that policies can pick actions by index
+    from a fixed-length vector. The indices are laid out as:
+        - ROLL, END_TURN
+        - BUILD_ROAD for every edge
+        - BUILD_SETTLEMENT for every vertex
+        - BUILD_CITY for every vertex
+        - MOVE_ROBBER for every tile and every player to steal from, then every tile with nobody to steal from
+        - EXCHANGE for every (given, received) pair of resources
+    Dice totals are never part of an index; ROLL always rolls the dice.
+    """
+
+    def __init__(self, topology: 'BoardTopology', num_players: int):
+        self.num_players = num_players
+        num_tiles, num_vertices, num_edges = topology.num_tiles, topology.num_vertices, topology.num_edges
+        self.road = 2
+        self.settlement = self.road + num_edges
+        self.city = self.settlement + num_vertices
+        self.robber = self.city + num_vertices
+        self.exchange = self.robber + num_tiles * (num_players + 1)
+        self.size = self.exchange + 25
+        # index -> (type, target, extra)
+        self.types = np.empty(self.size, dtype=np.int64)
+        self.targets = np.full(self.size, -1, dtype=np.int64)
+        self.extras = np.full(self.size, -1, dtype=np.int64)
+        self.types[:2] = ACTION.ROLL, ACTION.END_TURN
+        for kind, start, count in ((ACTION.BUILD_ROAD, self.road, num_edges),
+                                   (ACTION.BUILD_SETTLEMENT, self.settlement, num_vertices),
+                                   (ACTION.BUILD_CITY, self.city, num_vertices)):
+            self.types[start:start + count] = kind
+            self.targets[start:start + count] = np.arange(count)
+        robber = slice(self.robber, self.exchange)
+        self.types[robber] = ACTION.MOVE_ROBBER
+        self.targets[robber] = np.arange(num_tiles * (num_players + 1)) % num_tiles
+        victims = np.arange(num_tiles * (num_players + 1)) // num_tiles
+        self.extras[robber] = np.where(victims == num_players, -1, victims)
+        self.types[self.exchange:] = ACTION.EXCHANGE
+        self.targets[self.exchange:] = np.arange(25) // 5
+        self.extras[self.exchange:] = np.arange(25) % 5
+
+    def encode(self, action: Action) -> int:
+        kind, _, target, extra = action
+        if kind == ACTION.ROLL:
+            return 0
+        if kind == ACTION.END_TURN:
+            return 1
+        if kind == ACTION.BUILD_ROAD:
+            return self.road + target
+        if kind == ACTION.BUILD_SETTLEMENT:
+            return self.settlement + target
+        if kind == ACTION.BUILD_CITY:
+            return self.city + target
+        num_tiles = (self.exchange - self.robber) // (self.num_players + 1)
+        if kind == ACTION.MOVE_ROBBER:
+            return self.robber + (self.num_players if extra == -1 else extra) * num_tiles + target
+        return self.exchange + 5 * target + extra
+
+    def decode(self, index: int, player_id: int) -> Action:
+        return Action(ACTION(self.types[index]), player_id, int(self.targets[index]), int(self.extras[index]))
+
+    def mask(self, game: 'Game', mask: 'Mask', out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Marks the indices of every legal action of the player whose turn it is (the same actions as
+        Game.legal_actions()), using the component masks of that player's Mask.
+        :param game: Game to mask actions of
+        :param mask: Mask of the player whose turn it is
+        :param out: Array of length size to write the mask into; a new one is made if not given
+        """
+        if out is None:
+            out = np.zeros(self.size, dtype=bool)
+        else:
+            out[:] = False
+        if game.winner != -1:
+            return out
+        player = mask.player
+        if game.is_game_start:
+            if game.setup_settlement == -1:
+                out[self.settlement:self.city] = mask.settlement_mask()
+            else:
+                out[self.road:self.settlement] = mask.road_mask()
+        elif not game.dice_rolled_this_turn:
+            out[0] = True
+        elif game.seven_rolled_this_turn and not game.robber_moved_this_turn:
+            tiles = mask.robber_mask()
+            victims = mask.robber_victim_mask() & tiles[:, None]
+            robber = out[self.robber:self.exchange].reshape(self.num_players + 1, -1)
+            robber[:self.num_players] = victims.T
+            robber[self.num_players] = tiles & ~victims.any(axis=1)
+        else:
+            out[1] = True
+            if player.can_build_road():
+                out[self.road:self.settlement] = mask.road_mask()
+            if player.can_build_settlement():
+                out[self.settlement:self.city] = mask.settlement_mask()
+            if player.can_build_city():
+                out[self.city:self.robber] = mask.city_mask()
+            exchange = mask.exchange_mask()[:, None] & mask.in_bank_mask()[None, :]
+            np.fill_diagonal(exchange, False)
+            out[self.exchange:] = exchange.ravel()
+        return out
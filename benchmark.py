@@ -0,0 +1,314 @@
+"""
+Performance benchmarks for the game engine.
+
+Usage: python benchmark.py imports [--repeats N]
+       python benchmark.py boards [--sizes N ...] [--repeats N]
+       python benchmark.py suite [--only NAME ...] [--output FILE] [--baseline FILE] [--tolerance T]
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# modules a headless worker loads
+CORE_MODULES = ('board', 'game', 'player', 'development_card', 'simulate')
+# modules that must only be loaded on first use, or by the GUI
+DEFERRED_MODULES = ('tkinter', 'turtle', 'PIL', 'networkx', 'game_window', 'sprite_cache')
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module: str) -> Dict:
+    """
+    Imports a module in a fresh interpreter, as a newly spawned worker would.
+    :return: Seconds taken by the import, and which of DEFERRED_MODULES it loaded
+    """
+    probe = _IMPORT_PROBE.format(module=module, deferred=DEFERRED_MODULES)
+    output = subprocess.run([sys.executable, '-c', probe], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def benchmark_imports(modules: Sequence[str] = CORE_MODULES, repeats: int = 5) -> Dict[str, Dict]:
+    """
+    Times the import of every module, repeats times each in fresh interpreters.
+    :return: Module -> best and median import time in seconds, and the deferred modules the import loaded
+    """
+    results = {}
+    for module in modules:
+        runs: List[Dict] = [time_import(module) for _ in range(repeats)]
+        seconds = [run['seconds'] for run in runs]
+        results[module] = {'best': min(seconds), 'median': statistics.median(seconds), 'loaded': runs[0]['loaded']}
+    return results
+
+
+# name -> setup function, which prepares a case and returns the function to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+BASELINE_FILE = 'benchmark_baseline.json'
+
+
+def benchmark(name: str):
+    """
+    Registers a setup function as the benchmark called name.
+    """
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _midgame(seed: int = 0, num_actions: int = 300):
+    """
+    A four player game after num_actions random actions, past setup with a few roads and settlements built.
+    """
+    from game import Game
+    from random_stream import RandomStream
+    game = Game(agents=(), seed=seed)
+    rng = RandomStream(seed)
+    for _ in range(num_actions):
+        game.apply_action(rng.choice(game.legal_actions()), record=False)
+    return game
+
+
+@benchmark('board_3')
+def _board_3():
+    from board import Board
+    Board(3)
+    return lambda: Board(3)
+
+
+@benchmark('board_4')
+def _board_4():
+    from board import Board
+    Board(4)
+    return lambda: Board(4)
+
+
+@benchmark('board_8')
+def _board_8():
+    from board import Board
+    Board(8)
+    return lambda: Board(8)
+
+
+@benchmark('board_30')
+def _board_30():
+    from board import Board
+    Board(30)
+    return lambda: Board(30)
+
+
+@benchmark('board_template_8')
+def _board_template_8():
+    from board import BoardTemplate
+    return lambda: BoardTemplate(8)
+
+
+@benchmark('board_template_30')
+def _board_template_30():
+    from board import BoardTemplate
+    return lambda: BoardTemplate(30)
+
+
+@benchmark('balanced_layout')
+def _balanced_layout():
+    from board import get_board_template
+    from board_generation import generate_balanced_layout
+    template = get_board_template(3)
+    rng = np.random.default_rng(0)
+    generate_balanced_layout(template, rng=rng)
+    return lambda: generate_balanced_layout(template, rng=rng)
+
+
+@benchmark('board_geometry_4')
+def _board_geometry_4():
+    from board import Board
+    from game_window import board_geometry
+    board = Board(4)
+    return lambda: board_geometry(board)
+
+
+@benchmark('check_longest_road_honeycomb')
+def _check_longest_road_honeycomb():
+    """
+    A player's 15 roads laid around three tiles that share a vertex: every vertex is a junction, which is the worst
+    case for the exhaustive trail search.
+    """
+    from board import Board
+    board = Board(3)
+    topology = board.topology
+    center = next(v for v, tiles in enumerate(topology.vertex_tiles)
+                  if len(tiles) == 3 and not any(topology.tile_water[t] for t in tiles))
+    roads = set()
+    for t in topology.vertex_tiles[center]:
+        vertices = set(topology.tile_vertices[t])
+        roads.update(e for e, (a, b) in enumerate(topology.edge_endpoints) if a in vertices and b in vertices)
+    for e in roads:
+        board.edge_list[e].player_road_id = 0
+        board.edge_owner[e] = 0
+    road = board.edge_list[min(roads)]
+    return lambda: board.check_longest_road(road, 0)
+
+
+@benchmark('road_spots')
+def _road_spots():
+    game = _midgame()
+    return lambda: game.get_available_road_spots(game.current_turn)
+
+
+@benchmark('settlement_spots')
+def _settlement_spots():
+    game = _midgame()
+    return lambda: game.get_available_settlement_spots(game.current_turn)
+
+
+@benchmark('roll')
+def _roll():
+    game = _midgame()
+    player = game.players[game.current_turn]
+    hands = game.hands.copy()
+
+    def roll():
+        # restore the hands, or production piles up over the calls and sevens discard ever larger hands
+        game.hands[:] = hands
+        return game.roll(player)
+    return roll
+
+
+@benchmark('action_type_mask')
+def _action_type_mask():
+    from player import Mask
+    game = _midgame()
+    mask = Mask(game.players[game.current_turn], game)
+
+    # masks are cached until the game changes, so time the computation itself
+    return mask._action_type_mask
+
+
+@benchmark('random_playout')
+def _random_playout():
+    from game import Game
+    from player import RandomAgent
+    seeds = iter(range(1 << 30))
+    return lambda: Game(agents=[RandomAgent] * 4, seed=next(seeds)).play()
+
+
+def benchmark_board_sizes(sizes: Sequence[int] = (3, 5, 10, 20, 30), repeats: int = 3) -> Dict[int, Dict]:
+    """
+    Times building a board template (the topology every board of a size shares) and a board from a cached template,
+    for boards of every size, to show how construction scales.
+    :return: Size -> number of tiles, and best seconds to build the template and the board
+    """
+    from board import Board, BoardTemplate
+    results = {}
+    for n in sizes:
+        template = min(timeit.repeat(lambda: BoardTemplate(n), number=1, repeat=repeats))
+        Board(n)
+        board = min(timeit.repeat(lambda: Board(n), number=1, repeat=repeats))
+        results[n] = {'tiles': BoardTemplate(n).num_tiles, 'template': template, 'board': board}
+    return results
+
+
+def run_benchmarks(names: Optional[Sequence[str]] = None, repeats: int = 5) -> Dict[str, Dict]:
+    """
+    Times every benchmark (or those named): each is called in a loop long enough to time reliably, repeats times.
+    :return: Benchmark -> best and median seconds per call, and the number of calls per repeat
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        timer = timeit.Timer(BENCHMARKS[name]())
+        number, _ = timer.autorange()
+        seconds = [total / number for total in timer.repeat(repeats, number)]
+        results[name] = {'best': min(seconds), 'median': statistics.median(seconds), 'number': number}
+    return results
+
+
+def environment() -> Dict[str, str]:
+    """
+    Where the benchmarks were run; timings from different environments are not comparable.
+    """
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.system()}
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float = 0.25) -> Dict[str, float]:
+    """
+    Compares the best time of every benchmark with a baseline.
+    :param tolerance: Slowdown allowed before a benchmark counts as a regression, e.g. 0.25 for 25%
+    :return: Benchmark -> ratio of its best time to the baseline's, for every benchmark slower than allowed
+    """
+    regressions = {}
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['best'] / baseline[name]['best']
+            if ratio > 1 + tolerance:
+                regressions[name] = ratio
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    imports_parser = subparsers.add_parser('imports', help='time the import of every core module')
+    imports_parser.add_argument('--repeats', type=int, default=5)
+    boards_parser = subparsers.add_parser('boards', help='time board construction over a range of sizes')
+    boards_parser.add_argument('--sizes', type=int, nargs='+', default=[3, 5, 10, 20, 30])
+    boards_parser.add_argument('--repeats', type=int, default=3)
+    suite_parser = subparsers.add_parser('suite', help='time the engine\'s hot paths')
+    suite_parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    suite_parser.add_argument('--repeats', type=int, default=5)
+    suite_parser.add_argument('--output', help='file to write the results to as JSON')
+    suite_parser.add_argument('--baseline', default=BASELINE_FILE, help='results to compare with')
+    suite_parser.add_argument('--tolerance', type=float, default=0.25, help='slowdown allowed, e.g. 0.25 for 25%%')
+    args = parser.parse_args()
+
+    if args.command == 'imports':
+        failed = False
+        for module, result in benchmark_imports(repeats=args.repeats).items():
+            print(f"{module:<20} best {1000 * result['best']:7.1f} ms   median {1000 * result['median']:7.1f} ms"
+                  + (f"   loaded {', '.join(result['loaded'])}" if result['loaded'] else ''))
+            failed |= bool(result['loaded'])
+        sys.exit(1 if failed else 0)
+
+    if args.command == 'boards':
+        for n, result in benchmark_board_sizes(args.sizes, args.repeats).items():
+            print(f"n={n:<4} {result['tiles']:6} tiles   template {1000 * result['template']:9.2f} ms   "
+                  f"board {1000 * result['board']:9.2f} ms   "
+                  f"{1e6 * (result['template'] + result['board']) / result['tiles']:6.1f} us/tile")
+        sys.exit(0)
+
+    if args.command == 'suite':
+        results = run_benchmarks(args.only, args.repeats)
+        try:
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            baseline = {'environment': environment(), 'results': {}}
+        if baseline['environment'] != environment():
+            print(f"Not comparing with {args.baseline}, which was recorded in another environment: "
+                  f"{baseline['environment']}", file=sys.stderr)
+            baseline = {}
+        else:
+            baseline = baseline['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, result in results.items():
+            line = f"{name:<30} best {1e6 * result['best']:12.2f} us   median {1e6 * result['median']:12.2f} us"
+            if name in baseline:
+                line += f"   {result['best'] / baseline[name]['best']:5.2f}x baseline"
+            print(line + ('   REGRESSION' if name in regressions else ''))
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump({'environment': environment(), 'results': results}, file, indent=2)
+                file.write('\n')
+        sys.exit(1 if regressions else 0)
@@ -1,19 +1,16 @@
-import heapq
-import itertools
-import math
-import random
-from collections import defaultdict, deque, Counter
-from random import shuffle, sample
+from collections import defaultdict
 from typing import List, TYPE_CHECKING, Tuple, Set, Dict, Iterable, Optional
-import networkx as nx
 
 import numpy as np
 
-import constants
-from custom_types import GraphEdge, TileCoords, EdgeCoords, TileGrid, TileData, GraphVertex
+from custom_types import GraphEdge, TileCoords, EdgeCoords, TileGrid, GraphVertex
+from board_generation import BoardLayout, generate_balanced_layout, generate_layouts
+from longest_road import connected_roads, longest_trail
 from port import Port
+from topology import BoardTopology
 
 if TYPE_CHECKING:
+    import networkx as nx
     import player
 
 from constants import RESOURCE
@@ -22,66 +19,6 @@ from tile import Tile
 from vertex import Vertex
 
 
-def generate_resources_and_chits(num_tiles: int) -> TileData:
-    """
-    Creates resource/chit pairs that will be assigned to board tiles.
-
-    :param num_tiles: Number of tiles to get resources/chits.
-    :return: List of (resource, chit_value) tuples.
-    """
-    chits = ([2] + (list(range(3, 7)) + list(range(8, 12))) * 2 + [12]) * ((num_tiles // 19) + 1)
-    shuffle(chits)
-    base_resources = [RESOURCE.BRICK, RESOURCE.GRAIN, RESOURCE.LUMBER, RESOURCE.ORE, RESOURCE.WOOL]
-    resources = base_resources * ((num_tiles // len(base_resources)) + 1)
-    shuffle(resources)
-    desert_tiles = set(sample(list(range(num_tiles)), max((num_tiles // 10), 1)))
-    tile_data = []
-    for idx in range(num_tiles):
-        tile_data.append((resources.pop(), chits.pop()) if idx not in desert_tiles else (RESOURCE.DESERT, -1))
-    return tile_data
-
-
-def generate_board(n: int) -> Tuple[TileGrid, TileCoords]:
-    """
-    Fill in board with generated tiles.
-
-    :param n: Number of rings around center tile.
-    :return: The game board, and a list of all tile axial coordinates.
-    """
-    assert n > 0
-    num_tiles = 1 + sum([6 * i for i in range(1, n + 1)])
-    tiles = [Tile() for i in range(num_tiles)]
-    tile_grid = [[None for j in range(2 * n + 1)] for i in range(2 * n + 1)]
-    tile_coords = set()
-    # fill in center row
-    for i in range(2 * n + 1):
-        temp = tiles.pop()
-        temp.coords = (i, n)
-        tile_grid[n][i] = temp
-        tile_coords.add((i, n, -i - n))
-    # fill in everything above and below center row
-    i = 1
-    j = n - 1
-    while j >= 0:
-        tiles_upper = []
-        tiles_lower = []
-        for k in range(i, 2 * n + 1):
-            temp = tiles.pop()
-            temp.coords = (k, j)
-            tiles_upper.append(temp)
-            tile_coords.add((k, j, -k - j))
-        tile_grid[j][i:] = tiles_upper
-        for k in range(2 * n - i + 1):
-            temp = tiles.pop()
-            temp.coords = (k, 2 * n - j)
-            tiles_lower.append(temp)
-            tile_coords.add((k, 2 * n - j, -k - 2 * n + j))
-        tile_grid[2 * n - j][:2 * n - i + 1] = tiles_lower
-        i += 1
-        j -= 1
-    return tile_grid, tile_coords
-
-
 def get_edge_coords_from_tile(tile: Tile) -> EdgeCoords:
     q, r = tile.coords
     return {(2 * q, 2 * r - 1),
@@ -92,135 +29,218 @@ def get_edge_coords_from_tile(tile: Tile) -> EdgeCoords:
             (2 * q - 1, 2 * r)}
 
 
-def get_shared_edge_coords(t1: Tile, t2: Tile) -> Tuple[int, int]:
-    res = get_edge_coords_from_tile(t1).intersection(get_edge_coords_from_tile(t2))
-    if len(res) != 1:
+def is_water_coords(q: int, r: int, n: int) -> bool:
+    """
+    True if the tile at axial coordinates (q, r) lies on the outer ring of a board with n rings, i.e. is a water tile.
+    """
+    return q == 0 or q == 2 * n or r == 0 or r == 2 * n or q + r == n or q + r == 3 * n
+
+
+def get_tile_from_grid(tiles: TileGrid, n: int, q: int, r: int) -> Optional[Tile]:
+    try:
+        return tiles[r][q - max(0, n - (2 * n + 1 - abs(n - r)))]
+    except IndexError:
         return None
-    return list(res)[0]
 
 
-class Board:
+# offsets from a tile to its six neighbors, in coordinate order
+NEIGHBOR_OFFSETS = ((-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0))
+# the same offsets in order around the tile, so that the neighbors on either side of one are its common neighbors with
+# the tile
+RING_OFFSETS = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+# offset -> the offsets before and after it around the tile, sorted so that the tiles they lead to are in coordinate
+# order
+FLANKING_OFFSETS = {d: tuple(sorted((RING_OFFSETS[i - 1], RING_OFFSETS[(i + 1) % 6])))
+                    for i, d in enumerate(RING_OFFSETS)}
+
+
+def tile_row_bounds(n: int, r: int) -> Tuple[int, int]:
+    """
+    First and last q of the tiles in row r of a board with n rings.
+    """
+    return max(0, n - r), min(2 * n, 3 * n - r)
+
+
+class BoardTemplate:
+    """
+    Everything about a board that only depends on its size: the tile layout, the vertex graph, the BoardTopology and
+    the walk around the shore that decides where ports go. Templates are immutable and shared by every Board of the
+    same size in the process; use get_board_template() rather than constructing them directly.
+
+    Tiles, vertices and edges are all derived from axial coordinates: the neighbors of (q, r) are found by adding
+    NEIGHBOR_OFFSETS, a vertex is a set of three mutually adjacent tiles, and the side shared by two tiles has edge
+    coordinates (q1 + q2, r1 + r2). Construction is linear in the number of tiles.
+    """
 
     def __init__(self, board_size: int):
-        # TODO: Cache boards for re-use
+        assert board_size > 0
+        n = board_size
         self.board_size = board_size
-        num_tiles = 1 + sum([6 * i for i in range(1, board_size + 1)])
-        self.tiles, self.tile_coords = generate_board(board_size)
-        # models adjacent vertices (i.e., edges)
-        self.vertex_graph = nx.Graph()
-        # models tile-vertex relations
-        self.tile_graph = nx.Graph()
-        # holds actual Vertex objects referred to by the graph
-        self.vertex_objects = {}
-        # only generate resources/chits for non-water tiles
-        tile_data = generate_resources_and_chits(num_tiles - 6 * board_size)
-        remaining_chits = [2, 3, 4, 5, 9, 10, 11, 12]
-        for coord in self.tile_coords:
-            tile = self.get_tile(coord[0], coord[1])
-            # if tile is on outer edge (i.e., water tile), don't give it resource/chit
-            if coord[0] == 0 or coord[0] == 2 * board_size or coord[1] == 0 or coord[1] == 2 * board_size or coord[0] + \
-                    coord[1] == board_size or coord[0] + coord[1] == 3 * board_size:
-                tile.resource = RESOURCE.WATER
-            else:
-                resource, chit_val = tile_data.pop()
-                if resource != RESOURCE.DESERT:
-                    # enforce rule that there are no 8-8, 6-6, or 8-6 connections
-                    neighbor_rolls = {x.dice_num for x in self.get_neighboring_tiles(tile)}
-                    if 6 in neighbor_rolls or 8 in neighbor_rolls:
-                        chit_val = remaining_chits[
-                            np.where(np.random.multinomial(1, constants.CHIT_DIST_MOD) == 1)[0][0]]
-                tile.resource = resource
-                tile.dice_num = chit_val
-            self.tile_graph.add_node(tile)
-        # create vertices and add them to the graph
-        tiles = []
-        for tile in self.get_tiles():
-            vertices = self.__link_tile_and_vertices(tile)
-            tiles.append((tile, vertices))
-        self.__add_port_objects()
-        # port objects (which are vertices) aren't actually initialized until __add_port_objects()
-        # this is why we have to delay setting a tile's vertices
-        for el in tiles:
-            tile, vertices = el
-            tile.vertices = {self.vertex_objects[v] for v in vertices}
-        # Note that edges have their own coordinate system while vertices are defined by their incident tiles
-        self.edges = [[Edge(i, j) for j in range(2 * num_tiles + 2)] for i in range(2 * num_tiles + 2)]
-        c = Counter([v.resource for v in self.vertex_objects.values() if isinstance(v, Port)])
-
-    def __link_tile_and_vertices(self, tile: Tile) -> Set[Vertex]:
+        self.num_tiles = 1 + 3 * n * (n + 1)
+        # tiles in the order of Board.get_tiles(): row by row, and by q within a row
+        tile_list = [(q, r) for r in range(2 * n + 1) for q in range(tile_row_bounds(n, r)[0],
+                                                                     tile_row_bounds(n, r)[1] + 1)]
+        self.tile_coords = frozenset((q, r, -q - r) for q, r in tile_list)
+        tile_ids = {coords: idx for idx, coords in enumerate(tile_list)}
+        water = [is_water_coords(q, r, n) for q, r in tile_list]
+        # graph vertex -> whether it touches water, and graph vertex -> {adjacent graph vertex: edge coords}
+        on_shore: Dict[GraphVertex, bool] = {}
+        adjacency: Dict[GraphVertex, Dict[GraphVertex, EdgeCoords]] = {}
+        tile_adjacency = []
+        for coords, tile_water in zip(tile_list, water):
+            self.__link_tile_and_vertices(coords, tile_water, tile_ids, water, on_shore, adjacency, tile_adjacency)
+        self._vertex_graph = None
+        vertex_ids = list(on_shore)
+        # every edge once, from the endpoint discovered first
+        seen = set()
+        graph_edges = []
+        for u in vertex_ids:
+            seen.add(u)
+            graph_edges += [(u, v, coords) for v, coords in adjacency[u].items() if v not in seen]
+        self.topology = BoardTopology(tile_list, water, vertex_ids, [on_shore[v] for v in vertex_ids],
+                                      [(u, v) for u, v, _ in graph_edges],
+                                      [coords for _, _, coords in graph_edges],
+                                      tile_adjacency)
+        # land tiles in the order they receive resource/chit pairs
+        self.land_tiles = tuple(idx for idx, tile_water in enumerate(water) if not tile_water)
+        land_positions = np.full(self.num_tiles, -1)
+        land_positions[list(self.land_tiles)] = np.arange(len(self.land_tiles))
+        pairs = np.array(tile_adjacency, dtype=np.int64).reshape(-1, 2)
+        pairs = land_positions[pairs]
+        pairs = pairs[(pairs >= 0).all(axis=1)]
+        self.land_adjacency = np.zeros((len(self.land_tiles), len(self.land_tiles)), dtype=bool)
+        self.land_adjacency[pairs[:, 0], pairs[:, 1]] = True
+        self.land_adjacency.flags.writeable = False
+        # every tile side, roads or not; sides that can hold a road come first, in topology order
+        sides = {(2 * q + dq, 2 * r + dr) for q, r in tile_list for dq, dr in RING_OFFSETS}
+        self.side_coords = tuple(self.topology.edge_coords) + tuple(sorted(sides - set(self.topology.edge_coords)))
+        # vertex id -> index of the port pair it belongs to
+        self.port_slots: Dict[int, int] = {}
+        self.num_port_pairs = 0
+        self.__trace_ports(on_shore, adjacency)
+        self._lower_land_adjacency = None
+        self._vertex_land_incidence = None
+        self._port_land_incidence = None
+
+    @property
+    def lower_land_adjacency(self) -> np.ndarray:
+        """
+        land_adjacency below the diagonal, as float32 for matrix products; made on first use.
         """
-        Invoked during board creation. A Tile has 6 vertices (we will ignore 2 or 3 of them if tile is water tile).
-        Each of these vertices is uniquely defined by 3 tiles (resource or otherwise).
-        Given a Tile, this method links vertices in the graph to their incident tiles and to adjacent vertices.
+        if self._lower_land_adjacency is None:
+            self._lower_land_adjacency = np.tril(self.land_adjacency, -1).astype(np.float32)
+            self._lower_land_adjacency.flags.writeable = False
+        return self._lower_land_adjacency
 
-        Side effects: new vertices added to graph, new vertex/port objects created, and adjacent vertices in graph linked.
+    @property
+    def vertex_land_incidence(self) -> np.ndarray:
         """
-        attrs = {}
-        vertices = set()
-        neighbors = self.get_neighboring_tiles(tile)
-        tile_shore = (tile.resource == RESOURCE.WATER)
-        for n1 in neighbors:
-            n1_shore = (n1.resource == RESOURCE.WATER)
-            n1_neighbors = self.get_neighboring_tiles(n1)
-            n2_neighbors = list(neighbors.intersection(n1_neighbors))
-            assert (len(n2_neighbors) == 2 or len(n2_neighbors) == 1)
-            # neighboring tiles share 2 common neighbors (if neither are corner water tiles)
-            # defines two vertices connected by an edge - add this connection to the graph
-            t1 = n2_neighbors[0]
-            t1_shore = (t1.resource == RESOURCE.WATER)
-            v1 = frozenset({tile.coords, n1.coords, t1.coords})
-            vertices.add(v1)
-            if v1 not in self.vertex_graph:
-                shore = (tile_shore or n1_shore or t1_shore)
-                self.vertex_graph.add_node(v1, on_shore=shore)
-                self.tile_graph.add_node(v1, on_shore=shore)
-                if not shore:
-                    self.vertex_objects[v1] = Vertex(v1)
-            self.tile_graph.add_edge(tile, v1)
-            if len(n2_neighbors) == 2:
-                t2 = n2_neighbors[1]
-                t2_shore = (t2.resource == RESOURCE.WATER)
-                v2 = frozenset({tile.coords, n1.coords, t2.coords})
-                vertices.add(v2)
-                if v2 not in self.vertex_graph:
-                    shore = (tile_shore or n1_shore or t2_shore)
-                    self.vertex_graph.add_node(v2, on_shore=shore)
-                    self.tile_graph.add_node(v2, on_shore=shore)
-                    if not shore:
-                        self.vertex_objects[v2] = Vertex(v2)
-                self.tile_graph.add_edge(tile, v2)
-                self.vertex_graph.add_edge(v1, v2)
-                shared_edge_coords = get_shared_edge_coords(tile, n1)
-                assert (shared_edge_coords is not None)
-                attrs[(v1, v2)] = {'obj': shared_edge_coords, 'visited': -1}
-        nx.set_edge_attributes(self.vertex_graph, attrs)
-        return vertices
+        Vertex x land tile matrix, 1 where the tile is incident to the vertex, as float32 for matrix products; made on
+        first use.
+        """
+        if self._vertex_land_incidence is None:
+            land_positions = {t: i for i, t in enumerate(self.land_tiles)}
+            incidence = np.zeros((self.topology.num_vertices, len(self.land_tiles)), dtype=np.float32)
+            for v, tiles in enumerate(self.topology.vertex_tiles):
+                for t in tiles:
+                    if t in land_positions:
+                        incidence[v, land_positions[t]] = 1
+            incidence.flags.writeable = False
+            self._vertex_land_incidence = incidence
+        return self._vertex_land_incidence
+
+    @property
+    def port_land_incidence(self) -> np.ndarray:
+        """
+        Port pair x land tile matrix, 1 where the tile touches either vertex of the pair, as float32 for matrix
+        products; made on first use.
+        """
+        if self._port_land_incidence is None:
+            incidence = np.zeros((self.num_port_pairs, len(self.land_tiles)), dtype=np.float32)
+            for v, pair in self.port_slots.items():
+                np.maximum(incidence[pair], self.vertex_land_incidence[v], out=incidence[pair])
+            incidence.flags.writeable = False
+            self._port_land_incidence = incidence
+        return self._port_land_incidence
+
+    @property
+    def vertex_graph(self) -> 'nx.Graph':
+        """
+        The topology as a frozen networkx graph of vertices (sets of incident tile coordinates), with an 'on_shore' flag
+        on every vertex and the edge coordinates as 'obj' on every edge. Only built on request, so that networkx is
+        not imported unless something needs it; boards only ever read the graph, so it is safe to share.
+        """
+        if self._vertex_graph is None:
+            import networkx as nx
+            topology = self.topology
+            graph = nx.Graph()
+            for vertex_id, shore in zip(topology.vertex_ids, topology.vertex_on_shore.tolist()):
+                graph.add_node(vertex_id, on_shore=shore)
+            for (u, v), coords in zip(topology.edge_vertices.tolist(), topology.edge_coords):
+                graph.add_edge(topology.vertex_ids[u], topology.vertex_ids[v], obj=coords)
+            self._vertex_graph = nx.freeze(graph)
+        return self._vertex_graph
+
+    @staticmethod
+    def __link_tile_and_vertices(coords: Tuple[int, int], tile_water: bool, tile_ids: Dict[Tuple[int, int], int],
+                                 water: List[bool], on_shore: Dict[GraphVertex, bool],
+                                 adjacency: Dict[GraphVertex, Dict[GraphVertex, EdgeCoords]],
+                                 tile_adjacency: List[Tuple[int, int]]):
+        """
+        A tile has 6 vertices (we will ignore 2 or 3 of them if tile is water tile). Each of these vertices is uniquely
+        defined by 3 tiles (resource or otherwise). Given a tile, this method links vertices in the graph to their
+        incident tiles and to adjacent vertices.
 
-    def __add_port_objects(self):
+        Side effects: new vertices added to on_shore and adjacency, adjacent vertices linked in adjacency, and the
+        tile's (tile, neighbor) pairs appended to tile_adjacency.
         """
-        The job of this routine is to initialize ports intermittently around the edge of the map. Drawing from the
-        original game, ports always come in pairs of two (i.e., two adjacent port vertices with same trading resource)
-        and no two "port pairs" are directly adjacent.
+        q, r = coords
+        t = tile_ids[coords]
+        # neighbors are visited in coordinate order, so that vertices and edges get the same ids in every process
+        for dq, dr in NEIGHBOR_OFFSETS:
+            n1 = (q + dq, r + dr)
+            n1_id = tile_ids.get(n1)
+            if n1_id is None:
+                continue
+            tile_adjacency.append((t, n1_id))
+            # the common neighbors of two neighboring tiles flank the side they share
+            common = [c for c in ((q + a, r + b) for a, b in FLANKING_OFFSETS[dq, dr]) if c in tile_ids]
+            assert (len(common) == 2 or len(common) == 1)
+            shore = tile_water or water[n1_id]
+            vertices = []
+            for t2 in common:
+                v = frozenset((coords, n1, t2))
+                if v not in on_shore:
+                    on_shore[v] = shore or water[tile_ids[t2]]
+                    adjacency[v] = {}
+                vertices.append(v)
+            if len(vertices) == 2:
+                v1, v2 = vertices
+                shared_edge_coords = (2 * q + dq, 2 * r + dr)
+                adjacency[v1][v2] = shared_edge_coords
+                adjacency[v2][v1] = shared_edge_coords
+
+    def __trace_ports(self, on_shore: Dict[GraphVertex, bool],
+                      adjacency: Dict[GraphVertex, Dict[GraphVertex, EdgeCoords]]):
         """
-        shore_vertices = [x for x, y in self.vertex_graph.nodes(data=True) if y['on_shore']]
+        Walks around the shore to decide which vertices are ports. Drawing from the original game, ports always come in
+        pairs of two (i.e., two adjacent port vertices with same trading resource) and no two "port pairs" are directly
+        adjacent. Only the positions are fixed here; each Board draws the port resources itself.
+        """
+        shore_vertices = [x for x, shore in on_shore.items() if shore]
+        vertex_index = self.topology.vertex_index
         visited = {x: False for x in shore_vertices}
-        num_ports = 3 * self.board_size
-        port_resources = [RESOURCE.GRAIN, RESOURCE.ORE, RESOURCE.WOOL, RESOURCE.LUMBER, RESOURCE.BRICK,
-                          RESOURCE.ANY] * (math.ceil(num_ports / 6) + 1)
-        shuffle(port_resources)
         # begin initializing the first port
-        curr_resource = port_resources.pop()
         curr = shore_vertices[0]
-        curr_neighbors = [x for x in self.vertex_graph.neighbors(curr) if self.vertex_graph.nodes[x]['on_shore']]
+        curr_neighbors = [x for x in adjacency[curr] if on_shore[x]]
         assert (len(curr_neighbors) == 2)
-        self.vertex_objects[curr] = Port(curr, curr_resource)
-        self.vertex_objects[curr_neighbors[0]] = Port(curr_neighbors[0], curr_resource)
+        self.port_slots[vertex_index[curr]] = self.num_port_pairs
+        self.port_slots[vertex_index[curr_neighbors[0]]] = self.num_port_pairs
         visited[curr] = True
         visited[curr_neighbors[0]] = True
-        self.vertex_objects[curr_neighbors[1]] = Vertex(curr_neighbors[1])
         visited[curr_neighbors[1]] = True
-        curr = [x for x in self.vertex_graph.neighbors(curr_neighbors[1]) if
-                self.vertex_graph.nodes[x]['on_shore'] and not visited[x]]
+        curr = [x for x in adjacency[curr_neighbors[1]] if
+                on_shore[x] and not visited[x]]
         assert (len(curr) == 1)
         curr = curr[0]
         # at this point, there is one "port" pair
@@ -228,129 +248,225 @@ class Board:
         while True:
             visited[curr] = True
             if i == 0:
-                curr_resource = port_resources.pop()
-                self.vertex_objects[curr] = Port(curr, curr_resource)
+                self.num_port_pairs += 1
+                self.port_slots[vertex_index[curr]] = self.num_port_pairs
                 i += 1
             elif i == 1:
-                self.vertex_objects[curr] = Port(curr, curr_resource)
+                self.port_slots[vertex_index[curr]] = self.num_port_pairs
                 i += 1
             else:
-                self.vertex_objects[curr] = Vertex(curr)
                 i = 0
-            neighbors = [x for x in self.vertex_graph.neighbors(curr) if
-                         self.vertex_graph.nodes[x]['on_shore'] and not visited[x]]
+            neighbors = [x for x in adjacency[curr] if
+                         on_shore[x] and not visited[x]]
             assert (len(neighbors) <= 1)
             if len(neighbors) == 0:
                 break
             curr = neighbors[0]
+        self.num_port_pairs += 1
 
-    def check_longest_road(self, starting_road: Edge, curr_longest: int) -> bool:
+
+# process-wide cache of board templates, keyed by board size
+_board_templates: Dict[int, BoardTemplate] = {}
+
+
+def get_board_template(board_size: int) -> BoardTemplate:
+    """
+    Returns the shared template for boards of the given size, building it on first use.
+    """
+    template = _board_templates.get(board_size)
+    if template is None:
+        template = _board_templates[board_size] = BoardTemplate(board_size)
+    return template
+
+
+def generate_boards(board_size: int, num_boards: int, rng: Optional[np.random.Generator] = None) -> List['Board']:
+    """
+    Creates many boards of one size, drawing all of their layouts in a single batch.
+    """
+    layouts = generate_layouts(get_board_template(board_size), num_boards, rng)
+    return [Board(board_size, layouts.select(i)) for i in range(num_boards)]
+
+
+class Board:
+
+    def __init__(self, board_size: int, layout: Optional[BoardLayout] = None,
+                 rng: Optional[np.random.Generator] = None, balanced: bool = False):
+        """
+        :param board_size: Number of rings around the center tile, including the ring of water tiles.
+        :param layout: Resources, chits and ports to use, e.g. one of a batch from generate_layouts(). A random layout
+        is generated if none is given.
+        :param rng: Source of randomness for generating the layout
+        :param balanced: True to generate the fairest of many random layouts (see generate_balanced_layout()) rather
+        than the first
+        """
+        self.board_size = board_size
+        template = get_board_template(board_size)
+        self.template = template
+        self.topology = template.topology
+        self.tile_coords = template.tile_coords
+        self._tile_graph = None
+        if layout is None and balanced:
+            layout = generate_balanced_layout(template, rng=rng)
+        elif layout is None:
+            layout = generate_layouts(template, 1, rng).select(0)
+        self.tiles: TileGrid = [[None] * (2 * board_size + 1) for _ in range(2 * board_size + 1)]
+        self.tile_list = []
+        for idx, (q, r) in enumerate(self.topology.tile_coords):
+            tile = Tile()
+            tile.coords = (q, r)
+            tile.index = idx
+            tile.resource = RESOURCE.WATER
+            self.tiles[r][q] = tile
+            self.tile_list.append(tile)
+        # only land tiles get resources/chits
+        for idx, resource, chit_val in zip(template.land_tiles, layout.resources.tolist(), layout.chits.tolist()):
+            tile = self.tile_list[idx]
+            tile.resource = RESOURCE(resource)
+            tile.dice_num = chit_val
+        # holds actual Vertex objects referred to by the graph
+        self.vertex_list = self.__create_vertices(layout)
+        self.vertex_objects = dict(zip(self.topology.vertex_ids, self.vertex_list))
+        for tile, vertices in zip(self.tile_list, self.topology.tile_vertices):
+            tile.vertices = {self.vertex_list[v] for v in vertices}
+        # vertex -> ((tile, chit, resource), ...) for every tile around the vertex that produces resources
+        self.vertex_production: List[Tuple[Tuple[int, int, int], ...]] = []
+        # chit -> [(vertex, tile, resource), ...] for every vertex that collects when that chit is rolled
+        self.production_index: Dict[int, List[Tuple[int, int, int]]] = defaultdict(list)
+        chits = [tile.dice_num for tile in self.tile_list]
+        resources = [int(tile.resource) for tile in self.tile_list]
+        for v, tiles in enumerate(self.topology.vertex_tiles):
+            producing = tuple((t, chits[t], resources[t]) for t in tiles if chits[t] != -1)
+            self.vertex_production.append(producing)
+            for t, chit, resource in producing:
+                self.production_index[chit].append((v, t, resource))
+        # Note that edges have their own coordinate system while vertices are defined by their incident tiles.
+        # Only coordinates that are actually the side of some tile hold an Edge.
+        self.edges: Dict[Tuple[int, int], Edge] = {(x, y): Edge(x, y) for x, y in template.side_coords}
+        self.edge_list = [self.edges[c] for c in self.topology.edge_coords]
+        for idx, edge in enumerate(self.edge_list):
+            edge.index = idx
+        # the layout as arrays indexed by topology ids; -1 for no chit or no port
+        self.tile_resource = np.array([tile.resource for tile in self.tile_list], dtype=np.int8)
+        self.tile_chit = np.array([tile.dice_num for tile in self.tile_list], dtype=np.int8)
+        self.vertex_port = np.array([vertex.resource if isinstance(vertex, Port) else -1
+                                     for vertex in self.vertex_list], dtype=np.int8)
+        # ownership mirrored into arrays (indexed by topology ids) for vectorized queries; Game keeps them in sync
+        self.vertex_owner = np.full(self.topology.num_vertices, -1, dtype=np.int8)
+        self.vertex_city = np.zeros(self.topology.num_vertices, dtype=bool)
+        self.edge_owner = np.full(self.topology.num_edges, -1, dtype=np.int8)
+
+    def clone(self) -> 'Board':
+        """
+        Copies the board. Only the mutable parts (tiles, vertices, roads and the ownership arrays) are copied; the
+        template, topology, vertex graph and production tables are shared with the original.
+        """
+        board = Board.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        board._tile_graph = None
+        board.tile_list = [tile.copy() for tile in self.tile_list]
+        board.tiles = [[None for _ in row] for row in self.tiles]
+        for tile in board.tile_list:
+            board.tiles[tile.r][tile.q] = tile
+        board.vertex_list = [vertex.copy() for vertex in self.vertex_list]
+        board.vertex_objects = dict(zip(self.topology.vertex_ids, board.vertex_list))
+        for tile, vertices in zip(board.tile_list, self.topology.tile_vertices):
+            tile.vertices = {board.vertex_list[v] for v in vertices}
+        # sides that cannot hold a road never change, so only the playable edges are copied
+        board.edge_list = [edge.copy() for edge in self.edge_list]
+        board.edges = dict(self.edges)
+        for edge in board.edge_list:
+            board.edges[edge.coords] = edge
+        board.vertex_owner = self.vertex_owner.copy()
+        board.vertex_city = self.vertex_city.copy()
+        board.edge_owner = self.edge_owner.copy()
+        return board
+
+    def __create_vertices(self, layout: BoardLayout) -> List[Vertex]:
+        """
+        Invoked during board creation. Creates a Vertex for every vertex in the topology, and a Port for every vertex
+        in one of the template's port pairs.
         """
-        Generally, this problem is isomorphic to unweighted Longest Path Problem, which is NP-Hard. Fortunately, we can
-        cut some corners.
+        pair_resources = [RESOURCE(x) for x in layout.ports.tolist()]
+        port_slots = self.template.port_slots
+        vertices = []
+        for idx, vertex_id in enumerate(self.topology.vertex_ids):
+            slot = port_slots.get(idx)
+            vertex = Vertex(vertex_id) if slot is None else Port(vertex_id, pair_resources[slot])
+            vertex.index = idx
+            vertices.append(vertex)
+        return vertices
 
-        We only need to re-check for longest road whenever someone builds a road. And, if building a road causes the
-        longest road to change, then it must include that road. So, we only need to consider the roads that are directly
-        connected to the added road. Take the two vertices on either side of the given edge, and find all other vertices
-        that can be reached using only the roads of the given player (the one who built the road). Call this component
-        G*.
+    @property
+    def vertex_graph(self) -> 'nx.Graph':
+        """
+        Models adjacent vertices (i.e., edges); shared with every other board of this size. See
+        BoardTemplate.vertex_graph.
+        """
+        return self.template.vertex_graph
 
-        For every node in G*, perform a DFS to every other node, calculating the longest paths possible. We can do this
-        via backtracking or a LIFO queue. The new longest road, if one exists, is 1 road longer than the old longest
-        road. So, if we ever see such a path length, we can stop searching.
+    @property
+    def tile_graph(self) -> 'nx.Graph':
+        """
+        Graph relating tiles to their vertices. Only built on request, since the topology answers the same queries.
+        """
+        if self._tile_graph is None:
+            import networkx as nx
+            self._tile_graph = nx.Graph()
+            for tile, vertices in zip(self.tile_list, self.topology.tile_vertices):
+                self._tile_graph.add_node(tile)
+                for v in vertices:
+                    vertex_id = self.topology.vertex_ids[v]
+                    self._tile_graph.add_node(vertex_id, on_shore=bool(self.topology.vertex_on_shore[v]))
+                    self._tile_graph.add_edge(tile, vertex_id)
+        return self._tile_graph
+
+    def check_longest_road(self, starting_road: Edge, curr_longest: int) -> bool:
+        """
+        We only need to re-check for longest road whenever someone builds a road. And, if building a road causes the
+        longest road to change, then it must include that road. So, we only need to consider the roads that are
+        connected to the added road, without passing through another player's settlement. The exact longest trail
+        through those roads is found by longest_road.longest_trail.
 
-        This method returns True if there is a new longest road, and False otherwise.
+        This method returns True if there is a new longest road, and False otherwise. It keeps no state between calls;
+        games track longest roads incrementally with longest_road.LongestRoad.
         """
         p_id = starting_road.player_road_id
         if p_id == -1:
             raise ValueError("Cannot check for longest road starting on an Edge with no road built on it.")
-        graph_edge = self.get_graph_edge_from_edge(starting_road)
-        if not graph_edge:
+        if starting_road.coords not in self.topology.edge_index:
             raise ValueError("Invalid starting road.")
-        v1, v2 = graph_edge
-        edges = self._get_connected_edges(v1, p_id)
-        # consider vertices with only one outgoing road first - if such vertices exist (e.g. longest road is not a cycle) then the longest possible road always starts from one of these
-        vertices = set().union(*[vertex for edge in edges for vertex in edge])
-        boundary_vertices = set(v for v in vertices if len([(a, b) for a, b in self.vertex_graph.edges(v) if
-                                                            self.get_edge_from_graph_edge(
-                                                                (a, b)).player_road_id == p_id]) == 1)
-        edges = sorted(edges, key=lambda e: e[0] not in boundary_vertices and e[1] not in boundary_vertices)
-        # we want to treat the edges (roads) as the vertices themselves
-        for i, edge in enumerate(edges):
-            pq = [(-1, edge)]
-            while pq:
-                dist, curr = heapq.heappop(pq)
-                node_1, node_2 = curr
-                self.vertex_graph[node_1][node_2]['visited'] = i
-                for node in [node_1, node_2]:
-                    for neighbor_node in self.vertex_graph.neighbors(node):
-                        e = self.get_edge_from_graph_edge((node, neighbor_node))
-                        if e.player_road_id == p_id and self.vertex_graph[node][neighbor_node]['visited'] != i:
-                            if -dist + 1 > curr_longest:
-                                return True
-                            heapq.heappush(pq, (dist - 1, (node, neighbor_node)))
-        return False
-
-    def _get_connected_edges(self, start: GraphVertex, player_road_id: int) -> List[GraphEdge]:
-        """
-        Given an initial vertex (start) in the networkx vertex graph, and a player ID, returns all edges in the graph
-        that are reachable from start via roads built by the given player.
-        """
-        queue = deque([start])
-        res = [start]
-        visited = defaultdict(bool)
-        while queue:
-            curr = queue.popleft()
-            for neighbor in self.vertex_graph.neighbors(curr):
-                edge = self.get_edge_from_graph_edge((curr, neighbor))
-                if edge.player_road_id == player_road_id and not visited[frozenset({curr, neighbor})]:
-                    visited[frozenset({start, neighbor})] = True
-                    queue.append(neighbor)
-                    res.append(frozenset({start, neighbor}))
-        return res
+        roads = connected_roads(self, p_id, self.topology.edge_index[starting_road.coords])
+        return longest_trail(self, p_id, roads) > curr_longest
 
     def get_tile(self, q: int, r: int) -> Tile:
-        try:
-            return self.tiles[r][q - max(0, self.board_size - (2 * self.board_size + 1 - abs(self.board_size - r)))]
-        except IndexError:
-            return None
+        return get_tile_from_grid(self.tiles, self.board_size, q, r)
 
     def get_tiles(self) -> Iterable[Tile]:
-        return iter(tile for row in self.tiles for tile in row if tile is not None)
+        return iter(self.tile_list)
 
     def get_edges(self) -> Iterable[Edge]:
-        return iter(self.get_edge_from_graph_edge(edge) for edge in self.vertex_graph.edges)
+        return iter(self.edge_list)
 
     def get_vertices(self) -> Iterable[Vertex]:
-        return iter(self.vertex_objects[x] for x in self.vertex_objects.keys())
+        return iter(self.vertex_list)
 
     def get_neighboring_tiles(self, tile: Tile) -> Set[Tile]:
-        res = set()
-        q, r = tile.coords
-        if (t1 := self.get_tile(max(q - 1, 0), r + 1)) is not None:
-            res.add(t1)
-        if (t2 := self.get_tile(q, r + 1)) is not None:
-            res.add(t2)
-        if (t3 := self.get_tile(q + 1, r)) is not None:
-            res.add(t3)
-        if (t4 := self.get_tile(q + 1, max(r - 1, 0))) is not None:
-            res.add(t4)
-        if (t5 := self.get_tile(q, max(r - 1, 0))) is not None:
-            res.add(t5)
-        if (t6 := self.get_tile(max(q - 1, 0), r)) is not None:
-            res.add(t6)
-        return res.difference({tile})
+        tile_list = self.tile_list
+        return {tile_list[t] for t in self.topology.tile_tiles[tile.index]}
+
+    def get_edge(self, x: int, y: int) -> Optional[Edge]:
+        return self.edges.get((x, y))
 
     def get_edges_from_tile(self, tile: Tile) -> Set[Edge]:
-        return {self.edges[x][y] for (x, y) in get_edge_coords_from_tile(tile)}
+        return {self.edges[c] for c in get_edge_coords_from_tile(tile)}
 
     def get_edges_from_vertex(self, vertex: Vertex) -> List[Edge]:
-        v_id = vertex.vertex_id
-        res = []
-        for x in self.vertex_graph.adj[v_id]:
-            i, j = self.vertex_graph.get_edge_data(v_id, x)['obj']
-            res.append(self.edges[i][j])
-        return res
+        edge_list = self.edge_list
+        return [edge_list[e] for e in self.topology.vertex_edges[vertex.index]]
+
+    def get_neighboring_vertices(self, vertex: Vertex) -> List[Vertex]:
+        vertex_list = self.vertex_list
+        return [vertex_list[v] for v in self.topology.vertex_vertices[vertex.index]]
 
     def get_tile_coords(self) -> TileCoords:
         return self.tile_coords
@@ -367,16 +483,13 @@ class Board:
                 res.append(tile)
         return res
 
-    def fetch_random_tile(self) -> Tile:
+    def fetch_random_tile(self, rng: Optional[np.random.Generator] = None) -> Tile:
         """
         Temporary method for choosing robber position.
         """
-        q = random.randint(0, 2 * self.board_size)
-        r = random.randint(0, 2 * self.board_size)
-        while (tile := self.get_tile(q, r)) is None:
-            q = random.randint(0, 2 * self.board_size)
-            r = random.randint(0, 2 * self.board_size)
-        return tile
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.tile_list[rng.integers(len(self.tile_list))]
 
     def get_desert_tiles(self) -> Set[Tile]:
         tiles = set()
@@ -386,25 +499,25 @@ class Board:
         return tiles
 
     def get_tiles_from_vertex(self, v: Vertex) -> Set[Tile]:
-        return set(self.tile_graph.adj[v.vertex_id])
+        tile_list = self.tile_list
+        return {tile_list[t] for t in self.topology.vertex_tiles[v.index]}
 
     def get_vertices_from_tile(self, t: Tile) -> Set[Vertex]:
-        return set(self.vertex_objects[x] for x in self.tile_graph.adj[t])
+        vertex_list = self.vertex_list
+        return {vertex_list[v] for v in self.topology.tile_vertices[t.index]}
 
     def vertices_are_adjacent(self, v1: Vertex, v2: Vertex) -> bool:
-        return v1.vertex_id in self.vertex_graph.neighbors(v2.vertex_id)
+        return self.topology.vertices_are_adjacent(v1.index, v2.index)
 
     def get_edge_from_graph_edge(self, graph_edge: GraphEdge) -> Edge:
-        i, j = self.vertex_graph.get_edge_data(graph_edge[0], graph_edge[1])['obj']
-        return self.edges[i][j]
+        return self.edge_list[self.topology.graph_edge_index[frozenset(graph_edge)]]
 
     def get_graph_edge_from_edge(self, edge: Edge) -> Optional[GraphEdge]:
-        i, j = edge.coords
-        graph_edge = [(u, v) for u, v, e in self.vertex_graph.edges(data=True) if e['obj'] == (i, j)]
-        if len(graph_edge) == 0:
+        e = self.topology.edge_index.get(edge.coords)
+        if e is None:
             return None
-        return graph_edge[0]
+        return self.topology.graph_edges[e]
 
     def get_vertices_from_edge(self, edge: Edge) -> Tuple[Vertex, Vertex]:
-        v1, v2 = self.get_graph_edge_from_edge(edge)
-        return self.vertex_objects[v1], self.vertex_objects[v2]
+        v1, v2 = self.topology.edge_endpoints[self.topology.edge_index[edge.coords]]
+        return self.vertex_list[v1], self.vertex_list[v2]
@@ -0,0 +1,150 @@
+import math
+from typing import NamedTuple, Optional, TYPE_CHECKING, Tuple
+
+import numpy as np
+
+import constants
+from constants import RESOURCE
+
+if TYPE_CHECKING:
+    from board import BoardTemplate
+
+BASE_RESOURCES = np.array([RESOURCE.BRICK, RESOURCE.GRAIN, RESOURCE.LUMBER, RESOURCE.ORE, RESOURCE.WOOL], dtype=np.int8)
+BASE_CHITS = np.array([2] + (list(range(3, 7)) + list(range(8, 12))) * 2 + [12], dtype=np.int8)
+PORT_RESOURCES = np.array([RESOURCE.GRAIN, RESOURCE.ORE, RESOURCE.WOOL, RESOURCE.LUMBER, RESOURCE.BRICK, RESOURCE.ANY],
+                          dtype=np.int8)
+# chits that may be placed next to a 6 or 8, matching constants.CHIT_DIST_MOD
+REMAINING_CHITS = np.array([2, 3, 4, 5, 9, 10, 11, 12], dtype=np.int8)
+# chit -> pips, the number of the 36 outcomes of two dice that roll it; deserts (-1) index the last entry
+PIPS = np.array([0, 0, 1, 2, 3, 4, 5, 0, 5, 4, 3, 2, 1, 0], dtype=np.float32)
+# relative weight of each balance score (see score_layouts()) when picking a balanced layout
+BALANCE_WEIGHTS = (1.0, 1.0, 1.0, 1.0)
+# candidates drawn for each balanced layout
+BALANCE_CANDIDATES = 2000
+
+
+class BoardLayout(NamedTuple):
+    """
+    The randomized part of one or more boards. Arrays have a leading batch dimension when produced by
+    generate_layouts(); land tiles are ordered as in BoardTemplate.land_tiles and port pairs as in the template's walk
+    around the shore.
+    """
+    # resource of every land tile, as RESOURCE values
+    resources: np.ndarray
+    # chit of every land tile, -1 for deserts
+    chits: np.ndarray
+    # trading resource of every port pair, as RESOURCE values
+    ports: np.ndarray
+
+    def select(self, i: int) -> 'BoardLayout':
+        """
+        Returns the ith layout of a batch.
+        """
+        return BoardLayout(self.resources[i], self.chits[i], self.ports[i])
+
+
+def _sample_rows(pool: np.ndarray, num_rows: int, num_cols: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws num_cols items without replacement from pool, independently for each of num_rows rows.
+    """
+    order = np.argsort(rng.random((num_rows, len(pool))), axis=1)[:, :num_cols]
+    return pool[order]
+
+
+def generate_layouts(template: 'BoardTemplate', num_layouts: int,
+                     rng: Optional[np.random.Generator] = None) -> BoardLayout:
+    """
+    Generates many resource/chit/port layouts for boards of one size at once.
+
+    Every layout has the usual distribution of resources and chits (plus one desert per ten land tiles, at least one),
+    and no two 6/8 chits are adjacent: whenever a 6 or 8 neighbors another 6 or 8 on a lower-numbered tile, its chit is
+    redrawn from constants.CHIT_DIST_MOD. Because redrawn chits are never 6 or 8, a single pass over the tile adjacency
+    matrix removes every conflict.
+
+    :param template: Template of the board size to generate layouts for.
+    :param num_layouts: Number of layouts to generate.
+    :param rng: Source of randomness.
+    :return: A BoardLayout whose arrays have a leading dimension of num_layouts.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    num_land = len(template.land_tiles)
+    resource_pool = np.tile(BASE_RESOURCES, num_land // len(BASE_RESOURCES) + 1)
+    chit_pool = np.tile(BASE_CHITS, num_land // len(BASE_CHITS) + 1)
+    resources = _sample_rows(resource_pool, num_layouts, num_land, rng)
+    chits = _sample_rows(chit_pool, num_layouts, num_land, rng)
+
+    num_deserts = max(num_land // 10, 1)
+    deserts = np.argsort(rng.random((num_layouts, num_land)), axis=1)[:, :num_deserts]
+    np.put_along_axis(resources, deserts, RESOURCE.DESERT, axis=1)
+    np.put_along_axis(chits, deserts, -1, axis=1)
+
+    # enforce rule that there are no 8-8, 6-6, or 8-6 connections
+    hot = ((chits == 6) | (chits == 8)).astype(np.float32)
+    demote = (hot > 0) & (hot @ template.lower_land_adjacency.T > 0)
+    num_demoted = int(demote.sum())
+    if num_demoted:
+        chits[demote] = rng.choice(REMAINING_CHITS, size=num_demoted, p=constants.CHIT_DIST_MOD)
+
+    port_pool = np.tile(PORT_RESOURCES, math.ceil(template.num_port_pairs / len(PORT_RESOURCES)) + 1)
+    ports = _sample_rows(port_pool, num_layouts, template.num_port_pairs, rng)
+    return BoardLayout(resources, chits, ports)
+
+
+def score_layouts(template: 'BoardTemplate', layouts: BoardLayout) -> Tuple[np.ndarray, ...]:
+    """
+    Measures how unbalanced every layout of a batch is, all in a handful of array operations. Lower is fairer for
+    every score:
+
+    - resource spread: standard deviation across resources of the average pips per tile of that resource, so that no
+      resource is much scarcer than the others
+    - vertex spread: standard deviation of the pips collected by each vertex, so that there are no hot spots worth
+      far more than the rest of the board
+    - port bias: pips of a port's own resource on the land tiles touching it, since a 2:1 port next to the tiles that
+      produce its resource favors whoever settles there
+    - clustering: number of neighboring land tiles with the same resource
+
+    :param template: Template of the board size the layouts are for.
+    :param layouts: Batch of layouts, e.g. from generate_layouts().
+    :return: The four scores, each an array with one entry per layout.
+    """
+    pips = PIPS[layouts.chits]
+    # layout x land tile x resource
+    is_resource = (layouts.resources[:, :, None] == BASE_RESOURCES).astype(np.float32)
+    production = pips[:, :, None] * is_resource
+
+    tiles_per_resource = np.maximum(is_resource.sum(axis=1), 1)
+    resource_spread = (production.sum(axis=1) / tiles_per_resource).std(axis=1)
+
+    vertex_spread = (pips @ template.vertex_land_incidence.T).std(axis=1)
+
+    # layout x port pair x resource, all zero for 3:1 ports
+    is_port_resource = (layouts.ports[:, :, None] == BASE_RESOURCES).astype(np.float32)
+    port_production = np.matmul(template.port_land_incidence, production)
+    port_bias = (port_production * is_port_resource).sum(axis=(1, 2))
+
+    clustering = (np.matmul(template.lower_land_adjacency, is_resource) * is_resource).sum(axis=(1, 2))
+    return resource_spread, vertex_spread, port_bias, clustering
+
+
+def generate_balanced_layout(template: 'BoardTemplate', num_candidates: int = BALANCE_CANDIDATES,
+                             rng: Optional[np.random.Generator] = None,
+                             weights: Tuple[float, ...] = BALANCE_WEIGHTS) -> BoardLayout:
+    """
+    Generates a batch of candidate layouts and returns the fairest. Each score from score_layouts() is standardized
+    across the batch, so that the weights say how much the scores matter relative to each other whatever their units,
+    and the candidate with the lowest weighted sum wins.
+
+    :param template: Template of the board size to generate a layout for.
+    :param num_candidates: Number of layouts to choose from.
+    :param rng: Source of randomness.
+    :param weights: Weight of each of the scores from score_layouts().
+    :return: A single BoardLayout.
+    """
+    layouts = generate_layouts(template, num_candidates, rng)
+    total = np.zeros(num_candidates, dtype=np.float32)
+    for weight, score in zip(weights, score_layouts(template, layouts)):
+        std = score.std()
+        if std > 0:
+            total += weight * (score - score.mean()) / std
+    return layouts.select(int(np.argmin(total)))
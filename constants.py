@@ -45,6 +45,34 @@ class GAMEPHASE(IntEnum):
     NORMAL = 1
 
 
+class ACTION(IntEnum):
+    ROLL = 0
+    BUILD_ROAD = 1
+    BUILD_SETTLEMENT = 2
+    BUILD_CITY = 3
+    MOVE_ROBBER = 4
+    EXCHANGE = 5
+    END_TURN = 6
+
+
+class EVENT(IntEnum):
+    GAME_START = 0
+    TILE = 1
+    ROLL = 2
+    PRODUCE = 3
+    DISCARD = 4
+    BUILD_ROAD = 5
+    BUILD_SETTLEMENT = 6
+    BUILD_CITY = 7
+    MOVE_ROBBER = 8
+    STEAL = 9
+    EXCHANGE = 10
+    END_TURN = 11
+    DEVELOPMENT = 12
+    UNDO = 13
+    WIN = 14
+
+
 """
 If we extrapolate from the base game, the chits [2,3,4,5,6,8,9,10,11,12] follow the multinomial distribution:
 
@@ -58,3 +86,9 @@ CHIT_DIST_MOD = [1 / 18 + 1 / 36, 1 / 9 + 1 / 36, 1 / 9 + 1 / 36, 1 / 9 + 1 / 36
                  1 / 9 + 1 / 36, 1 / 18 + 1 / 36]
 
 MAX_TRADE_PROPOSALS = 5
+
+# resource cards of each type in the bank, for 3-4 and 5-6 player games
+BANK_SIZE = 19
+BANK_SIZE_SIX_PLAYERS = 24
+
+VICTORY_POINTS_TO_WIN = 10
@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
 
-from constants import DEVELOPMENT
-from game import Game
+from constants import DEVELOPMENT, EVENT
+
+if TYPE_CHECKING:
+    from game import Game
 
 
 class DevelopmentCard(ABC):
@@ -13,7 +16,7 @@ class DevelopmentCard(ABC):
 
     @staticmethod
     @abstractmethod
-    def apply_action(game: Game, player_id: int):
+    def apply_action(game: 'Game', player_id: int):
         ...
 
 
@@ -24,15 +27,19 @@ class Knight(DevelopmentCard):
         return DEVELOPMENT.KNIGHT
 
     @staticmethod
-    def apply_action(game: Game, player_id: int):
+    def apply_action(game: 'Game', player_id: int):
         player = game.get_player(player_id)
+        game.log_event(EVENT.DEVELOPMENT, player_id, DEVELOPMENT.KNIGHT)
         tile_location = player.select_tile_for_robber(game)
         tile = game.board.get_tile(tile_location)
         game.set_robber_tile(tile)
         player2 = player.select_player_to_steal_from(game, tile)
-        resource = player2.get_random_available_resource()
+        resource = player2.get_random_available_resource(game.rng)
+        if resource is None:
+            return
         player2.take_resource(resource, 1)
         player.give_resource(resource, 1)
+        game.log_event(EVENT.STEAL, player_id, resource, player2.id)
 
 
 class Monopoly(DevelopmentCard):
@@ -42,13 +49,19 @@ class Monopoly(DevelopmentCard):
         return DEVELOPMENT.MONOPOLY
 
     @staticmethod
-    def apply_action(game: Game, player_id: int):
+    def apply_action(game: 'Game', player_id: int):
         player = game.get_player(player_id)
         r = player.select_monopoly_resource(game)
+        total = 0
         for player2 in game.get_players():
             count = player2.get_resource_count(r)
             player.give_resource(r, count)
             player2.take_resource(r, count)
+            if player2 is not player:
+                total += count
+        cards = [0] * 5
+        cards[r] = total
+        game.log_event(EVENT.DEVELOPMENT, player_id, DEVELOPMENT.MONOPOLY, r, cards)
 
 
 class RoadBuilding(DevelopmentCard):
@@ -58,14 +71,15 @@ class RoadBuilding(DevelopmentCard):
         return DEVELOPMENT.ROAD_BUILDING
 
     @staticmethod
-    def apply_action(game: Game, player_id: int):
+    def apply_action(game: 'Game', player_id: int):
         player = game.get_player(player_id)
+        game.log_event(EVENT.DEVELOPMENT, player_id, DEVELOPMENT.ROAD_BUILDING)
         available_spots = game.get_available_road_spots(player_id)
         e1 = player.select_road_building_spot(game, available_spots)
-        player.build_road(e1)
-        available_spots.remove(e1)
+        game.build_road(player_id, e1, free=True)
+        available_spots = game.get_available_road_spots(player_id)
         e2 = player.select_road_building_spot(game, available_spots)
-        player.build_road(e2)
+        game.build_road(player_id, e2, free=True)
 
 
 class VictoryPoint(DevelopmentCard):
@@ -75,9 +89,10 @@ class VictoryPoint(DevelopmentCard):
         return DEVELOPMENT.VICTORY_POINT
 
     @staticmethod
-    def apply_action(game: Game, player_id: int):
+    def apply_action(game: 'Game', player_id: int):
         player = game.get_player(player_id)
         player.give_victory_points(1)
+        game.log_event(EVENT.DEVELOPMENT, player_id, DEVELOPMENT.VICTORY_POINT)
 
 
 class YearOfPlenty(DevelopmentCard):
@@ -87,10 +102,13 @@ class YearOfPlenty(DevelopmentCard):
         return DEVELOPMENT.YEAR_OF_PLENTY
 
     @staticmethod
-    def apply_action(game: Game, player_id: int):
+    def apply_action(game: 'Game', player_id: int):
         player = game.get_player(player_id)
         r = player.select_year_of_plenty_resource(game)
         player.give_resource(r, 2)
+        cards = [0] * 5
+        cards[r] = 2
+        game.log_event(EVENT.DEVELOPMENT, player_id, DEVELOPMENT.YEAR_OF_PLENTY, r, cards)
 
 
 
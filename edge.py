@@ -2,14 +2,20 @@ from typing import Tuple
 
 
 class Edge:
+    __slots__ = ('x', 'y', 'index', 'player_road_id')
 
     def __init__(self, x: int, y: int):
         self.x = x
         self.y = y
+        # dense id assigned by the board's topology, -1 if the edge cannot hold a road
+        self.index = -1
         self.player_road_id = -1
-        # used for drawing the game
-        self.canvas_pos = None
-        self.rotation_angle = None
+
+    def copy(self) -> 'Edge':
+        edge = Edge(self.x, self.y)
+        edge.index = self.index
+        edge.player_road_id = self.player_road_id
+        return edge
 
     def __eq__(self, other):
         return isinstance(other, Edge) and self.coords == other.coords
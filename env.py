@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from actions import ActionSpace
+from board import Board, generate_boards, get_board_template
+from game import Game
+from observation import ObservationEncoder
+from player import Mask
+from random_stream import Seed
+
+
+class VecCatanEnv:
+    """
+    Steps a batch of self-play games in lockstep, for training policies on batched arrays.
+
+    Every game is played by the policy from all seats: each step takes one action index (see ActionSpace) per game,
+    for whichever player's turn it is, and observations are from that player's point of view. Rewards are given to
+    every player when a game ends, 1 to the winner and -1 to everyone else. Finished games are replaced by new ones
+    straight away, on boards generated in one batch from the cached board template.
+
+    Observations, rewards and masks are written into buffers owned by the environment, which the next reset() or
+    step() overwrites; copy them to keep them.
+    """
+
+    def __init__(self, num_envs: int, six_players: bool = False, max_actions: int = 10000, seed: Seed = None):
+        """
+        :param num_envs: Number of games played at once
+        :param six_players: True for the 5-6 player extension
+        :param max_actions: Number of actions after which a game is cut short (reported as truncated)
+        :param seed: Root seed of the boards and of every game's seed, so that runs can be repeated
+        """
+        self.num_envs = num_envs
+        self.six_players = six_players
+        self.max_actions = max_actions
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence.spawn(1)[0])
+        self.board_size = 4 if six_players else 3
+        self.num_players = 6 if six_players else 4
+        topology = get_board_template(self.board_size).topology
+        self.topology = topology
+        self.action_space = ActionSpace(topology, self.num_players)
+        self.encoder = ObservationEncoder(topology, self.num_players)
+        self.observation_size = self.encoder.size
+        self.games: List[Optional[Game]] = [None] * num_envs
+        self.masks: List[List[Mask]] = [[] for _ in range(num_envs)]
+        self.observations = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self._observation_views = [self.encoder.unpack(row) for row in self.observations]
+        self.action_masks = np.zeros((num_envs, self.action_space.size), dtype=bool)
+        self.rewards = np.zeros((num_envs, self.num_players), dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self.truncated = np.zeros(num_envs, dtype=bool)
+        self.current_players = np.zeros(num_envs, dtype=np.int64)
+        # winner of the game that just ended in each slot, or -1
+        self.final_winners = np.full(num_envs, -1, dtype=np.int64)
+
+    def reset(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Starts a new game in every slot.
+        :return: Observations (num_envs, observation_size) and infos (see step())
+        """
+        for i, board in enumerate(generate_boards(self.board_size, self.num_envs, self.rng)):
+            self._start(i, board)
+        self.final_winners[:] = -1
+        self._observe_all()
+        return self.observations, self._infos()
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Takes one action in every game.
+        :param actions: Action index (see action_space) for every game, which must be allowed by action_masks
+        :return: Observations (num_envs, observation_size), rewards (num_envs, num_players), dones and truncated
+        (num_envs,), and infos: the action mask and current player of every game, and the winner of every game that
+        just ended (-1 elsewhere). Where a game ended, the observation and infos are for the game replacing it.
+        """
+        self.rewards[:] = 0
+        self.dones[:] = False
+        self.truncated[:] = False
+        self.final_winners[:] = -1
+        for i, (game, index) in enumerate(zip(self.games, np.asarray(actions).tolist())):
+            if not self.action_masks[i, index]:
+                raise ValueError(f"Action {index} is not legal in game {i}.")
+            game.apply_action(self.action_space.decode(index, game.current_turn), record=False)
+            if game.winner != -1:
+                self.rewards[i] = -1
+                self.rewards[i, game.winner] = 1
+                self.dones[i] = True
+                self.final_winners[i] = game.winner
+            elif game.num_actions >= self.max_actions:
+                self.truncated[i] = True
+        finished = np.flatnonzero(self.dones | self.truncated)
+        if len(finished):
+            for i, board in zip(finished.tolist(), generate_boards(self.board_size, len(finished), self.rng)):
+                self._start(i, board)
+        self._observe_all()
+        return self.observations, self.rewards, self.dones, self.truncated, self._infos()
+
+    def _infos(self) -> Dict[str, np.ndarray]:
+        return {'action_mask': self.action_masks, 'current_player': self.current_players,
+                'final_winner': self.final_winners}
+
+    def _start(self, i: int, board: Board):
+        game = Game(self.six_players, agents=(), board=board, seed=self.seed_sequence.spawn(1)[0])
+        self.games[i] = game
+        self.masks[i] = [Mask(player, game) for player in game.players]
+        # the static planes stay in the buffer for the whole game; steps only refresh the dynamic ones
+        self.encoder.write_static(board, self.observations[i])
+
+    def _observe_all(self):
+        for i, game in enumerate(self.games):
+            player_id = game.current_turn
+            self.current_players[i] = player_id
+            self.encoder.write_dynamic(game, player_id, self._observation_views[i])
+            self.action_space.mask(game, self.masks[i][player_id], out=self.action_masks[i])
@@ -0,0 +1,136 @@
+"""
+Append-only binary log of game events, and a streaming reader for it.
+
+A log file is a 16 byte header followed by fixed-width records (EVENT_DTYPE), so a file of any size can be memory
+mapped and read in chunks without parsing. What the fields of a record mean depends on its kind (constants.EVENT):
+
+    GAME_START        target: board size, extra: number of players
+    TILE              target: tile, extra: chit (-1 for the desert), resources: one-hot of the tile's resource
+                      (all zero for the desert); one per land tile, straight after GAME_START
+    ROLL              player: roller, target: dice total
+    PRODUCE           player: collector, resources: cards collected (from a roll, or the second setup settlement)
+    DISCARD           player: discarder, resources: cards discarded, as negative counts
+    BUILD_ROAD        target: edge, extra: 1 if the road was free
+    BUILD_SETTLEMENT  target: vertex
+    BUILD_CITY        target: vertex
+    MOVE_ROBBER       player: mover, target: tile
+    STEAL             player: thief, target: resource, extra: victim
+    EXCHANGE          player: trader, target: resource given, extra: resource received, resources: change to the hand
+    END_TURN          player: player whose turn ended
+    DEVELOPMENT       player: player of the card, target: DEVELOPMENT type, extra: resource chosen (-1 if none),
+                      resources: change to the hand
+    UNDO              player: player whose action was taken back, target: ACTION type of the action
+    WIN               player: winner
+
+Every record also has the game's ID within the log and step, the number of actions taken in the game so far
+(counting the one that caused the event).
+"""
+import struct
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from constants import EVENT
+
+EVENT_DTYPE = np.dtype([
+    ('game', '<u4'),
+    ('step', '<u4'),
+    ('kind', 'u1'),
+    ('player', 'i1'),
+    ('target', '<i2'),
+    ('extra', '<i2'),
+    ('resources', '<i2', 5),
+])
+MAGIC = b'CATANEVT'
+VERSION = 1
+HEADER = struct.Struct('<8sII')
+NO_CARDS = (0, 0, 0, 0, 0)
+
+
+class EventLog:
+    """
+    Writes events to the end of a log file. Records are buffered and written in blocks, so the file is only complete
+    after flush() or close(). Several processes must not share a file; give every worker its own.
+    """
+
+    def __init__(self, path: str, first_game_id: Optional[int] = None, buffer_size: int = 65536):
+        """
+        :param path: Log file, created if missing and appended to otherwise
+        :param first_game_id: ID given to the first game started with this log. By default games are numbered on from
+        the highest ID already in the file, or from 0 in a new file.
+        :param buffer_size: Number of records held in memory before they are written
+        """
+        self.path = path
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, EVENT_DTYPE.itemsize))
+            next_game_id = 0
+        else:
+            games = open_events(path)['game']
+            next_game_id = int(games.max()) + 1 if len(games) else 0
+        self.next_game_id = next_game_id if first_game_id is None else first_game_id
+        self.buffer_size = buffer_size
+        self._pending: List[Tuple] = []
+
+    def new_game_id(self) -> int:
+        game_id = self.next_game_id
+        self.next_game_id += 1
+        return game_id
+
+    def emit(self, game_id: int, step: int, kind: EVENT, player: int = -1, target: int = -1, extra: int = -1,
+             resources: Sequence[int] = NO_CARDS):
+        """
+        Adds one record to the log.
+        """
+        self._pending.append((game_id, step, kind, player, target, extra, resources))
+        if len(self._pending) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes every buffered record to the file.
+        """
+        if self._pending:
+            self.file.write(np.array(self._pending, dtype=EVENT_DTYPE).tobytes())
+            self._pending = []
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self) -> 'EventLog':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(path: str):
+    with open(path, 'rb') as file:
+        magic, version, record_size = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != EVENT_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} event log.")
+
+
+def open_events(path: str) -> np.ndarray:
+    """
+    Memory maps every record of a log file, read-only. Records are only read from disk when they are accessed.
+    """
+    _check_header(path)
+    with open(path, 'rb') as file:
+        file.seek(0, 2)
+        count = (file.tell() - HEADER.size) // EVENT_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+    return np.memmap(path, dtype=EVENT_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+
+
+def read_events(path: str, chunk_size: int = 65536) -> Iterator[np.ndarray]:
+    """
+    Streams the records of a log file in chunks of up to chunk_size, without loading the whole file.
+    """
+    events = open_events(path)
+    for start in range(0, len(events), chunk_size):
+        yield events[start:start + chunk_size]
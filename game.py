@@ -1,36 +1,107 @@
 from collections import defaultdict
-import random
-from typing import List, Optional, Tuple
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Type, TYPE_CHECKING
 
-from networkx import Graph
+import numpy as np
 
+from actions import Action
 from board import Board
-from constants import PLAYERCOLOR
+from constants import ACTION, EVENT, PLAYERCOLOR, RESOURCE, BANK_SIZE, BANK_SIZE_SIX_PLAYERS, VICTORY_POINTS_TO_WIN
 from edge import Edge
-from game_window import GameWindow
 from player import Player, RandomAgent, Agent
 from tile import Tile
 from vertex import Vertex
 from exceptions import FailedBuildError
+from game_state import card_hash, card_hash_delta, get_zobrist_keys, layout_hash, turn_hash
+from longest_road import LongestRoad
+from placement import LegalPlacements
+from random_stream import RandomStream, Seed
+
+if TYPE_CHECKING:
+    from networkx import Graph
+    from event_log import EventLog
+
+
+# Game attributes that describe whose turn it is and what has happened in it, saved before every journaled action
+TURN_STATE = ('current_turn_idx', 'current_setup_turn_idx', 'is_game_start', 'setup_settlement',
+              'dice_rolled_this_turn', 'robber_moved_this_turn', 'stole_this_turn', 'seven_rolled_this_turn',
+              'last_roll', 'longest_road_holder', 'winner', 'num_turns', 'num_actions')
+
+
+class JournalEntry(NamedTuple):
+    """
+    Everything Game.undo_action() needs to take back one action.
+    """
+    action: Action
+    turn_state: tuple
+    player_states: tuple
+    hands: np.ndarray
+    # only saved for actions that change production
+    production: Optional[np.ndarray]
+    robber_tile: int
 
 
 class Game:
 
-    def __init__(self, six_players=False):
+    def __init__(self, six_players=False, agents: Optional[Sequence[Type[Agent]]] = None,
+                 board: Optional[Board] = None, event_log: Optional['EventLog'] = None, seed: Seed = None,
+                 balanced: bool = False):
+        """
+        :param six_players: True for the 5-6 player extension, played on a larger board
+        :param agents: Agent class controlling each player, for games without a human. By default player 0 is the
+        user of the GUI and every other player is a RandomAgent.
+        :param board: Fresh board to play on, e.g. one of a batch from generate_boards(); a new one of the right size
+        is made if not given
+        :param event_log: Log to record every event of the game in
+        :param seed: Seed of all of the game's randomness: board, turn order, dice, discards, steals and the agents'
+        choices. Games with the same seed and agents play out identically.
+        :param balanced: True to play on a balanced board (see generate_balanced_layout()) when no board is given
+        """
+        self.rng = RandomStream(seed)
         self.players = [Player(i, PLAYERCOLOR(i)) for i in range(4)]
         if six_players:
-            self.board = Board(4)
             for i in range(4, 6):
                 self.players.append(Player(i, PLAYERCOLOR(i)))
-        else:
-            self.board = Board(3)
+        if board is None:
+            board = Board(4 if six_players else 3, rng=self.rng.generator, balanced=balanced)
+        self.board = board
         self.agents = {}
-        for player in self.players[1:]:
-            # TODO: change this when moving beyond just random agents
-            self.agents[player.id] = RandomAgent(player, self)
+        if agents is None:
+            for player in self.players[1:]:
+                self.agents[player.id] = RandomAgent(player, self)
+        else:
+            for player, agent in zip(self.players, agents):
+                self.agents[player.id] = agent(player, self)
         self.num_players = len(self.players)
+        self.bank_size = BANK_SIZE_SIX_PLAYERS if six_players else BANK_SIZE
+        # see state_version; shared with the players, so that changes to their hands bump it too
+        self._state_version = [0]
+        # every player's hand is a row of this array, so production can be paid out with one vector add
+        self.hands = np.zeros((self.num_players, 5), dtype=np.int64)
+        # development cards [Knight, Monopoly, RoadBuilding, VictoryPoint, YearOfPlenty], one row per player like hands
+        self.dev_cards = np.zeros((self.num_players, 6), dtype=np.int64)
+        for player in self.players:
+            player.resources = self.hands[player.id]
+            player.dev_cards = self.dev_cards[player.id]
+            player.game_version = self._state_version
+        # production[p, roll] holds the resources player p collects when roll comes up
+        self.production = np.zeros((self.num_players, 13, 5), dtype=np.int64)
+
+        self.longest_road = LongestRoad(self.board, self.num_players)
+        self.placements = LegalPlacements(self.board, self.num_players)
+        # player currently holding the Longest Road card, or -1
+        self.longest_road_holder = -1
+
+        # actions taken through apply_action(), most recent last
+        self.journal: List[JournalEntry] = []
+        # player who reached VICTORY_POINTS_TO_WIN, or -1
+        self.winner = -1
+        self.last_roll = -1
+        # number of completed (non-setup) turns, and of actions taken through apply_action()
+        self.num_turns = 0
+        self.num_actions = 0
 
-        self.robber_tile = random.choice(list(self.board.get_desert_tiles()))
+        self.robber_tile = self.rng.choice(sorted(self.board.get_desert_tiles(), key=lambda tile: tile.index))
+        self.robber_tile.robber = True
         self.player_buildings = defaultdict(set)
         self.player_roads = defaultdict(set)
 
@@ -38,7 +109,7 @@ class Game:
         # the user of the GUI is always player 0
         self.current_turn_idx = 0
         self.turn_order = list(range(self.num_players))
-        random.shuffle(self.turn_order)
+        self.rng.shuffle(self.turn_order)
         self.dice_rolled_this_turn = False
         self.robber_moved_this_turn = False
         self.stole_this_turn = False
@@ -50,42 +121,172 @@ class Game:
 
         # setup turn logic (only for beginning phase)
         self.current_setup_turn_idx = 0
+        # vertex of the settlement placed this setup turn, which the setup road must touch; -1 before it is placed
+        self.setup_settlement = -1
         self.setup_turn_order = self.turn_order + self.turn_order[::-1]
         self.is_game_start = True
 
+        self.zobrist = get_zobrist_keys(self.board.topology, self.num_players)
+        # hash of the layout, pieces and robber, updated by every build and robber move
+        self._board_hash = layout_hash(self) ^ self.zobrist.robber[self.robber_tile.index]
+        # hash of every card count; brought up to date from the counts it was last computed for when it is read
+        self._card_hash = card_hash(self.zobrist.hand, self.hands) ^ card_hash(self.zobrist.dev_card, self.dev_cards)
+        self._hashed_hands = self.hands.copy()
+        self._hashed_dev_cards = self.dev_cards.copy()
+
+        self.event_log = event_log
+        self.game_id = -1
+        if event_log is not None:
+            self.game_id = event_log.new_game_id()
+            self.log_event(EVENT.GAME_START, -1, self.board.board_size, self.num_players)
+            for t, (resource, chit) in enumerate(zip(self.board.tile_resource.tolist(), self.board.tile_chit.tolist())):
+                if resource != RESOURCE.WATER:
+                    self.log_event(EVENT.TILE, -1, t, chit, tuple(int(r == resource) for r in range(5)))
+
+    def log_event(self, kind: EVENT, player_id: int, target: int = -1, extra: int = -1,
+                  resources: Sequence[int] = (0, 0, 0, 0, 0)):
+        """
+        Records an event in the game's event log (see event_log for what the fields mean), if it has one.
+        """
+        if self.event_log is not None:
+            self.event_log.emit(self.game_id, self.num_actions, kind, player_id, target, extra, resources)
+
     @property
     def current_turn(self):
         return self.turn_order[self.current_turn_idx] if not self.is_game_start else self.setup_turn_order[
             self.current_setup_turn_idx]
 
-    def roll(self, player: Player):
+    @property
+    def state_hash(self) -> int:
         """
-        Rolls both dice, and notifies all Player objects of the outcome.
+        Zobrist hash of the game's state (see game_state.pack_state() for what that covers). Equal positions, even
+        from different games, always have equal hashes.
         """
-        roll = random.randrange(1, 7) + random.randrange(1, 7)
+        keys = self.zobrist
+        self._card_hash ^= card_hash_delta(keys.hand, self.hands, self._hashed_hands) \
+            ^ card_hash_delta(keys.dev_card, self.dev_cards, self._hashed_dev_cards)
+        return self._board_hash ^ self._card_hash ^ turn_hash(self)
+
+    def roll(self, player: Player, value: Optional[int] = None) -> int:
+        """
+        Rolls both dice and pays out production. On a 7, everyone holding more than 7 cards discards half of them, and
+        the player must then move the robber.
+        :param player: Player rolling the dice
+        :param value: Dice total to use instead of rolling, e.g. for a chance node of a search tree
+        :return: The dice total
+        """
+        roll = value if value is not None else self.rng.roll()
+        self.state_version += 1
+        self.dice_rolled_this_turn = True
+        self.last_roll = roll
+        if self.event_log is not None:
+            self.log_event(EVENT.ROLL, player.id, roll)
         if roll == 7:
-            # TODO: Allow player to choose robber spot and player to rob
-            tile = self.board.fetch_random_tile()
-            self.robber_tile.robber = False
-            tile.robber = True
-            self.robber_tile = tile
-            player2 = random.choice(self.get_players_on_tile(tile))
-            player2_resource = random.choice(player2.get_available_resources())
-            player2.take_resource(player2_resource, 1)
-            player.give_resource(player2_resource, 1)
+            self.seven_rolled_this_turn = True
+            self._discard_half_hands()
         else:
-            producing_tiles = self.board.get_tiles_with_chit(roll)
-            for tile in producing_tiles:
-                for vertex in tile.vertices:
-                    if vertex.player_id == -1:
-                        continue
-                    player = self.players[vertex.player_id]
-                    if vertex.is_city:
-                        player.give_resource(tile.resource, 2)
-                    else:
-                        player.give_resource(tile.resource, 1)
-
-        # TODO: Need to allow player to actually take turn
+            self.hands += self.production[:, roll]
+            if self.event_log is not None:
+                for p, cards in enumerate(self.production[:, roll].tolist()):
+                    if any(cards):
+                        self.log_event(EVENT.PRODUCE, p, resources=cards)
+        return roll
+
+    def _discard_half_hands(self):
+        """
+        Every player holding more than 7 cards discards half of them (rounded down), chosen at random.
+        """
+        for p, hand in enumerate(self.hands):
+            total = int(hand.sum())
+            if total > 7:
+                cards = np.repeat(np.arange(5), hand)
+                discarded = self.rng.sample(cards.tolist(), total // 2)
+                np.subtract.at(hand, discarded, 1)
+                if self.event_log is not None:
+                    self.log_event(EVENT.DISCARD, p, resources=[-discarded.count(r) for r in range(5)])
+
+    def steal(self, player_id: int, victim_id: int) -> Optional[int]:
+        """
+        Moves a random resource card from one player's hand to another's.
+        :return: The resource stolen, or None if the victim had no cards
+        """
+        resource = self.players[victim_id].get_random_available_resource(self.rng)
+        if resource is None:
+            return None
+        self.state_version += 1
+        self.hands[victim_id, resource] -= 1
+        self.hands[player_id, resource] += 1
+        self.stole_this_turn = True
+        if self.event_log is not None:
+            self.log_event(EVENT.STEAL, player_id, resource, victim_id)
+        return resource
+
+    def exchange(self, player_id: int, give: int, receive: int):
+        """
+        Trades resources with the bank at the player's best rate.
+        :param player_id: ID of player trading
+        :param give: Resource handed to the bank
+        :param receive: Resource taken from the bank
+        """
+        ratio = self.players[player_id].trade_ratios()[give]
+        if give == receive or self.hands[player_id, give] < ratio or self.bank()[receive] == 0:
+            raise ValueError(f"Player {str(player_id)} cannot exchange {ratio} of resource {give} for {receive}.")
+        self.state_version += 1
+        self.hands[player_id, give] -= ratio
+        self.hands[player_id, receive] += 1
+        if self.event_log is not None:
+            cards = [0] * 5
+            cards[give] -= ratio
+            cards[receive] += 1
+            self.log_event(EVENT.EXCHANGE, player_id, give, receive, cards)
+
+    def end_turn(self) -> int:
+        """
+        Ends the current (non-setup) turn, and returns the ID of the next player.
+        """
+        if self.event_log is not None:
+            self.log_event(EVENT.END_TURN, self.current_turn)
+        self.dice_rolled_this_turn = False
+        self.robber_moved_this_turn = False
+        self.stole_this_turn = False
+        self.seven_rolled_this_turn = False
+        self.num_dev_cards_bought_this_turn = 0
+        self.trades_proposed_this_turn = 0
+        self.num_turns += 1
+        return self.advance_turn_non_setup()
+
+    def move_robber(self, tile: Tile):
+        """
+        Moves the robber to a tile. The tile stops producing, and the tile the robber left produces again.
+        """
+        self.state_version += 1
+        if self.event_log is not None:
+            self.log_event(EVENT.MOVE_ROBBER, self.current_turn, tile.index)
+        self._board_hash ^= self.zobrist.robber[self.robber_tile.index] ^ self.zobrist.robber[tile.index]
+        self._add_tile_production(self.robber_tile, 1)
+        self.robber_tile.robber = False
+        tile.robber = True
+        self.robber_tile = tile
+        self._add_tile_production(tile, -1)
+
+    def _add_tile_production(self, tile: Tile, sign: int):
+        """
+        Adds (sign=1) or removes (sign=-1) a tile's output from the production of every player built around it.
+        """
+        if tile.dice_num == -1:
+            return
+        for vertex in tile.vertices:
+            if vertex.player_id != -1:
+                self.production[vertex.player_id, tile.dice_num, tile.resource] += sign * (2 if vertex.is_city else 1)
+
+    def _add_vertex_production(self, player_id: int, vertex: Vertex):
+        """
+        Adds one unit of production from every unblocked tile around a vertex, for a new settlement or city.
+        """
+        robber = self.robber_tile.index
+        for t, chit, resource in self.board.vertex_production[vertex.index]:
+            if t != robber:
+                self.production[player_id, chit, resource] += 1
 
     def build_settlement(self, player_id: int, vertex: Vertex):
         """
@@ -99,31 +300,79 @@ class Game:
         player = self.players[player_id]
         if self.is_game_start:
             player.place_settlement(vertex)
-            self.player_buildings[player_id].add(vertex)
         elif not player.can_build_settlement():
             raise FailedBuildError(f"Player {str(player_id)} cannot build a settlement.")
         else:
             player.build_settlement(vertex)
-            self.player_buildings[player_id].add(vertex)
+        self.player_buildings[player_id].add(vertex)
+        self.board.vertex_owner[vertex.index] = player_id
+        self._board_hash ^= self.zobrist.settlement[vertex.index][player_id]
+        self.state_version += 1
+        if self.event_log is not None:
+            self.log_event(EVENT.BUILD_SETTLEMENT, player_id, vertex.index)
+        self._add_vertex_production(player_id, vertex)
+        self.placements.on_settlement(player_id, vertex.index)
+        self.longest_road.on_settlement(player_id, vertex.index)
+        self._update_longest_road_holder()
+        if self.is_game_start:
+            self.setup_settlement = vertex.index
+            if self.current_setup_turn_idx >= self.num_players:
+                # the second setup settlement collects one card from every tile around it
+                cards = [0] * 5
+                for _, _, resource in self.board.vertex_production[vertex.index]:
+                    cards[resource] += 1
+                self.hands[player_id] += cards
+                if self.event_log is not None:
+                    self.log_event(EVENT.PRODUCE, player_id, resources=cards)
 
-    def build_road(self, player_id: int, edge: Edge):
+    def build_road(self, player_id: int, edge: Edge, free: bool = False):
         """
         Builds a road for a player.
         :param player_id: ID of player building road
         :param edge: Edge upon which to build road
+        :param free: True if the road costs no resources (e.g. from a Road Building card)
         """
         if edge.player_road_id != -1:
             raise FailedBuildError(
                 f"Player {str(player_id)} may not build on a spot that Player {str(edge.player_road_id)} has already built on.")
         player = self.players[player_id]
-        if self.is_game_start:
+        if self.is_game_start or free:
             player.place_road(edge)
-            self.player_roads[player_id].add(edge)
         elif not player.can_build_road():
             raise FailedBuildError(f"Player {str(player_id)} cannot build a road.")
         else:
             player.build_road(edge)
-            self.player_roads[player_id].add(edge)
+        self.player_roads[player_id].add(edge)
+        self.board.edge_owner[edge.index] = player_id
+        self._board_hash ^= self.zobrist.road[edge.index][player_id]
+        self.state_version += 1
+        if self.event_log is not None:
+            self.log_event(EVENT.BUILD_ROAD, player_id, edge.index, int(free))
+        self.placements.on_road(player_id, edge.index)
+        self.longest_road.add_road(player_id, edge.index)
+        self._update_longest_road_holder()
+        if self.is_game_start:
+            self.setup_settlement = -1
+
+    def _update_longest_road_holder(self):
+        """
+        Hands the Longest Road card to whoever deserves it: a player needs at least 5 roads in a row and must be
+        strictly ahead of everyone else to take it, but the current holder keeps it on a tie.
+        """
+        lengths = [self.longest_road.longest_road(p) for p in range(self.num_players)]
+        best = max(lengths)
+        holder = self.longest_road_holder
+        if holder != -1 and lengths[holder] == best and best >= 5:
+            return
+        leaders = [p for p in range(self.num_players) if lengths[p] == best]
+        new_holder = leaders[0] if best >= 5 and len(leaders) == 1 else -1
+        if new_holder == holder:
+            return
+        if holder != -1:
+            self.players[holder].remove_longest_road()
+        if new_holder != -1:
+            self.players[new_holder].give_longest_road()
+        self.longest_road_holder = new_holder
 
     def build_city(self, player_id: int, vertex: Vertex):
         """
@@ -133,12 +382,19 @@ class Game:
         """
         player = self.players[player_id]
         if not player.can_build_city():
-            raise FailedBuildError("Player " + player_id + " cannot build a city.")
+            raise FailedBuildError(f"Player {str(player_id)} cannot build a city.")
         if vertex.player_id != player_id:
-            raise FailedBuildError("Player " + player_id + " cannot build a city without first building a settlement.")
-        if vertex.is_city():
+            raise FailedBuildError(
+                f"Player {str(player_id)} cannot build a city without first building a settlement.")
+        if vertex.is_city:
             raise FailedBuildError("A city already exists at this spot.")
         player.build_city(vertex)
+        self.board.vertex_city[vertex.index] = True
+        self._board_hash ^= self.zobrist.city[vertex.index][player_id]
+        self.state_version += 1
+        if self.event_log is not None:
+            self.log_event(EVENT.BUILD_CITY, player_id, vertex.index)
+        self._add_vertex_production(player_id, vertex)
 
     def get_players_on_tile(self, tile: Tile) -> List[Player]:
         """
@@ -153,7 +409,7 @@ class Game:
                 players.add(self.players[i])
         return players
 
-    def get_player_subgraph(self, player: Player) -> Graph:
+    def get_player_subgraph(self, player: Player) -> 'Graph':
         """
         Returns the smallest subgraph of the board's vertex subgraph that includes
         all vertices and edges that this player has built on. The subgraph has at most 2 components.
@@ -164,17 +420,16 @@ class Game:
     def get_available_road_spots(self, player_id: int) -> List[Edge]:
         """
         Given a player, return all edges that this player can build a road on.
+        During the setup phase, roads must be attached to one of the player's settlements.
         """
-        res = []
-        for edge in self.board.vertex_graph.edges:
-            edge_obj = self.board.get_edge_from_graph_edge(edge)
-            if edge_obj.player_road_id != -1:
-                continue
-            v1, v2 = self.board.vertex_objects[edge[0]], self.board.vertex_objects[edge[1]]
-            if v1.player_id == player_id or v2.player_id == player_id:
-                res.append(edge_obj)
-                continue
-        return res
+        edge_list = self.board.edge_list
+        if self.is_game_start and self.setup_settlement != -1:
+            return [edge_list[e] for e in self.board.topology.vertex_edges[self.setup_settlement]
+                    if edge_list[e].player_road_id == -1]
+        if self.is_game_start:
+            return [edge for vertex in self.player_buildings[player_id] for edge in
+                    self.board.get_edges_from_vertex(vertex) if edge.player_road_id == -1]
+        return [edge_list[e] for e in self.placements.road_spots[player_id]]
 
     def get_available_settlement_spots(self, player_id: int) -> List[Vertex]:
         """
@@ -182,24 +437,9 @@ class Game:
         When is_setup_phase is True, the player is only bound by the "must not be adjacent to another settlement" build
         rule, and not the "must be adjacent to one of your roads" build rule.
         """
-        res = []
-        for vertex in self.board.vertex_graph.nodes:
-            vertex_obj = self.board.vertex_objects[vertex]
-            if vertex_obj.player_id != -1:
-                continue
-            for neighbor in self.board.vertex_graph.neighbors(vertex):
-                neighbor_obj = self.board.vertex_objects[neighbor]
-                if neighbor_obj.player_id != -1:
-                    break
-            else:
-                if self.is_game_start:
-                    res.append(vertex_obj)
-                else:
-                    for edge_obj in self.board.get_edges_from_vertex(vertex_obj):
-                        if edge_obj.player_road_id == player_id:
-                            res.append(vertex_obj)
-                            break
-        return res
+        vertex_list = self.board.vertex_list
+        spots = self.placements.free_vertices if self.is_game_start else self.placements.settlement_spots[player_id]
+        return [vertex_list[v] for v in spots]
 
     def advance_turn(self) -> int:
         return self.advance_turn_setup() if self.is_game_start else self.advance_turn_non_setup()
@@ -209,34 +449,249 @@ class Game:
         Start the turn of the next player, and return that player ID.
         """
         self.current_turn_idx = (self.current_turn_idx + 1) % self.num_players
+        self.state_version += 1
         return self.turn_order[self.current_turn_idx]
 
     def advance_turn_setup(self) -> int:
         """
         Start the setup turn of the next player, and return that player ID.
         """
+        self.state_version += 1
         if self.current_setup_turn_idx + 1 == len(self.setup_turn_order):
             # end the setup phase
             self.is_game_start = False
-            return self.current_turn_idx
+            return self.turn_order[self.current_turn_idx]
         self.current_setup_turn_idx += 1
         return self.setup_turn_order[self.current_setup_turn_idx]
 
+    def bank(self) -> np.ndarray:
+        """
+        Number of cards of each resource left in the bank.
+        """
+        return np.maximum(self.bank_size - self.hands.sum(axis=0), 0)
+
+    def legal_actions(self) -> List[Action]:
+        """
+        Every action the player whose turn it is may take next, in the form taken by apply_action(). Development cards
+        and trades between players are not part of the action space yet.
+        """
+        if self.winner != -1:
+            return []
+        player_id = self.current_turn
+        board = self.board
+        if self.is_game_start:
+            if self.setup_settlement == -1:
+                return [Action(ACTION.BUILD_SETTLEMENT, player_id, v) for v in sorted(self.placements.free_vertices)]
+            return [Action(ACTION.BUILD_ROAD, player_id, edge.index) for edge in
+                    self.get_available_road_spots(player_id)]
+        if not self.dice_rolled_this_turn:
+            return [Action(ACTION.ROLL, player_id)]
+        if self.seven_rolled_this_turn and not self.robber_moved_this_turn:
+            actions = []
+            has_cards = self.hands.sum(axis=1) > 0
+            for t in board.template.land_tiles:
+                if t == self.robber_tile.index:
+                    continue
+                victims = {board.vertex_list[v].player_id for v in board.topology.tile_vertices[t]}
+                victims = sorted(p for p in victims if p not in (-1, player_id) and has_cards[p])
+                actions += [Action(ACTION.MOVE_ROBBER, player_id, t, p) for p in victims or [-1]]
+            return actions
+        player = self.players[player_id]
+        actions = [Action(ACTION.END_TURN, player_id)]
+        if player.can_build_road():
+            actions += [Action(ACTION.BUILD_ROAD, player_id, e) for e in sorted(self.placements.road_spots[player_id])]
+        if player.can_build_settlement():
+            actions += [Action(ACTION.BUILD_SETTLEMENT, player_id, v) for v in
+                        sorted(self.placements.settlement_spots[player_id])]
+        if player.can_build_city():
+            actions += [Action(ACTION.BUILD_CITY, player_id, vertex.index) for vertex in
+                        sorted(self.player_buildings[player_id], key=lambda vertex: vertex.index) if not vertex.is_city]
+        in_bank = self.bank() > 0
+        for give, can_give in enumerate(player.available_exchanges()):
+            if can_give:
+                actions += [Action(ACTION.EXCHANGE, player_id, give, receive) for receive in range(5)
+                            if receive != give and in_bank[receive]]
+        return actions
+
+    def apply_action(self, action: Action, record: bool = True):
+        """
+        Takes an action for the player whose turn it is, recording it in the journal so that it can be taken back with
+        undo_action(). The action is assumed to be legal (see legal_actions()). Setup turns end by themselves once
+        their road is placed.
+        :param action: Action to take
+        :param record: False to skip the journal, e.g. when playing a game out
+        """
+        kind, player_id, target, extra = action
+        if record:
+            saves_production = kind in (ACTION.BUILD_SETTLEMENT, ACTION.BUILD_CITY, ACTION.MOVE_ROBBER)
+            self.journal.append(JournalEntry(
+                action,
+                tuple(getattr(self, name) for name in TURN_STATE),
+                tuple(player.save_state() for player in self.players),
+                self.hands.copy(),
+                self.production.copy() if saves_production else None,
+                self.robber_tile.index))
+        self.num_actions += 1
+        board = self.board
+        if kind == ACTION.ROLL:
+            self.roll(self.players[player_id], None if target == -1 else target)
+        elif kind == ACTION.BUILD_ROAD:
+            self.build_road(player_id, board.edge_list[target])
+            if self.is_game_start:
+                self.advance_turn_setup()
+        elif kind == ACTION.BUILD_SETTLEMENT:
+            self.build_settlement(player_id, board.vertex_list[target])
+        elif kind == ACTION.BUILD_CITY:
+            self.build_city(player_id, board.vertex_list[target])
+        elif kind == ACTION.MOVE_ROBBER:
+            self.move_robber(board.tile_list[target])
+            self.robber_moved_this_turn = True
+            if extra != -1:
+                self.steal(player_id, extra)
+        elif kind == ACTION.EXCHANGE:
+            self.exchange(player_id, target, extra)
+        elif kind == ACTION.END_TURN:
+            self.end_turn()
+        if self.players[player_id].victory_points >= VICTORY_POINTS_TO_WIN:
+            self.winner = player_id
+            if self.event_log is not None:
+                self.log_event(EVENT.WIN, player_id)
+
+    def undo_action(self) -> Action:
+        """
+        Takes back the most recent action taken with apply_action(), including the outcome of any dice, discards or
+        steals it involved.
+        :return: The action taken back
+        """
+        entry = self.journal.pop()
+        kind, player_id, target, _ = entry.action
+        board = self.board
+        topology = board.topology
+        if kind == ACTION.BUILD_ROAD:
+            edge = board.edge_list[target]
+            edge.player_road_id = -1
+            board.edge_owner[target] = -1
+            self._board_hash ^= self.zobrist.road[target][player_id]
+            self.player_roads[player_id].discard(edge)
+            a, b = topology.edge_endpoints[target]
+            self.placements.refresh((a, b), {target, *topology.vertex_edges[a], *topology.vertex_edges[b]})
+            self.longest_road.remove_road(player_id, target)
+        elif kind == ACTION.BUILD_SETTLEMENT:
+            vertex = board.vertex_list[target]
+            vertex.player_id = -1
+            board.vertex_owner[target] = -1
+            self._board_hash ^= self.zobrist.settlement[target][player_id]
+            self.player_buildings[player_id].discard(vertex)
+            self.placements.refresh((target,) + topology.vertex_vertices[target], topology.vertex_edges[target])
+            self.longest_road.on_settlement(player_id, target)
+        elif kind == ACTION.BUILD_CITY:
+            board.vertex_list[target].is_city = False
+            board.vertex_city[target] = False
+            self._board_hash ^= self.zobrist.city[target][player_id]
+        elif kind == ACTION.MOVE_ROBBER:
+            self._board_hash ^= self.zobrist.robber[self.robber_tile.index] ^ self.zobrist.robber[entry.robber_tile]
+            self.robber_tile.robber = False
+            self.robber_tile = board.tile_list[entry.robber_tile]
+            self.robber_tile.robber = True
+        for name, value in zip(TURN_STATE, entry.turn_state):
+            setattr(self, name, value)
+        for player, state in zip(self.players, entry.player_states):
+            player.restore_state(state)
+        # in place, since every player's resources is a view of a row
+        self.hands[:] = entry.hands
+        if entry.production is not None:
+            self.production = entry.production
+        self.state_version += 1
+        if self.event_log is not None:
+            self.log_event(EVENT.UNDO, player_id, kind)
+        return entry.action
+
+    def clone(self, rng: Optional[RandomStream] = None) -> 'Game':
+        """
+        Copies the game for search. The board's template and topology are shared, and only mutable state is copied.
+        The clone has no agents, no event log and an empty journal.
+        :param rng: Source of randomness for the clone. By default a new stream is spawned from this game's; the
+        clone never shares this game's pre-drawn dice, which would tell a search the rolls to come.
+        """
+        game = Game.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        game.rng = rng if rng is not None else self.rng.spawn()
+        board = self.board.clone()
+        game.board = board
+        game.players = [player.clone() for player in self.players]
+        game.hands = self.hands.copy()
+        game.dev_cards = self.dev_cards.copy()
+        game._state_version = list(self._state_version)
+        for player in game.players:
+            player.resources = game.hands[player.id]
+            player.dev_cards = game.dev_cards[player.id]
+            player.game_version = game._state_version
+        game._hashed_hands = self._hashed_hands.copy()
+        game._hashed_dev_cards = self._hashed_dev_cards.copy()
+        game.production = self.production.copy()
+        game.agents = {}
+        game.event_log = None
+        game.journal = []
+        game.turn_order = list(self.turn_order)
+        game.setup_turn_order = list(self.setup_turn_order)
+        game.robber_tile = board.tile_list[self.robber_tile.index]
+        game.player_buildings = defaultdict(set, {p: {board.vertex_list[v.index] for v in vertices}
+                                                  for p, vertices in self.player_buildings.items()})
+        game.player_roads = defaultdict(set, {p: {board.edge_list[e.index] for e in edges}
+                                              for p, edges in self.player_roads.items()})
+        game.longest_road = self.longest_road.clone(board)
+        game.placements = self.placements.clone(board)
+        return game
+
+    def __setstate__(self, state: dict):
+        # pickle turns each player's rows of hands and dev_cards into separate arrays, so they are bound again
+        self.__dict__.update(state)
+        for player in self.players:
+            player.resources = self.hands[player.id]
+            player.dev_cards = self.dev_cards[player.id]
+            player.game_version = self._state_version
+
+    @property
+    def state_version(self) -> int:
+        """
+        Bumped on every change to the game state, including changes players make to their own hands, so derived data
+        (e.g. masks) can be cached.
+        """
+        return self._state_version[0]
+
+    @state_version.setter
+    def state_version(self, version: int):
+        self._state_version[0] = version
+
+    def play(self, max_actions: int = 10000) -> int:
+        """
+        Lets the agents play the game out, without keeping a journal.
+        :param max_actions: Number of actions after which the game is abandoned
+        :return: The winner, or -1 if the game was abandoned
+        """
+        for _ in range(max_actions):
+            if self.winner != -1:
+                break
+            action = self.agents[self.current_turn].take_turn(self.legal_actions())
+            self.apply_action(action, record=False)
+        return self.winner
+
     def get_player(self, player_id: int) -> Player:
         return self.players[player_id]
 
     def get_agent(self, player_id: int) -> Agent:
-        assert player_id != 0
         return self.agents[player_id]
 
     def get_players(self) -> List[Player]:
         return self.players
 
     def set_robber_tile(self, tile: Tile):
-        self.robber_tile = tile
+        self.move_robber(tile)
 
 
 if __name__ == "__main__":
-    game = Game()
+    from game_window import GameWindow
+
+    game = Game(balanced=True)
     gw = GameWindow(game)
     gw.draw()
@@ -0,0 +1,270 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from constants import RESOURCE
+
+if TYPE_CHECKING:
+    from game import Game
+    from topology import BoardTopology
+
+# card counts above this share one Zobrist key (the packed state still tells them apart)
+MAX_HASHED_COUNT = 63
+# fixed, so that hashes of the same position agree across games and processes
+ZOBRIST_SEED = 0xCA7A9
+
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for every feature of a game's state. The hash of a state is the XOR of the keys of its
+    features, so a change to one feature updates the hash with one or two XORs.
+
+    Scalar keys are kept as nested lists of Python ints, for the incremental updates made by Game; card keys are
+    NumPy arrays, since card counts are diffed in bulk.
+    """
+
+    def __init__(self, num_tiles: int, num_vertices: int, num_edges: int, num_players: int):
+        rng = np.random.default_rng([ZOBRIST_SEED, num_tiles, num_vertices, num_edges, num_players])
+
+        def keys(*shape) -> np.ndarray:
+            return rng.integers(np.iinfo(np.uint64).max, size=shape, dtype=np.uint64)
+
+        # pieces on the board
+        self.settlement = keys(num_vertices, num_players).tolist()
+        self.city = keys(num_vertices, num_players).tolist()
+        self.road = keys(num_edges, num_players).tolist()
+        self.robber = keys(num_tiles).tolist()
+        # cards, indexed by [player, card type, count]
+        self.hand = keys(num_players, 5, MAX_HASHED_COUNT + 1)
+        self.dev_card = keys(num_players, 6, MAX_HASHED_COUNT + 1)
+        # turn and phase
+        self.turn = keys(num_players).tolist()
+        self.setup_turn = keys(2 * num_players).tolist()
+        self.game_start = int(keys())
+        self.setup_settlement = keys(num_vertices).tolist()
+        self.turn_flags = keys(4).tolist()
+        self.longest_road_holder = keys(num_players).tolist()
+        self.largest_army_holder = keys(num_players).tolist()
+        self.winner = keys(num_players).tolist()
+        # the board layout and seating, which never change during a game
+        self.tile_resource = keys(num_tiles, len(RESOURCE)).tolist()
+        self.tile_chit = keys(num_tiles, 13).tolist()
+        self.port = keys(num_vertices, len(RESOURCE)).tolist()
+        self.turn_order = keys(num_players, num_players).tolist()
+
+
+_zobrist_keys: Dict[Tuple[int, int, int, int], ZobristKeys] = {}
+
+
+def get_zobrist_keys(topology: 'BoardTopology', num_players: int) -> ZobristKeys:
+    """
+    Returns the Zobrist keys for games on boards of one topology with a given number of players, creating them the
+    first time they are asked for.
+    """
+    shape = (topology.num_tiles, topology.num_vertices, topology.num_edges, num_players)
+    if shape not in _zobrist_keys:
+        _zobrist_keys[shape] = ZobristKeys(*shape)
+    return _zobrist_keys[shape]
+
+
+def card_hash(card_keys: np.ndarray, cards: np.ndarray) -> int:
+    """
+    Hash of every player's count of every card type.
+    """
+    players, kinds = np.indices(cards.shape)
+    return int(np.bitwise_xor.reduce(card_keys[players, kinds, np.clip(cards, 0, MAX_HASHED_COUNT)], axis=None))
+
+
+def card_hash_delta(card_keys: np.ndarray, cards: np.ndarray, hashed: np.ndarray) -> int:
+    """
+    Change in card_hash() between the counts last hashed and the current counts, which are then copied into hashed.
+    Only the counts that differ are looked at.
+    """
+    players, kinds = np.nonzero(cards != hashed)
+    if not len(players):
+        return 0
+    old = np.clip(hashed[players, kinds], 0, MAX_HASHED_COUNT)
+    new = np.clip(cards[players, kinds], 0, MAX_HASHED_COUNT)
+    hashed[players, kinds] = cards[players, kinds]
+    return int(np.bitwise_xor.reduce(card_keys[players, kinds, old] ^ card_keys[players, kinds, new]))
+
+
+def layout_hash(game: 'Game') -> int:
+    """
+    Hash of the parts of a game fixed when it starts: resources, chits, ports and turn order.
+    """
+    keys = game.zobrist
+    h = 0
+    for tile in game.board.tile_list:
+        h ^= keys.tile_resource[tile.index][tile.resource]
+        if tile.dice_num != -1:
+            h ^= keys.tile_chit[tile.index][tile.dice_num]
+    for v, resource in enumerate(game.board.vertex_port.tolist()):
+        if resource != -1:
+            h ^= keys.port[v][resource]
+    for seat, player_id in enumerate(game.turn_order):
+        h ^= keys.turn_order[seat][player_id]
+    return h
+
+
+def turn_hash(game: 'Game') -> int:
+    """
+    Hash of whose turn it is and what has happened in it. These are a handful of scalars set all over Game, so they
+    are hashed from scratch when the hash is asked for instead of being tracked.
+    """
+    keys = game.zobrist
+    h = keys.turn[game.current_turn]
+    if game.is_game_start:
+        h ^= keys.game_start ^ keys.setup_turn[game.current_setup_turn_idx]
+        if game.setup_settlement != -1:
+            h ^= keys.setup_settlement[game.setup_settlement]
+    for flag, key in zip((game.dice_rolled_this_turn, game.robber_moved_this_turn, game.stole_this_turn,
+                          game.seven_rolled_this_turn), keys.turn_flags):
+        if flag:
+            h ^= key
+    if game.longest_road_holder != -1:
+        h ^= keys.longest_road_holder[game.longest_road_holder]
+    if (holder := largest_army_holder(game)) != -1:
+        h ^= keys.largest_army_holder[holder]
+    if game.winner != -1:
+        h ^= keys.winner[game.winner]
+    return h
+
+
+def full_hash(game: 'Game') -> int:
+    """
+    Computes Game.state_hash from scratch.
+    """
+    keys = game.zobrist
+    board = game.board
+    h = layout_hash(game) ^ keys.robber[game.robber_tile.index]
+    for vertex in board.vertex_list:
+        if vertex.player_id != -1:
+            h ^= keys.settlement[vertex.index][vertex.player_id]
+            if vertex.is_city:
+                h ^= keys.city[vertex.index][vertex.player_id]
+    for edge in board.edge_list:
+        if edge.player_road_id != -1:
+            h ^= keys.road[edge.index][edge.player_road_id]
+    h ^= card_hash(keys.hand, game.hands) ^ card_hash(keys.dev_card, game.dev_cards)
+    return h ^ turn_hash(game)
+
+
+def largest_army_holder(game: 'Game') -> int:
+    return next((player.id for player in game.players if player.has_largest_army), -1)
+
+
+_state_dtypes: Dict[Tuple[int, int, int, int], np.dtype] = {}
+
+
+def state_dtype(topology: 'BoardTopology', num_players: int) -> np.dtype:
+    """
+    Structured dtype holding everything mutable in a game, plus the layout it is played on, at a fixed size for a
+    given board topology and number of players.
+    """
+    shape = (topology.num_tiles, topology.num_vertices, topology.num_edges, num_players)
+    if shape not in _state_dtypes:
+        num_tiles, num_vertices, num_edges, _ = shape
+        _state_dtypes[shape] = np.dtype([
+            ('tile_resource', np.int8, num_tiles),
+            ('tile_chit', np.int8, num_tiles),
+            ('vertex_port', np.int8, num_vertices),
+            ('turn_order', np.int8, num_players),
+            ('vertex_owner', np.int8, num_vertices),
+            ('vertex_city', np.bool_, num_vertices),
+            ('edge_owner', np.int8, num_edges),
+            ('robber_tile', np.int16),
+            ('hands', np.int16, (num_players, 5)),
+            ('dev_cards', np.int16, (num_players, 6)),
+            ('turn', np.int8),
+            ('is_game_start', np.bool_),
+            ('setup_turn', np.int8),
+            ('setup_settlement', np.int16),
+            # dice rolled, robber moved, stole, seven rolled
+            ('turn_flags', np.bool_, 4),
+            ('longest_road_holder', np.int8),
+            ('largest_army_holder', np.int8),
+            ('winner', np.int8),
+        ])
+    return _state_dtypes[shape]
+
+
+def pack_state(game: 'Game', out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Packs a game's state into a record of state_dtype(). Two games are in the same position exactly when their packed
+    states are equal.
+    :param game: Game to pack
+    :param out: Record (e.g. one element of a larger array of states) to pack into; a new one is made if not given
+    :return: The packed record
+    """
+    board = game.board
+    if out is None:
+        out = np.zeros((), dtype=state_dtype(board.topology, game.num_players))
+    out['tile_resource'] = board.tile_resource
+    out['tile_chit'] = board.tile_chit
+    out['vertex_port'] = board.vertex_port
+    out['turn_order'] = game.turn_order
+    out['vertex_owner'] = board.vertex_owner
+    out['vertex_city'] = board.vertex_city
+    out['edge_owner'] = board.edge_owner
+    out['robber_tile'] = game.robber_tile.index
+    out['hands'] = game.hands
+    out['dev_cards'] = game.dev_cards
+    out['turn'] = game.current_turn
+    out['is_game_start'] = game.is_game_start
+    out['setup_turn'] = game.current_setup_turn_idx if game.is_game_start else 0
+    out['setup_settlement'] = game.setup_settlement if game.is_game_start else -1
+    out['turn_flags'] = (game.dice_rolled_this_turn, game.robber_moved_this_turn, game.stole_this_turn,
+                         game.seven_rolled_this_turn)
+    out['longest_road_holder'] = game.longest_road_holder
+    out['largest_army_holder'] = largest_army_holder(game)
+    out['winner'] = game.winner
+    return out
+
+
+def state_bytes(game: 'Game') -> bytes:
+    """
+    The packed state as bytes, for use as a dictionary key or for deduplicating positions.
+    """
+    return pack_state(game).tobytes()
+
+
+class TranspositionTable:
+    """
+    Maps positions (usually Game.state_hash) to search results, evicting the least recently used entry once it holds
+    capacity entries.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entries = self.entries
+        if key in entries:
+            self.hits += 1
+            entries.move_to_end(key)
+            return entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any):
+        entries = self.entries
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -1,18 +1,22 @@
 import math
+import time
 import tkinter
-from collections import deque, Counter
+from collections import deque, defaultdict
 from math import sqrt
 from tkinter import LEFT, RIGHT, TOP, Y, ttk, DISABLED, NORMAL
-from turtle import RawTurtle
-from typing import Tuple, List
+from typing import Tuple, List, NamedTuple, Optional, TYPE_CHECKING
 from statistics import mean
 
-from PIL import Image, ImageTk
+import numpy as np
 
 from constants import PLAYERCOLOR, RESOURCE
-from port import Port
+import sprite_cache
 from vertex import Vertex
 
+if TYPE_CHECKING:
+    from board import Board
+    from game import Game
+
 ROOT3_OVER_2 = sqrt(3) / 2
 
 FONT_SIZE = 18
@@ -50,25 +54,46 @@ def hex_to_rect(coord):
     return x * SIDE, y * SIDE
 
 
-def hexagon(turtle, radius, color, dice_num):
-    clone = turtle.clone()  # so we don't affect turtle's state
-    clone.setheading(-30)
-    clone.color('black', color)
-    clone.pendown()
-    clone.begin_fill()
-    clone.left(90)
-    for i in range(6):
-        clone.forward(radius)
-        clone.left(60)
-    clone.end_fill()
-    clone.penup()
-    clone.left(60)
-    clone.forward(R)
-    p = clone.pos()
-    if dice_num != -1:
-        clone.color('red' if dice_num in {6, 8} else 'black')
-        clone.write(str(dice_num), align="center", font=("Arial", SIDE // 2, "normal"))
-    return clone, p
+# corners of a hexagon around its center, starting from the rightmost and going around
+HEX_CORNERS = np.array([(math.cos(math.radians(a)), math.sin(math.radians(a))) for a in range(0, 360, 60)]) * R
+
+
+class BoardGeometry(NamedTuple):
+    """
+    Where everything on a board goes on the canvas, in canvas coordinates (y pointing down) with the center tile at
+    the origin. Arrays are indexed by the dense ids of the board's topology.
+    """
+    # tile x (x, y)
+    tile_centers: np.ndarray
+    # tile x corner x (x, y)
+    hexagons: np.ndarray
+    # vertex x (x, y)
+    vertices: np.ndarray
+    # edge x (x, y), the middle of every edge
+    edges: np.ndarray
+    # edge -> angle in degrees to rotate a road icon by to lie along the edge
+    edge_angles: List[int]
+
+
+def board_geometry(board: 'Board') -> BoardGeometry:
+    """
+    Computes the canvas position of every tile, vertex and edge of a board at once.
+    """
+    topology = board.topology
+    n = board.board_size
+    center = hex_to_rect((n, n))
+    tile_centers = np.array([hex_to_rect(coords) for coords in topology.tile_coords]) - center
+    # hex_to_rect() has y pointing up
+    tile_centers[:, 1] *= -1
+    hexagons = tile_centers[:, None, :] + HEX_CORNERS
+    # a vertex is the corner shared by its three tiles, an edge the middle of its two vertices
+    vertices = tile_centers[np.array(topology.vertex_tiles)].mean(axis=1)
+    endpoints = vertices[topology.edge_vertices]
+    edges = endpoints.mean(axis=1)
+    delta = endpoints[:, 1] - endpoints[:, 0]
+    slopes = delta[:, 1] / delta[:, 0]
+    edge_angles = [0 if abs(slope) < 1e-9 else (60 if slope > 0 else -60) for slope in slopes.tolist()]
+    return BoardGeometry(tile_centers, hexagons, vertices, edges, edge_angles)
 
 
 def rotate(points, angle, center):
@@ -86,17 +111,43 @@ def rotate(points, angle, center):
     return new_points
 
 
+# Tk root every window of the process is opened under, so that they can share Tk images (see sprite_cache)
+_tk_root: Optional[tkinter.Tk] = None
+
+
+def _open_window() -> Tuple[tkinter.Tk, tkinter.Wm]:
+    """
+    Opens a new top-level window under the process's Tk root. The first window, or the first after the root was
+    closed, is the root itself.
+    :return: The root, and the new window
+    """
+    global _tk_root
+    try:
+        if _tk_root is not None and _tk_root.winfo_exists():
+            return _tk_root, tkinter.Toplevel(_tk_root)
+    except tkinter.TclError:
+        # the root has been destroyed
+        pass
+    _tk_root = tkinter.Tk()
+    return _tk_root, _tk_root
+
+
 class GameWindow:
 
     def __init__(self, game: 'Game'):
+        # for measuring the time until the board first appears
+        self.created_at = time.perf_counter()
+        self.time_to_first_frame = None
         self.game = game
         self.board = game.board
 
-        self.root = tkinter.Tk()
+        self.tk_root, self.root = _open_window()
         self.root.geometry("1500x1000")
 
         # Create canvas
         self.canvas = tkinter.Canvas(self.root, width=1000, height=1000, bg="white")
+        # put the origin, where the center tile goes, in the middle of the canvas
+        self.canvas.config(scrollregion=(-500, -500, 500, 500))
         self.canvas.pack(side="left", fill="both", expand=True)
 
         # Create frame for menu
@@ -198,6 +249,12 @@ class GameWindow:
         self.vertex_at_canvas_position = {}
         self.edge_at_canvas_position = {}
 
+        # render-only data, keyed by the dense ids of tiles/vertices/edges, so board objects stay compact
+        self.tile_canvas_pos = {}
+        self.vertex_canvas_pos = {}
+        self.edge_canvas_pos = {}
+        self.edge_rotation_angle = {}
+
         # object ids of placeholder sprites, indicating a spot is open for a settlement/road
         self.canvas_phantom_settlements = {}
         self.canvas_phantom_roads = {}
@@ -210,103 +267,10 @@ class GameWindow:
 
     def draw(self) -> None:
         self.display_text("drawing board...")
-
-        tortoise = RawTurtle(self.canvas)
-        tortoise.speed('fastest')
-        tortoise.hideturtle()
-        tortoise.penup()
-
-        icon_stack = deque([])
-
-        # Keep track of positions of hexagon centers on canvas for later use
-        # This will tell us exactly where all the vertices are, too
-        tile_positions = {}
-
-        # Need to draw "bridges" between port icons and the actual port vertices
-        lines_to_draw = deque([])
-
-        # Plot the points
-        x_off, y_off = hex_to_rect((self.board.board_size, self.board.board_size, -2 * self.board.board_size))
-        y_off += ROOT3_OVER_2 * SIDE
-        x_off -= SIDE / 2
-        for tile in self.board.get_tiles():
-            color = color_map[tile.resource.value]
-            pos = hex_to_rect(tile.coords)
-            pos = (pos[0] - x_off, pos[1] - y_off)
-            tortoise.goto(pos)
-            clone, p = hexagon(tortoise, SIDE, color, self.board.get_tile(tile.coords[0], tile.coords[1]).dice_num)
-            tile_positions[tile.coords] = p
-            tile.canvas_pos = p
-            if tile.resource == RESOURCE.WATER:
-                ports = [v for v in tile.vertices if isinstance(v, Port)]
-                c = Counter([v.resource for v in ports])
-                pr = max(c, key=c.get)
-                ports_of_resource_in_question = [v for v in ports if v.resource == pr]
-                if tile.resource == RESOURCE.WATER and c[pr] >= 2:
-                    # could be 3 ports of same resource, but port tile only "owns" two of them
-                    if c[pr] == 2 and self.board.vertices_are_adjacent(ports_of_resource_in_question[0],
-                                                                       ports_of_resource_in_question[1]):
-                        icon_stack.append((clone.pos(), self.sprites[pr.name.lower()]))
-                        lines_to_draw.append((clone.pos(), ports_of_resource_in_question[0].vertex_id))
-                        lines_to_draw.append((clone.pos(), ports_of_resource_in_question[1].vertex_id))
-                    elif c[pr] == 3:
-                        if self.board.vertices_are_adjacent(ports_of_resource_in_question[0],
-                                                            ports_of_resource_in_question[1]):
-                            icon_stack.append((clone.pos(), self.sprites[pr.name.lower()]))
-                            lines_to_draw.append((clone.pos(), ports_of_resource_in_question[0].vertex_id))
-                            lines_to_draw.append((clone.pos(), ports_of_resource_in_question[1].vertex_id))
-                        elif self.board.vertices_are_adjacent(ports_of_resource_in_question[1],
-                                                              ports_of_resource_in_question[2]):
-                            icon_stack.append((clone.pos(), self.sprites[pr.name.lower()]))
-                            lines_to_draw.append((clone.pos(), ports_of_resource_in_question[1].vertex_id))
-                            lines_to_draw.append((clone.pos(), ports_of_resource_in_question[2].vertex_id))
-                        elif self.board.vertices_are_adjacent(ports_of_resource_in_question[0],
-                                                              ports_of_resource_in_question[2]):
-                            icon_stack.append((clone.pos(), self.sprites[pr.name.lower()]))
-                            lines_to_draw.append((clone.pos(), ports_of_resource_in_question[0].vertex_id))
-                            lines_to_draw.append((clone.pos(), ports_of_resource_in_question[2].vertex_id))
-
-        # calculate canvas positions of vertices/edges for future drawing
-        for vertex in self.board.get_vertices():
-            # average of tile center positions
-            tile_pos_list = [tile.canvas_pos for tile in self.board.get_tiles_from_vertex(vertex)]
-            vertex.canvas_pos = ((tile_pos_list[0][0] + tile_pos_list[1][0] + tile_pos_list[2][0]) / 3,
-                                 (tile_pos_list[0][1] + tile_pos_list[1][1] + tile_pos_list[2][1]) / 3)
-            vertex_canvas_pos = vertex.canvas_pos
-            self.canvas_phantom_settlements[vertex_canvas_pos] = self.create_settlement_icon(vertex_canvas_pos[0],
-                                                                                             vertex_canvas_pos[1], '',
-                                                                                             state='hidden')
-            self.vertex_at_canvas_position[str(vertex_canvas_pos)] = vertex
-
-        for edge in self.board.get_edges():
-            # average of vertex positions
-            vertex_pos_list = [v.canvas_pos for v in self.board.get_vertices_from_edge(edge)]
-            edge.canvas_pos = ((vertex_pos_list[0][0] + vertex_pos_list[1][0]) / 2,
-                               (vertex_pos_list[0][1] + vertex_pos_list[1][1]) / 2)
-            edge_canvas_pos = edge.canvas_pos
-            self.edge_at_canvas_position[str(edge_canvas_pos)] = edge
-            slope = (vertex_pos_list[1][1] - vertex_pos_list[0][1]) / (vertex_pos_list[1][0] - vertex_pos_list[0][0])
-            rotation_angle = (0 if slope == 0.0 else (60 if slope > 0 else -60))
-            edge.rotation_angle = rotation_angle
-            self.canvas_phantom_roads[edge_canvas_pos] = self.create_road_icon(edge_canvas_pos[0], edge_canvas_pos[1],
-                                                                               rotation_angle, '', state='hidden')
-
-        clone = tortoise.clone()
-        clone.color(COLOR_BRIDGE)
-        clone.pensize(5)
-        while lines_to_draw:
-            p1, vert_id = lines_to_draw.popleft()
-            p2 = tuple(sum(x) / 3 for x in zip(*[tile_positions[x] for x in vert_id]))
-            clone.penup()
-            clone.goto(p1)
-            clone.pendown()
-            clone.goto(p2)
-        clone.penup()
-        while icon_stack:
-            pos, spr = icon_stack.pop()
-            img_item = self.canvas.create_image(pos, image=spr)
-            self.canvas.tag_bind(img_item, '<Button-1>',
-                                 lambda event, pos=pos: print(f"Image clicked at position: x={pos[0]}, y={pos[1]}"))
+        self.draw_board()
+        # flush the drawing to the screen before measuring
+        self.root.update_idletasks()
+        self.time_to_first_frame = time.perf_counter() - self.created_at
 
         def check_for_updates():
             while self.update_stack:
@@ -315,7 +279,7 @@ class GameWindow:
             self.root.update_idletasks()
             self.root.after(100, check_for_updates)
 
-        self.display_text("done")
+        self.display_text(f"done in {1000 * self.time_to_first_frame:.0f} ms")
 
         self.setup_turn(0)
 
@@ -323,6 +287,55 @@ class GameWindow:
 
         self.root.mainloop()
 
+    def draw_board(self):
+        """
+        Draws the tiles, chits, ports and the hidden placeholders for settlements and roads, all directly as canvas
+        items from precomputed coordinates, and records where every vertex and edge is for later drawing.
+        """
+        geometry = board_geometry(self.board)
+        chit_font = ("Arial", SIDE // 2, "normal")
+        for tile, corners, center in zip(self.board.tile_list, geometry.hexagons.tolist(),
+                                         geometry.tile_centers.tolist()):
+            self.canvas.create_polygon(corners, fill=color_map[tile.resource.value], outline='black')
+            if tile.dice_num != -1:
+                self.canvas.create_text(center, text=str(tile.dice_num), anchor='s', font=chit_font,
+                                        fill='red' if tile.dice_num in {6, 8} else 'black')
+            self.tile_canvas_pos[tile.index] = tuple(center)
+
+        for vertex, pos in zip(self.board.vertex_list, geometry.vertices.tolist()):
+            pos = tuple(pos)
+            self.vertex_canvas_pos[vertex.index] = pos
+            self.canvas_phantom_settlements[pos] = self.create_settlement_icon(pos[0], pos[1], '', state='hidden')
+            self.vertex_at_canvas_position[str(pos)] = vertex
+
+        for edge, pos, angle in zip(self.board.edge_list, geometry.edges.tolist(), geometry.edge_angles):
+            pos = tuple(pos)
+            self.edge_canvas_pos[edge.index] = pos
+            self.edge_at_canvas_position[str(pos)] = edge
+            self.edge_rotation_angle[edge.index] = angle
+            self.canvas_phantom_roads[pos] = self.create_road_icon(pos[0], pos[1], angle, '', state='hidden')
+
+        # a port's icon sits on the water tile beside its two vertices, with "bridges" to both of them
+        topology = self.board.topology
+        port_pairs = defaultdict(list)
+        for v, pair in self.board.template.port_slots.items():
+            port_pairs[pair].append(v)
+        icons = []
+        for vertices in port_pairs.values():
+            if len(vertices) != 2:
+                continue
+            v1, v2 = vertices
+            water = next(t for t in set(topology.vertex_tiles[v1]) & set(topology.vertex_tiles[v2])
+                         if topology.tile_water[t])
+            pos = self.tile_canvas_pos[water]
+            for v in vertices:
+                self.canvas.create_line(pos, self.vertex_canvas_pos[v], fill=COLOR_BRIDGE, width=5, capstyle='round')
+            icons.append((pos, self.sprites[RESOURCE(self.board.vertex_port[v1]).name.lower()]))
+        for pos, sprite in icons:
+            img_item = self.canvas.create_image(pos, image=sprite)
+            self.canvas.tag_bind(img_item, '<Button-1>',
+                                 lambda event, pos=pos: print(f"Image clicked at position: x={pos[0]}, y={pos[1]}"))
+
     def create_settlement_icon(self, center_x, center_y, fill, state='normal'):
         settlement_size = 7
 
@@ -348,38 +361,8 @@ class GameWindow:
         return self.canvas.create_polygon(points, fill=fill, outline="black", state=state)
 
     def _load_sprites(self):
-        grain = Image.open("sprites/grain.png")
-        grain = grain.resize((32, 32), Image.LANCZOS)
-        self.sprites['grain'] = ImageTk.PhotoImage(grain)
-
-        brick = Image.open("sprites/brick.png")
-        brick = brick.resize((32, 32), Image.LANCZOS)
-        self.sprites['brick'] = ImageTk.PhotoImage(brick)
-
-        lumber = Image.open("sprites/lumber.png")
-        lumber = lumber.resize((32, 32), Image.LANCZOS)
-        self.sprites['lumber'] = ImageTk.PhotoImage(lumber)
-
-        ore = Image.open("sprites/ore.png")
-        ore = ore.resize((32, 32), Image.LANCZOS)
-        self.sprites['ore'] = ImageTk.PhotoImage(ore)
-
-        wool = Image.open("sprites/wool.png")
-        wool = wool.resize((32, 32), Image.LANCZOS)
-        self.sprites['wool'] = ImageTk.PhotoImage(wool)
-
-        any = Image.open("sprites/any.png")
-        any = any.resize((32, 32), Image.LANCZOS)
-        self.sprites['any'] = ImageTk.PhotoImage(any)
-
-        for x in ['red', 'orange', 'blue', 'green', 'white', 'brown']:
-            settlement = Image.open(f"sprites/settlements/settlement_{x}.png")
-            settlement = settlement.resize((20, 20), Image.LANCZOS)
-            self.sprites[f'settlement_{x}'] = ImageTk.PhotoImage(settlement)
-
-        settlement = Image.open(f"sprites/settlements/settlement_placeholder.png")
-        settlement = settlement.resize((20, 20), Image.LANCZOS)
-        self.sprites['settlement_placeholder'] = ImageTk.PhotoImage(settlement)
+        # shared with every other window, since they all live under the same root
+        self.sprites = dict(sprite_cache.load_photo_images(self.tk_root))
 
     def display_text(self, text: str):
         self.display.configure(state=NORMAL)
@@ -457,7 +440,7 @@ class GameWindow:
     def user_show_available_setup_settlement_spots(self, continuation):
         # icons should place a settlement when clicked
         for vertex_obj in self.game.get_available_settlement_spots(0):
-            pos = vertex_obj.canvas_pos
+            pos = self.vertex_canvas_pos[vertex_obj.index]
             self.canvas.itemconfigure(self.canvas_phantom_settlements[pos], state='normal')
             self.canvas.tag_bind(self.canvas_phantom_settlements[pos], "<Button-1>",
                                  lambda x, pos=pos: self.user_build_setup_settlement(pos, continuation))
@@ -465,8 +448,8 @@ class GameWindow:
 
     def user_show_available_road_spots(self, continuation):
         available_road_spots = self.game.get_available_road_spots(self.game.players[self.game.current_turn].id)
-        positions = [e.canvas_pos for e in available_road_spots]
-        for pos in [e.canvas_pos for e in available_road_spots]:
+        positions = [self.edge_canvas_pos[e.index] for e in available_road_spots]
+        for pos in positions:
             def on_build_setup_road(x, pos=pos):
                 self.user_build_road(pos)
                 continuation()
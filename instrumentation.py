@@ -0,0 +1,195 @@
+"""
+Opt-in timers and counters on the engine's hot paths.
+
+enable() wraps the methods in INSTRUMENTED so that every call records its latency and the number of memory blocks it
+left allocated (sys.getallocatedblocks()); disable() puts the original methods back, so instrumentation costs nothing
+while it is off. Calls are timed inclusively, e.g. Game.apply_action includes the Game.roll it makes.
+
+Latencies are kept in a histogram with four buckets per doubling, so percentiles are accurate to within about 10%,
+memory stays constant however many calls are made, and snapshots from many processes merge exactly:
+
+    instrumentation.enable()
+    game.play()
+    print(json.dumps(instrumentation.snapshot(), indent=2))
+"""
+import functools
+import json
+import math
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from board import Board
+from game import Game
+from player import Mask
+
+# class -> names of the methods to instrument
+INSTRUMENTED: Dict[type, Tuple[str, ...]] = {
+    Game: ('apply_action', 'legal_actions', 'roll', 'build_settlement', 'build_road', 'build_city', 'move_robber',
+           'steal', 'exchange', 'advance_turn', 'advance_turn_setup', 'advance_turn_non_setup',
+           'get_available_road_spots', 'get_available_settlement_spots'),
+    Board: ('check_longest_road',),
+    Mask: tuple(name for name in vars(Mask) if name.endswith('_mask') and not name.startswith('_')),
+}
+PERCENTILES = (50, 90, 99)
+# histogram buckets per doubling of latency
+BUCKETS_PER_OCTAVE = 4
+
+# 'Class.method' -> stats of the calls made while enabled
+_stats: Dict[str, 'OperationStats'] = {}
+# (class, name, original method) for every method currently wrapped
+_originals: List[Tuple[type, str, Callable]] = []
+# blocks the wrapper itself holds when it counts, measured on a function that allocates nothing
+_allocation_bias = 0
+
+
+class OperationStats:
+    """
+    Counters of every call to one method.
+    """
+    __slots__ = ('count', 'total', 'max', 'blocks', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        # seconds spent in all calls
+        self.total = 0.0
+        self.max = 0.0
+        # net memory blocks left allocated by all calls
+        self.blocks = 0
+        # bucket -> number of calls whose latency fell in it
+        self.histogram: Dict[int, int] = {}
+
+    def record(self, seconds: float, blocks: int):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.blocks += blocks
+        bucket = int(math.log2(seconds * 1e9) * BUCKETS_PER_OCTAVE) if seconds > 1e-9 else 0
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Latency in seconds below which q% of calls fell, taken from the middle of its histogram bucket.
+        """
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= rank:
+                return 2 ** ((bucket + 0.5) / BUCKETS_PER_OCTAVE) / 1e9
+        return 0.0
+
+    def to_dict(self) -> Dict:
+        result = {'count': self.count, 'total': self.total, 'mean': self.total / self.count if self.count else 0.0,
+                  'max': self.max, 'blocks': self.blocks}
+        for q in PERCENTILES:
+            result[f'p{q}'] = self.percentile(q)
+        result['histogram'] = {str(bucket): count for bucket, count in sorted(self.histogram.items())}
+        return result
+
+    def merge_dict(self, data: Dict):
+        """
+        Adds the calls counted in a snapshot entry (see to_dict()) to these.
+        """
+        self.count += data['count']
+        self.total += data['total']
+        self.max = max(self.max, data['max'])
+        self.blocks += data['blocks']
+        for bucket, count in data['histogram'].items():
+            self.histogram[int(bucket)] = self.histogram.get(int(bucket), 0) + count
+
+
+def _wrap(name: str, method: Callable) -> Callable:
+    stats = _stats.setdefault(name, OperationStats())
+    record = stats.record
+    perf_counter = time.perf_counter
+    allocated_blocks = sys.getallocatedblocks
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        blocks = allocated_blocks()
+        start = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            record(perf_counter() - start, allocated_blocks() - blocks - _allocation_bias)
+    return wrapper
+
+
+def _calibrate():
+    """
+    Measures the blocks the wrapper's own bookkeeping (e.g. the arguments tuple) holds while it counts, by wrapping a
+    method that allocates nothing.
+    """
+    global _allocation_bias
+    _allocation_bias = 0
+    noop = _wrap('', lambda self: None)
+    for _ in range(1000):
+        noop(None)
+    stats = _stats.pop('')
+    _allocation_bias = round(stats.blocks / stats.count)
+
+
+def enable():
+    """
+    Starts recording every call to the methods in INSTRUMENTED. Counts carry on from any earlier recording; see
+    reset().
+    """
+    if _originals:
+        return
+    _calibrate()
+    for cls, names in INSTRUMENTED.items():
+        for name in names:
+            method = vars(cls)[name]
+            _originals.append((cls, name, method))
+            setattr(cls, name, _wrap(f'{cls.__name__}.{name}', method))
+
+
+def disable():
+    """
+    Stops recording, putting the original methods back. The counts so far are kept.
+    """
+    while _originals:
+        cls, name, method = _originals.pop()
+        setattr(cls, name, method)
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+def reset():
+    """
+    Clears every count.
+    """
+    for stats in _stats.values():
+        stats.__init__()
+
+
+def snapshot() -> Dict[str, Dict]:
+    """
+    Counts of every method called since the last reset(), as a JSON-serializable dict: 'Class.method' -> call count,
+    total, mean, max and percentile latencies in seconds, net blocks allocated, and the latency histogram.
+    """
+    return {name: stats.to_dict() for name, stats in sorted(_stats.items()) if stats.count}
+
+
+def merge(snapshots: Iterable[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """
+    Combines snapshots, e.g. from many simulation workers, into one as if all their calls had been made in one process.
+    """
+    merged: Dict[str, OperationStats] = {}
+    for snap in snapshots:
+        for name, data in snap.items():
+            merged.setdefault(name, OperationStats()).merge_dict(data)
+    return {name: stats.to_dict() for name, stats in sorted(merged.items())}
+
+
+def write_snapshot(path: str, snap: Optional[Dict[str, Dict]] = None):
+    """
+    Writes a snapshot (by default of the counts so far) to a JSON file.
+    """
+    with open(path, 'w') as file:
+        json.dump(snapshot() if snap is None else snap, file, indent=2)
+        file.write('\n')
@@ -0,0 +1,183 @@
+from typing import Dict, Iterable, List, Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from board import Board
+
+
+def connected_roads(board: 'Board', player_id: int, edge: int) -> Set[int]:
+    """
+    Given a road (edge id) built by a player, returns the ids of all of that player's roads that can be reached from
+    it without passing through another player's settlement or city.
+    """
+    topology = board.topology
+    vertex_list = board.vertex_list
+    edge_list = board.edge_list
+    res = {edge}
+    stack = [edge]
+    while stack:
+        e = stack.pop()
+        for v in topology.edge_endpoints[e]:
+            if vertex_list[v].player_id not in (-1, player_id):
+                continue
+            for f in topology.vertex_edges[v]:
+                if f not in res and edge_list[f].player_road_id == player_id:
+                    res.add(f)
+                    stack.append(f)
+    return res
+
+
+def longest_trail(board: 'Board', player_id: int, roads: Iterable[int]) -> int:
+    """
+    Length of the longest trail (a walk that uses every road at most once) through a set of connected roads. A trail
+    may end at, but not pass through, a vertex where another player has built.
+
+    This is the unweighted longest path problem, which is NP-Hard in general, but a player has at most 15 roads, so an
+    exhaustive search from every vertex of the component is cheap. Used roads are tracked in a bitmask.
+    """
+    topology = board.topology
+    vertex_list = board.vertex_list
+    roads = list(roads)
+    bit = {e: 1 << i for i, e in enumerate(roads)}
+    # vertex -> [(bit of road, vertex at the other end of road)]
+    adjacency: Dict[int, List] = {}
+    for e in roads:
+        a, b = topology.edge_endpoints[e]
+        adjacency.setdefault(a, []).append((bit[e], b))
+        adjacency.setdefault(b, []).append((bit[e], a))
+    blocked = {v for v in adjacency if vertex_list[v].player_id not in (-1, player_id)}
+
+    def extend(v: int, used: int) -> int:
+        best = 0
+        for mask, w in adjacency[v]:
+            if not used & mask:
+                length = 1 if w in blocked else 1 + extend(w, used | mask)
+                if length > best:
+                    best = length
+        return best
+
+    best = 0
+    for v in adjacency:
+        best = max(best, extend(v, 0))
+        if best == len(roads):
+            break
+    return best
+
+
+class LongestRoad:
+    """
+    Tracks every player's road network and the exact length of each player's longest road.
+
+    Roads of the same player are grouped into components with a union-find over edge ids; two roads join when they
+    share a vertex that no other player has built on. The longest trail of each component is cached and only
+    recomputed when the component changes: when a road is added, or when another player's settlement splits it.
+    """
+
+    def __init__(self, board: 'Board', num_players: int):
+        self.board = board
+        self.topology = board.topology
+        # union-find over edge ids; only entries for edges with roads are meaningful
+        self.parent = list(range(self.topology.num_edges))
+        self.roads: List[Set[int]] = [set() for _ in range(num_players)]
+        # per player: component root -> edges in the component
+        self.members: List[Dict[int, Set[int]]] = [{} for _ in range(num_players)]
+        # per player: component root -> longest trail in the component
+        self.lengths: List[Dict[int, int]] = [{} for _ in range(num_players)]
+
+    def clone(self, board: 'Board') -> 'LongestRoad':
+        """
+        Copies the tracked road networks for a clone of the board.
+        """
+        longest_road = LongestRoad.__new__(LongestRoad)
+        longest_road.board = board
+        longest_road.topology = self.topology
+        longest_road.parent = list(self.parent)
+        longest_road.roads = [set(roads) for roads in self.roads]
+        longest_road.members = [{root: set(edges) for root, edges in members.items()} for members in self.members]
+        longest_road.lengths = [dict(lengths) for lengths in self.lengths]
+        return longest_road
+
+    def longest_road(self, player_id: int) -> int:
+        return max(self.lengths[player_id].values(), default=0)
+
+    def _find(self, e: int) -> int:
+        parent = self.parent
+        while parent[e] != e:
+            parent[e] = parent[parent[e]]
+            e = parent[e]
+        return e
+
+    def _union(self, player_id: int, e1: int, e2: int) -> int:
+        """
+        Merges the components of two roads, returning the root of the merged component. The cached length of the
+        absorbed component is dropped.
+        """
+        r1, r2 = self._find(e1), self._find(e2)
+        if r1 == r2:
+            return r1
+        members = self.members[player_id]
+        if len(members[r1]) < len(members[r2]):
+            r1, r2 = r2, r1
+        self.parent[r2] = r1
+        members[r1] |= members.pop(r2)
+        self.lengths[player_id].pop(r2, None)
+        return r1
+
+    def _joinable_roads(self, player_id: int, e: int) -> Iterable[int]:
+        """
+        Roads of the same player that touch road e at a vertex not occupied by another player.
+        """
+        vertex_list = self.board.vertex_list
+        roads = self.roads[player_id]
+        for v in self.topology.edge_endpoints[e]:
+            if vertex_list[v].player_id not in (-1, player_id):
+                continue
+            for f in self.topology.vertex_edges[v]:
+                if f != e and f in roads:
+                    yield f
+
+    def add_road(self, player_id: int, edge: int):
+        """
+        Records a new road and updates the longest trail of the component it joins.
+        """
+        self.roads[player_id].add(edge)
+        self.parent[edge] = edge
+        self.members[player_id][edge] = {edge}
+        root = edge
+        for f in list(self._joinable_roads(player_id, edge)):
+            root = self._union(player_id, root, f)
+        self.lengths[player_id][root] = longest_trail(self.board, player_id, self.members[player_id][root])
+
+    def remove_road(self, player_id: int, edge: int):
+        """
+        Forgets a road that was taken back, which may split its component.
+        """
+        self.roads[player_id].discard(edge)
+        self.rebuild(player_id)
+
+    def on_settlement(self, player_id: int, vertex: int):
+        """
+        A settlement built by one player can cut another player's road in two. Rebuilds the components of any player
+        who had more than one road through the vertex. Also called when the settlement is taken back, since the same
+        components may then join up again.
+        """
+        for other, roads in enumerate(self.roads):
+            if other == player_id:
+                continue
+            if sum(1 for f in self.topology.vertex_edges[vertex] if f in roads) > 1:
+                self.rebuild(other)
+
+    def rebuild(self, player_id: int):
+        """
+        Recomputes a player's components and their longest trails from scratch.
+        """
+        self.members[player_id].clear()
+        self.lengths[player_id].clear()
+        roads = self.roads[player_id]
+        for e in roads:
+            self.parent[e] = e
+            self.members[player_id][e] = {e}
+        for e in roads:
+            for f in self._joinable_roads(player_id, e):
+                self._union(player_id, e, f)
+        for root, members in self.members[player_id].items():
+            self.lengths[player_id][root] = longest_trail(self.board, player_id, members)
@@ -0,0 +1,234 @@
+import math
+import multiprocessing
+import time
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from actions import Action
+from constants import ACTION, VICTORY_POINTS_TO_WIN
+from player import Agent, Player
+
+if TYPE_CHECKING:
+    from game import Game
+
+BUILD_ACTIONS = (ACTION.BUILD_ROAD, ACTION.BUILD_SETTLEMENT, ACTION.BUILD_CITY)
+
+
+class Node:
+    """
+    A node of the search tree: the position reached by playing the actions on the path from the root. Other randomness
+    (discards, steals) is not branched on, so a node stands for whatever position its actions happened to lead to
+    when it was first reached.
+    """
+    __slots__ = ('action', 'parent', 'children', 'untried', 'player', 'is_chance', 'visits', 'value', 'state_hash')
+
+    def __init__(self, action: Optional[Action], parent: Optional['Node'], player: int, num_players: int,
+                 state_hash: int):
+        self.action = action
+        self.parent = parent
+        # action (or dice total, below a chance node) -> child
+        self.children: Dict = {}
+        # legal actions not yet expanded, filled in on the first visit
+        self.untried: Optional[List[Action]] = None
+        # player choosing among the children
+        self.player = player
+        # True if the only move is a roll of the dice, whose outcomes are the children
+        self.is_chance = False
+        self.visits = 0
+        # total reward of every player over all visits
+        self.value = np.zeros(num_players)
+        self.state_hash = state_hash
+
+
+class MCTSAgent(Agent):
+    """
+    Monte Carlo tree search over Game.apply_action()/undo_action(): every iteration plays down the tree on a clone of
+    the game, plays on from there with a short rollout, then takes its actions back. Players pick moves by UCT on their
+    own share of the reward, and rolls of the dice are chance nodes whose outcomes are sampled with their real
+    probabilities.
+
+    The tree is kept between decisions: the node whose position (by state hash) matches the next decision becomes the
+    new root. With processes > 1, root-parallel search is used instead: every worker process searches the position
+    independently and the visit counts of the root's moves are summed, which gives up tree reuse.
+    """
+
+    def __init__(self, player: Player, game: 'Game', time_budget: Optional[float] = 0.5,
+                 iterations: Optional[int] = None, rollout_depth: int = 60, exploration: float = 1.0,
+                 processes: int = 1):
+        """
+        :param time_budget: Seconds of search per decision, or None for no limit
+        :param iterations: Number of iterations per decision (per process), or None for no limit
+        :param rollout_depth: Number of actions a rollout plays before the position is scored
+        :param exploration: UCT exploration constant
+        :param processes: Number of worker processes for root-parallel search; 1 searches in this process
+        """
+        super().__init__(player, game)
+        if time_budget is None and iterations is None:
+            raise ValueError("MCTSAgent needs a time budget, an iteration budget, or both.")
+        self.time_budget = time_budget
+        self.iterations = iterations
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.processes = processes
+        self.root: Optional[Node] = None
+        # state hash -> node, for every node of the current tree
+        self.nodes: Dict[int, Node] = {}
+        self._pool = None
+        # iterations run for the last decision, over all processes
+        self.last_iterations = 0
+
+    def take_turn(self, legal_actions: List[Action]) -> Action:
+        if len(legal_actions) == 1:
+            return legal_actions[0]
+        if self.processes > 1:
+            return self._root_parallel_search(legal_actions)
+        root = self.search(self.game)
+        return max(root.children.values(), key=lambda child: child.visits).action
+
+    def search(self, game: 'Game') -> Node:
+        """
+        Searches from the game's position within the budget, reusing the part of the previous tree that starts there. At
+        least one iteration is run whatever the budget, so that the root always has a child to choose.
+        :return: The root of the tree
+        """
+        state_hash = game.state_hash
+        root = self.nodes.get(state_hash)
+        if root is None or root.player != game.current_turn:
+            root = Node(None, None, game.current_turn, game.num_players, state_hash)
+        root.parent = None
+        self.root = root
+        self.nodes = {}
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            self.nodes[node.state_hash] = node
+            stack.extend(node.children.values())
+
+        search_game = game.clone(self.rng)
+        deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+        count = 0
+        while True:
+            self._iterate(search_game, root)
+            count += 1
+            if (self.iterations is not None and count >= self.iterations) or \
+                    (deadline is not None and time.perf_counter() >= deadline):
+                break
+        self.last_iterations = count
+        return root
+
+    def _iterate(self, game: 'Game', root: Node):
+        node = root
+        # selection and expansion
+        while game.winner == -1:
+            if node.untried is None:
+                node.untried = game.legal_actions()
+                node.is_chance = len(node.untried) == 1 and node.untried[0].type == ACTION.ROLL
+                self.rng.shuffle(node.untried)
+            if node.is_chance:
+                total = self.rng.roll()
+                game.apply_action(Action(ACTION.ROLL, node.player, total))
+                child = node.children.get(total)
+                if child is None:
+                    child = node.children[total] = self._add_node(game, Action(ACTION.ROLL, node.player, total), node)
+                    node = child
+                    break
+            elif node.untried:
+                action = node.untried.pop()
+                game.apply_action(action)
+                child = node.children[action] = self._add_node(game, action, node)
+                node = child
+                break
+            else:
+                child = self._select(node)
+                game.apply_action(child.action)
+            node = child
+            # a roll of seven discards and steals at random, so the same actions can lead somewhere else than the
+            # first time; the tree below no longer fits, and the iteration carries on with a rollout from here
+            if game.state_hash != node.state_hash:
+                break
+        # rollout, on a clone without a journal: cloning costs less than journaling and taking back every action
+        rollout = game.clone(self.rng)
+        for _ in range(self.rollout_depth):
+            if rollout.winner != -1:
+                break
+            rollout.apply_action(self._rollout_action(rollout.legal_actions()), record=False)
+        reward = self._evaluate(rollout)
+        while game.journal:
+            game.undo_action()
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            node.value += reward
+            node = node.parent
+
+    def _add_node(self, game: 'Game', action: Action, parent: Node) -> Node:
+        node = Node(action, parent, game.current_turn, game.num_players, game.state_hash)
+        self.nodes[node.state_hash] = node
+        return node
+
+    def _select(self, node: Node) -> Node:
+        log_visits = math.log(node.visits)
+        player = node.player
+        exploration = self.exploration
+        best, best_score = None, -math.inf
+        for child in node.children.values():
+            score = child.value[player] / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _rollout_action(self, legal_actions: List[Action]) -> Action:
+        """
+        Rollouts build whenever they can, and otherwise move at random; purely random play spends most of its
+        actions on pointless bank exchanges.
+        """
+        builds = [action for action in legal_actions if action.type in BUILD_ACTIONS]
+        return self.rng.choice(builds or legal_actions)
+
+    @staticmethod
+    def _evaluate(game: 'Game') -> np.ndarray:
+        """
+        Reward of every player: 1 for the winner and 0 for everyone else once the game is over, and otherwise each
+        player's share of the victory points needed to win.
+        """
+        if game.winner != -1:
+            reward = np.zeros(game.num_players)
+            reward[game.winner] = 1
+            return reward
+        return np.minimum([player.victory_points / VICTORY_POINTS_TO_WIN for player in game.players], 1)
+
+    def _root_parallel_search(self, legal_actions: List[Action]) -> Action:
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes)
+        settings = (self.time_budget, self.iterations, self.rollout_depth, self.exploration)
+        game = self.game.clone()
+        tasks = [(game, settings, self.rng.spawn()) for _ in range(self.processes)]
+        visits: Dict[Action, int] = dict.fromkeys(legal_actions, 0)
+        self.last_iterations = 0
+        for root_visits, iterations in self._pool.imap_unordered(_search_in_worker, tasks):
+            self.last_iterations += iterations
+            for action, count in root_visits:
+                visits[action] += count
+        return max(visits, key=visits.get)
+
+    def close(self):
+        """
+        Shuts down the worker processes of root-parallel search.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def _search_in_worker(task) -> Tuple[List[Tuple[Action, int]], int]:
+    """
+    Root-parallel search in a worker: searches the position independently and returns the visit count of every move
+    from the root.
+    """
+    game, (time_budget, iterations, rollout_depth, exploration), rng = task
+    agent = MCTSAgent(game.players[game.current_turn], game, time_budget, iterations, rollout_depth, exploration)
+    agent.rng = rng
+    root = agent.search(game)
+    return [(child.action, child.visits) for child in root.children.values()], agent.last_iterations
@@ -0,0 +1,166 @@
+import weakref
+from typing import Dict, Tuple, TYPE_CHECKING, Union
+
+import numpy as np
+
+from constants import RESOURCE
+
+if TYPE_CHECKING:
+    from board import Board
+    from game import Game
+    from topology import BoardTopology
+
+# features of every player in the 'players' plane; the hand by resource is only filled in for the observing player,
+# who sees no more than the number of cards of the others
+PLAYER_FEATURES = ('brick', 'grain', 'lumber', 'ore', 'wool', 'resource_cards', 'dev_cards', 'victory_points',
+                   'longest_road', 'has_longest_road', 'has_largest_army')
+# entries of the 'flags' plane; the bank holds the fraction left of every resource
+FLAGS = ('setup', 'setup_settlement_placed', 'dice_rolled', 'must_move_robber', 'bank_brick', 'bank_grain',
+         'bank_lumber', 'bank_ore', 'bank_wool')
+
+
+class ObservationEncoder:
+    """
+    Turns a game into fixed-shape float32 planes, indexed by the board topology's tile, vertex and edge ids:
+
+    Static planes, fixed for a board:
+        - tile_terrain (tiles, 7): one-hot of brick, grain, lumber, ore, wool, desert, water
+        - tile_pips (tiles,): chance of the tile's chit being rolled
+        - vertex_port (vertices, 6): one-hot of the 2:1 port resource, or 3:1 in the last column
+        - vertex_pips (vertices, 5): chance of each resource being produced at the vertex
+    Dynamic planes, from the point of view of one player, who comes first in every player axis with the others following
+    in seat order:
+        - settlements, cities (vertices, players): one-hot of the owner
+        - roads (edges, players): one-hot of the owner
+        - robber (tiles,)
+        - players (players, len(PLAYER_FEATURES)), with the hand by resource in the observing player's row only
+        - flags (len(FLAGS),)
+
+    All planes are packed into one flat vector of length size, static planes first. The static planes of a board are
+    computed once and cached while the board is alive, and write_dynamic() only refreshes the rest, so a buffer whose
+    static part was written at the start of a game only needs write_dynamic() after every step.
+    """
+
+    def __init__(self, topology: 'BoardTopology', num_players: int):
+        self.topology = topology
+        self.num_players = num_players
+        num_tiles, num_vertices, num_edges = topology.num_tiles, topology.num_vertices, topology.num_edges
+        self.shapes: Dict[str, Tuple[int, ...]] = {
+            'tile_terrain': (num_tiles, 7),
+            'tile_pips': (num_tiles,),
+            'vertex_port': (num_vertices, 6),
+            'vertex_pips': (num_vertices, 5),
+            'settlements': (num_vertices, num_players),
+            'cities': (num_vertices, num_players),
+            'roads': (num_edges, num_players),
+            'robber': (num_tiles,),
+            'players': (num_players, len(PLAYER_FEATURES)),
+            'flags': (len(FLAGS),),
+        }
+        # name -> (start, stop) in the flat vector
+        self.slices: Dict[str, Tuple[int, int]] = {}
+        offset = 0
+        for name, shape in self.shapes.items():
+            self.slices[name] = (offset, offset + int(np.prod(shape)))
+            offset += int(np.prod(shape))
+        self.size = offset
+        self.static_size = self.slices['settlements'][0]
+        # seats[p] lists the players in the order player p sees them
+        self._seats = (np.arange(num_players)[:, None] + np.arange(num_players)) % num_players
+        # owners[p][owner + 1] is the one-hot row of an owner as seen by player p, all zero for no owner (-1). For
+        # buildings, rows (num_players + 1) further on are for cities, so that owner + 1 + (num_players + 1) * is_city
+        # picks out settlements in settlements[p] and cities in cities[p].
+        self._owners = np.zeros((num_players, num_players + 1, num_players), dtype=np.float32)
+        for p in range(num_players):
+            self._owners[p, 1 + self._seats[p], np.arange(num_players)] = 1
+        blank = np.zeros_like(self._owners)
+        self._settlements = np.concatenate([self._owners, blank], axis=1)
+        self._cities = np.concatenate([blank, self._owners], axis=1)
+        self._static_cache: 'weakref.WeakKeyDictionary[Board, np.ndarray]' = weakref.WeakKeyDictionary()
+
+    def unpack(self, buffer: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Views of every plane of one observation (size,) or a batch of them (..., size).
+        """
+        batch = buffer.shape[:-1]
+        return {name: buffer[..., start:stop].reshape(batch + self.shapes[name])
+                for name, (start, stop) in self.slices.items()}
+
+    def static_planes(self, board: 'Board') -> np.ndarray:
+        """
+        The static part of a board's observations (static_size,), computed on first request.
+        """
+        planes = self._static_cache.get(board)
+        if planes is None:
+            scratch = np.zeros(self.size, dtype=np.float32)
+            views = self.unpack(scratch)
+            # RESOURCE puts DESERT and WATER right after the five resources
+            views['tile_terrain'][np.arange(self.topology.num_tiles), board.tile_resource] = 1
+            chits = board.tile_chit.astype(np.int64)
+            pips = np.where(chits > 0, 6 - np.abs(7 - chits), 0) / 36
+            views['tile_pips'][:] = pips
+            ports = board.vertex_port.astype(np.int64)
+            has_port = ports >= 0
+            views['vertex_port'][has_port, np.where(ports[has_port] == RESOURCE.ANY, 5, ports[has_port])] = 1
+            for v, tiles in enumerate(self.topology.vertex_tiles):
+                for t in tiles:
+                    if board.tile_resource[t] < 5:
+                        views['vertex_pips'][v, board.tile_resource[t]] += pips[t]
+            planes = scratch[:self.static_size]
+            planes.flags.writeable = False
+            self._static_cache[board] = planes
+        return planes
+
+    def write_static(self, board: 'Board', out: np.ndarray):
+        """
+        Writes a board's static planes into the start of an observation buffer.
+        """
+        out[:self.static_size] = self.static_planes(board)
+
+    def write_dynamic(self, game: 'Game', player_id: int, out: Union[np.ndarray, Dict[str, np.ndarray]]):
+        """
+        Writes the dynamic planes of a game, seen by one player, into an observation buffer in place.
+        :param game: Game to observe
+        :param player_id: Player observing
+        :param out: Buffer (size,) to write into, or unpack() of it, which saves slicing it up on every call
+        """
+        board = game.board
+        views = self.unpack(out) if isinstance(out, np.ndarray) else out
+        buildings = board.vertex_owner + 1
+        buildings += (self.num_players + 1) * board.vertex_city
+        np.take(self._settlements[player_id], buildings, axis=0, out=views['settlements'])
+        np.take(self._cities[player_id], buildings, axis=0, out=views['cities'])
+        np.take(self._owners[player_id], board.edge_owner + 1, axis=0, out=views['roads'])
+        robber = views['robber']
+        robber[:] = 0
+        robber[game.robber_tile.index] = 1
+
+        seats = self._seats[player_id]
+        players = views['players']
+        players[:, :5] = 0
+        players[0, :5] = game.hands[player_id]
+        players[:, 5] = game.hands[seats].sum(axis=1)
+        players[:, 6] = game.dev_cards[seats].sum(axis=1)
+        players[:, 7:] = [(game.players[p].victory_points, game.longest_road.longest_road(p),
+                           game.players[p].has_longest_road, game.players[p].has_largest_army) for p in seats.tolist()]
+
+        flags = views['flags']
+        flags[:4] = (game.is_game_start, game.setup_settlement != -1, game.dice_rolled_this_turn,
+                     game.seven_rolled_this_turn and not game.robber_moved_this_turn)
+        flags[4:] = game.bank()
+        flags[4:] /= game.bank_size
+
+    def encode(self, game: 'Game', player_id: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        Writes a whole observation of a game, seen by one player.
+        :param game: Game to observe
+        :param player_id: Player observing
+        :param out: Buffer (size,) to write into; a new one is made if not given
+        """
+        if out is None:
+            out = np.empty(self.size, dtype=np.float32)
+        self.write_static(game.board, out)
+        self.write_dynamic(game, player_id, out)
+        return out
+
+
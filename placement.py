@@ -0,0 +1,115 @@
+from typing import Iterable, List, Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from board import Board
+
+
+class LegalPlacements:
+    """
+    Keeps every player's legal road and settlement spots (as edge and vertex ids) up to date as buildings go up, so
+    that legal-move queries never have to scan the board.
+
+    The rules tracked are:
+        - A settlement may go on a vertex with no building on it or on any adjacent vertex (the distance rule). Outside
+          of the setup phase, the vertex must also touch one of the player's roads.
+        - A road may go on an empty edge with an endpoint that holds one of the player's buildings, or that touches
+          another of the player's roads and holds no other player's building.
+
+    Every update only revisits the neighborhood of the vertex or edge that changed.
+    """
+
+    def __init__(self, board: 'Board', num_players: int):
+        self.board = board
+        self.topology = board.topology
+        # vertices that satisfy the distance rule
+        self.free_vertices: Set[int] = set(range(self.topology.num_vertices))
+        self.settlement_spots: List[Set[int]] = [set() for _ in range(num_players)]
+        self.road_spots: List[Set[int]] = [set() for _ in range(num_players)]
+
+    def clone(self, board: 'Board') -> 'LegalPlacements':
+        """
+        Copies the tracked spots for a clone of the board.
+        """
+        placements = LegalPlacements.__new__(LegalPlacements)
+        placements.board = board
+        placements.topology = self.topology
+        placements.free_vertices = set(self.free_vertices)
+        placements.settlement_spots = [set(spots) for spots in self.settlement_spots]
+        placements.road_spots = [set(spots) for spots in self.road_spots]
+        return placements
+
+    def road_is_legal(self, player_id: int, edge: int) -> bool:
+        """
+        Checks the road rule for one edge directly against the board.
+        """
+        edge_list = self.board.edge_list
+        if edge_list[edge].player_road_id != -1:
+            return False
+        for v in self.topology.edge_endpoints[edge]:
+            owner = self.board.vertex_list[v].player_id
+            if owner == player_id:
+                return True
+            if owner == -1 and any(edge_list[f].player_road_id == player_id for f in self.topology.vertex_edges[v]
+                                   if f != edge):
+                return True
+        return False
+
+    def on_road(self, player_id: int, edge: int):
+        """
+        Updates the legal spots after a player builds a road on an edge.
+        """
+        for spots in self.road_spots:
+            spots.discard(edge)
+        edge_list = self.board.edge_list
+        for v in self.topology.edge_endpoints[edge]:
+            if self.board.vertex_list[v].player_id not in (-1, player_id):
+                continue
+            for f in self.topology.vertex_edges[v]:
+                if edge_list[f].player_road_id == -1:
+                    self.road_spots[player_id].add(f)
+            if v in self.free_vertices:
+                self.settlement_spots[player_id].add(v)
+
+    def on_settlement(self, player_id: int, vertex: int):
+        """
+        Updates the legal spots after a player builds a settlement on a vertex.
+        """
+        for v in (vertex,) + self.topology.vertex_vertices[vertex]:
+            self.free_vertices.discard(v)
+            for spots in self.settlement_spots:
+                spots.discard(v)
+        edge_list = self.board.edge_list
+        for other, spots in enumerate(self.road_spots):
+            for f in self.topology.vertex_edges[vertex]:
+                if edge_list[f].player_road_id != -1:
+                    continue
+                if other == player_id:
+                    spots.add(f)
+                elif f in spots and not self.road_is_legal(other, f):
+                    spots.discard(f)
+
+    def refresh(self, vertices: Iterable[int], edges: Iterable[int]):
+        """
+        Recomputes every player's legal spots on some vertices and edges directly against the board. Used when a
+        building is taken back, where the incremental updates above do not apply.
+        """
+        vertex_list = self.board.vertex_list
+        edge_list = self.board.edge_list
+        for v in vertices:
+            free = all(vertex_list[w].player_id == -1 for w in (v,) + self.topology.vertex_vertices[v])
+            if free:
+                self.free_vertices.add(v)
+            else:
+                self.free_vertices.discard(v)
+            owners = {edge_list[f].player_road_id for f in self.topology.vertex_edges[v]}
+            for player_id, spots in enumerate(self.settlement_spots):
+                if free and player_id in owners:
+                    spots.add(v)
+                else:
+                    spots.discard(v)
+        for e in edges:
+            for player_id, spots in enumerate(self.road_spots):
+                if self.road_is_legal(player_id, e):
+                    spots.add(e)
+                else:
+                    spots.discard(e)
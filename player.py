@@ -1,18 +1,21 @@
-import random
-import uuid
+import copy
 from collections import defaultdict
-from typing import List, Optional, Dict, Set
+from typing import List, Optional, Dict, Set, TYPE_CHECKING
 from abc import ABC, abstractmethod
 
 import numpy as np
 
-from constants import RESOURCE, PLAYERCOLOR, MAX_TRADE_PROPOSALS
+from constants import RESOURCE, PLAYERCOLOR, MAX_TRADE_PROPOSALS, DEVELOPMENT
+from actions import Action
 from edge import Edge
-from game_window import GameWindow
 from port import Port
+from random_stream import RandomStream
 from tile import Tile
 from vertex import Vertex
 
+if TYPE_CHECKING:
+    from game_window import GameWindow
+
 
 class Player:
     """
@@ -28,9 +31,11 @@ class Player:
         self.available_roads = available_roads
         self.available_cities = available_cities
         # resources [BRICK, GRAIN, LUMBER, ORE, WOOL]
-        self.resources = [0] * 5
+        self.resources = np.zeros(5, dtype=np.int64)
         # development cards [Knight, Monopoly, RoadBuilding, VictoryPoint, YearOfPlenty]
-        self.dev_cards = [0] * 6
+        self.dev_cards = np.zeros(6, dtype=np.int64)
+        # the game's state version, bumped whenever the hand changes; shared with the Game once it binds the player
+        self.game_version = [0]
         self.victory_points = 0
         self.settlements = 0
         self.roads = 0
@@ -61,32 +66,30 @@ class Player:
     def total_dev_card_count(self):
         return sum(self.dev_cards)
 
-    def get_random_available_resource(self) -> Optional[RESOURCE]:
+    def get_random_available_resource(self, rng: Optional[RandomStream] = None) -> Optional[RESOURCE]:
         """
         Returns a random resource type that this player has for the purposes of stealing.
+        :param rng: Source of randomness, e.g. the game's; a fresh one if not given
         """
         if sum(self.resources) == 0:
             return None
-        return random.choice([RESOURCE(i) for i in range(5) if self.resources[i] > 0])
+        if rng is None:
+            rng = RandomStream()
+        return rng.choice([RESOURCE(i) for i in range(5) if self.resources[i] > 0])
+
+    def trade_ratios(self) -> np.ndarray:
+        """
+        Number of cards of each resource [brick, grain, lumber, ore, wool] this player must give the bank for one card
+        of another resource, taking the player's ports into account.
+        """
+        ports = self.available_exchange_resources
+        ratio = 3 if ports[RESOURCE.ANY] else 4
+        # RESOURCE is an IntEnum, so the port flags can be looked up by plain index
+        return np.array([2 if ports[i] else ratio for i in range(5)], dtype=np.int64)
 
     def available_exchanges(self) -> List[bool]:
         # [brick, grain, lumber, ore, wool]
-        res = [False] * 5
-        res[0] = self.resources[RESOURCE.BRICK] >= 4 \
-                 or (self.resources[RESOURCE.BRICK] >= 3 and self.available_exchange_resources[RESOURCE.ANY]) \
-                 or (self.available_exchange_resources[RESOURCE.BRICK] and self.resources[RESOURCE.BRICK] >= 2)
-        res[1] = self.resources[RESOURCE.GRAIN] >= 4 \
-                 or (self.resources[RESOURCE.GRAIN] >= 3 and self.available_exchange_resources[RESOURCE.ANY]) \
-                 or (self.available_exchange_resources[RESOURCE.GRAIN] and self.resources[RESOURCE.GRAIN] >= 2)
-        res[2] = self.resources[RESOURCE.LUMBER] >= 4 \
-                 or (self.resources[RESOURCE.LUMBER] >= 3 and self.available_exchange_resources[RESOURCE.ANY]) \
-                 or (self.available_exchange_resources[RESOURCE.LUMBER] and self.resources[RESOURCE.LUMBER] >= 2)
-        res[3] = self.resources[RESOURCE.ORE] >= 4 \
-                 or (self.resources[RESOURCE.ORE] >= 3 and self.available_exchange_resources[RESOURCE.ANY]) \
-                 or (self.available_exchange_resources[RESOURCE.ORE] and self.resources[RESOURCE.ORE] >= 2)
-        res[4] = self.resources[RESOURCE.WOOL] >= 4 \
-                 or (self.resources[RESOURCE.WOOL] >= 3 and self.available_exchange_resources[RESOURCE.ANY]) \
-                 or (self.available_exchange_resources[RESOURCE.WOOL] and self.resources[RESOURCE.WOOl] >= 2)
+        return (self.resources >= self.trade_ratios()).tolist()
 
     def can_build_settlement(self) -> bool:
         """
@@ -118,6 +121,7 @@ class Player:
         self.roads += 1
         self.resources[RESOURCE.BRICK] -= 1
         self.resources[RESOURCE.LUMBER] -= 1
+        self.game_version[0] += 1
 
     def place_road(self, edge: Edge):
         # used for initial road building at start of game
@@ -132,6 +136,7 @@ class Player:
         self.resources[RESOURCE.LUMBER] -= 1
         self.resources[RESOURCE.GRAIN] -= 1
         self.resources[RESOURCE.WOOL] -= 1
+        self.game_version[0] += 1
         if isinstance(vertex, Port):
             self.available_exchange_resources[vertex.resource] = True
 
@@ -139,6 +144,8 @@ class Player:
         vertex.player_id = self.id
         self.settlements += 1
         self.victory_points += 1
+        if isinstance(vertex, Port):
+            self.available_exchange_resources[vertex.resource] = True
 
     def build_city(self, vertex: Vertex):
         vertex.upgrade_to_city()
@@ -148,6 +155,7 @@ class Player:
         self.victory_points += 1
         self.resources[RESOURCE.GRAIN] -= 2
         self.resources[RESOURCE.ORE] -= 3
+        self.game_version[0] += 1
 
     def give_largest_army(self):
         self.has_largest_army = True
@@ -167,9 +175,11 @@ class Player:
 
     def give_resource(self, resource: RESOURCE, amt: int):
         self.resources[resource] += amt
+        self.game_version[0] += 1
 
     def take_resource(self, resource: RESOURCE, amt: int):
         self.resources[resource] -= amt
+        self.game_version[0] += 1
 
     def get_available_resources(self) -> set[RESOURCE]:
         resources = set()
@@ -181,6 +191,27 @@ class Player:
     def give_victory_points(self, amt: int):
         self.victory_points += amt
 
+    def clone(self) -> 'Player':
+        """
+        Copies the player. The copy's resources, development cards and game version still refer to this player's until
+        Game.clone() rebinds them.
+        """
+        player = copy.copy(self)
+        player.buildings = set(self.buildings)
+        player.available_exchange_resources = dict(self.available_exchange_resources)
+        return player
+
+    def save_state(self) -> tuple:
+        """
+        Snapshot of the counters that building and awards change, for Game.undo_action().
+        """
+        return (self.victory_points, self.settlements, self.roads, self.cities, self.has_largest_army,
+                self.has_longest_road, dict(self.available_exchange_resources))
+
+    def restore_state(self, state: tuple):
+        (self.victory_points, self.settlements, self.roads, self.cities, self.has_largest_army, self.has_longest_road,
+         self.available_exchange_resources) = state
+
     def __hash__(self):
         return hash(self.id)
 
@@ -191,13 +222,45 @@ class Player:
 class Mask:
     """
     Abstracts away the logic of creating action masks, which prevent agents from taking disallowed actions.
+
+    Every mask is a fixed-length boolean NumPy array over one of the board's index spaces (edge, vertex or tile ids from
+    the board's topology), over resources [brick, grain, lumber, ore, wool], development card types or players. Masks
+    are cached until the game's state_version changes (which includes any change to a hand), so asking for the same mask
+    twice in one decision is free.
     """
 
     def __init__(self, player: Player, game: 'Game'):
         self.player = player
         self.game = game
+        self._cache = {}
+        self._cache_version = -1
+
+    def _cached(self, name: str, compute) -> np.ndarray:
+        if self._cache_version != self.game.state_version:
+            self._cache.clear()
+            self._cache_version = self.game.state_version
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    def all_masks(self) -> Dict[str, np.ndarray]:
+        """
+        Every mask an agent might need for its next decision, keyed by name.
+        """
+        return {
+            'action_type': self.action_type_mask(),
+            'city': self.city_mask(),
+            'dev_card': self.dev_card_mask(),
+            'exchange': self.exchange_mask(),
+            'in_bank': self.in_bank_mask(),
+            'in_hand': self.in_hand_mask(),
+            'road': self.road_mask(),
+            'robber': self.robber_mask(),
+            'settlement': self.settlement_mask(),
+            'steal_from': self.steal_from_mask(),
+        }
 
-    def action_type_mask(self) -> np.array:
+    def action_type_mask(self) -> np.ndarray:
         """
         Returns a mask where the ith position is true if the agent is capable of taking the associated actions. They are:
             -(1) Buy Development Card
@@ -214,14 +277,17 @@ class Mask:
             -(12) Steal Resource
             -(13) Upgrade to City
         """
-        mask = np.zeros(13)
+        return self._cached('action_type', self._action_type_mask)
+
+    def _action_type_mask(self) -> np.ndarray:
+        mask = np.zeros(13, dtype=bool)
 
         # has_to_discard
         mask[1] = self.game.seven_rolled_this_turn \
                   and (y := self.player.start_of_turn_hand_count) > 7 \
                   and self.player.total_resource_count() > y - y // 2
 
-        if self.game.current_turn_idx == self.player.id:
+        if self.game.current_turn == self.player.id:
             # roll dice
             mask[10] = not self.game.dice_rolled_this_turn
 
@@ -231,9 +297,10 @@ class Mask:
 
             # steal
             mask[11] = self.game.robber_moved_this_turn \
-                       and not self.game.stole_this_turn
+                       and not self.game.stole_this_turn \
+                       and self.steal_from_mask().any()
 
-            if not mask[10] and not mask[5] and not mask[11]:
+            if not mask[10] and not mask[4] and not mask[11]:
                 # end turn
                 mask[2] = True
 
@@ -241,15 +308,15 @@ class Mask:
                 mask[0] = self.player.can_buy_dev_card()
 
                 # exchange resource
-                mask[3] = len(self.game.get_available_road_spots(self.player.id)) > 0
+                mask[3] = self.exchange_mask().any()
 
                 # build road
                 mask[5] = self.player.can_build_road() \
-                          and len(self.game.get_available_road_spots(self.player.id)) > 0
+                          and self.road_mask().any()
 
                 # build settlement
                 mask[6] = self.player.can_build_settlement() \
-                          and len(self.game.get_available_settlement_spots(self.player.id)) > 0
+                          and self.settlement_mask().any()
 
                 # play dev card
                 mask[7] = self.player.total_dev_card_count() > self.player.start_of_turn_dev_card_count
@@ -258,7 +325,8 @@ class Mask:
                 mask[8] = self.game.trades_proposed_this_turn < MAX_TRADE_PROPOSALS
 
                 # upgrade to city
-                mask[12] = self.player.can_build_settlement()
+                mask[12] = self.player.can_build_city() \
+                           and self.city_mask().any()
         else:
             # respond to trade
             mask[9] = self.game.current_trade_on_table is not None \
@@ -266,65 +334,108 @@ class Mask:
 
         return mask
 
-    def city_mask(self):
+    def city_mask(self) -> np.ndarray:
         """
         Mask out all vertices that this player can't place a city on.
         """
-        raise NotImplementedError()
+        board = self.game.board
+        return self._cached('city', lambda: (board.vertex_owner == self.player.id) & ~board.vertex_city)
 
-    def dev_card_mask(self):
+    def dev_card_mask(self) -> np.ndarray:
         """
         Mask out all dev cards that this player can't play.
         """
-        raise NotImplementedError()
+        def compute():
+            mask = np.array(self.player.dev_cards[:len(DEVELOPMENT)]) > 0
+            mask[DEVELOPMENT.VICTORY_POINT] = False
+            return mask
+        return self._cached('dev_card', compute)
 
-    def exchange_mask(self):
+    def exchange_mask(self) -> np.ndarray:
         """
         Mask out all resources that this player can't exchange with the bank for another.
         """
-        raise NotImplementedError()
+        return self._cached('exchange', lambda: self.player.resources >= self.player.trade_ratios())
 
-    def in_bank_mask(self):
+    def in_bank_mask(self) -> np.ndarray:
         """
         Mask out all resources that aren't in the bank.
         """
-        raise NotImplementedError()
+        return self._cached('in_bank', lambda: self.game.bank() > 0)
 
-    def in_hand_mask(self):
+    def in_hand_mask(self) -> np.ndarray:
         """
         Mask out all resources that aren't in this player's hand.
         """
-        raise NotImplementedError()
+        return self._cached('in_hand', lambda: self.player.resources > 0)
 
-    def road_mask(self):
+    def road_mask(self) -> np.ndarray:
         """
         Mask out all edges that this player can't place a road on.
         """
-        raise NotImplementedError()
+        def compute():
+            mask = np.zeros(self.game.board.topology.num_edges, dtype=bool)
+            mask[[e.index for e in self.game.get_available_road_spots(self.player.id)]] = True
+            return mask
+        return self._cached('road', compute)
 
-    def robber_mask(self):
+    def robber_mask(self) -> np.ndarray:
         """
         Mask out all tiles that this player can't place the robber on.
         """
-        raise NotImplementedError()
+        def compute():
+            mask = ~self.game.board.topology.tile_water
+            mask[self.game.robber_tile.index] = False
+            return mask
+        return self._cached('robber', compute)
 
-    def settlement_mask(self):
+    def robber_victim_mask(self) -> np.ndarray:
+        """
+        Mask out, for every tile (rows) and player (columns), the players this player could not steal from after moving
+        the robber to that tile.
+        """
+        def compute():
+            game = self.game
+            topology = game.board.topology
+            owners = game.board.vertex_owner[topology.tile_vertex_idx]
+            tiles = np.repeat(np.arange(topology.num_tiles), np.diff(topology.tile_vertex_ptr))
+            mask = np.zeros((topology.num_tiles, game.num_players), dtype=bool)
+            mask[tiles[owners >= 0], owners[owners >= 0]] = True
+            mask &= game.hands.sum(axis=1) > 0
+            mask[:, self.player.id] = False
+            return mask
+        return self._cached('robber_victim', compute)
+
+    def settlement_mask(self) -> np.ndarray:
         """
         Mask out all vertices that this player can't place a settlement on.
         """
-        raise NotImplementedError()
+        def compute():
+            mask = np.zeros(self.game.board.topology.num_vertices, dtype=bool)
+            mask[[v.index for v in self.game.get_available_settlement_spots(self.player.id)]] = True
+            return mask
+        return self._cached('settlement', compute)
 
-    def steal_from_mask(self):
+    def steal_from_mask(self) -> np.ndarray:
         """
         Mask out all players that this player can't steal from.
         """
-        raise NotImplementedError()
-
-    def trade_response_mask(self, proposed_trade):
+        def compute():
+            board = self.game.board
+            owners = board.vertex_owner[list(board.topology.tile_vertices[self.game.robber_tile.index])]
+            mask = np.zeros(self.game.num_players, dtype=bool)
+            mask[owners[owners >= 0]] = True
+            mask &= self.game.hands.sum(axis=1) > 0
+            mask[self.player.id] = False
+            return mask
+        return self._cached('steal_from', compute)
+
+    def trade_response_mask(self, proposed_trade) -> np.ndarray:
         """
-        Mask out 'yes' if this player is unable to accept the proposed trade.
+        Mask out 'yes' if this player is unable to accept the proposed trade. The proposed trade is given as the number
+        of each resource this player would have to hand over, and the mask is [no, yes].
         """
-        raise NotImplementedError()
+        return np.array([True, bool(np.all(self.player.resources >= np.asarray(proposed_trade)))])
 
 
 class Agent(ABC):
@@ -336,9 +447,16 @@ class Agent(ABC):
         self.player = player
         self.game = game
         self.mask = Mask(player, game)
+        # the agent's own stream, spawned from the game's, so its choices are fixed by the game's seed
+        self.rng = game.rng.spawn()
 
     @abstractmethod
-    def take_turn(self, observation):
+    def take_turn(self, legal_actions: List[Action]) -> Action:
+        """
+        Chooses the next action for this agent's player.
+        :param legal_actions: Every action the player may take, from Game.legal_actions()
+        :return: One of legal_actions
+        """
         ...
 
 
@@ -347,8 +465,8 @@ class RandomAgent(Agent):
     An agent that can fully play the game, but makes every choice at random.
     """
 
-    def take_turn(self, observation):
-        raise NotImplementedError()
+    def take_turn(self, legal_actions: List[Action]) -> Action:
+        return self.rng.choice(legal_actions)
 
 
 class VisualPlayer(Player):
@@ -356,22 +474,22 @@ class VisualPlayer(Player):
     Player class that interacts with tkinter Canvas to render building a settlement/city/road and moving the robber
     """
 
-    def __init__(self, player_id: int, color: PLAYERCOLOR, gw: GameWindow, available_settlements: int = 5,
+    def __init__(self, player_id: int, color: PLAYERCOLOR, gw: 'GameWindow', available_settlements: int = 5,
                  available_roads: int = 15, available_cities: int = 4):
         super().__init__(self, player_id, color, available_settlements, available_roads, available_cities)
         self.gw = gw
 
     def build_road(self, edge: Edge):
         super().build_road(edge)
-        self.gw.draw_road(edge.canvas_pos)
+        self.gw.draw_road(self.gw.edge_canvas_pos[edge.index])
 
     def build_settlement(self, vertex: Vertex):
         super().build_settlement(vertex)
-        self.gw.draw_settlement(vertex.canvas_pos)
+        self.gw.draw_settlement(self.gw.vertex_canvas_pos[vertex.index])
 
     def build_city(self, vertex: Vertex):
         super().build_city(vertex)
-        self.gw.draw_city(vertex.canvas_pos)
+        self.gw.draw_city(self.gw.vertex_canvas_pos[vertex.index])
 
 
 class UserVisualPlayer(VisualPlayer):
@@ -5,13 +5,17 @@ from vertex import Vertex
 
 
 class Port(Vertex):
+    __slots__ = ('resource',)
+
     def __init__(self, vertex_id: Set[Tuple[int, int]], resource: RESOURCE):
         self.resource = resource
-        self.ratio = (2, 1) if resource is not RESOURCE.ANY else (3, 1)
         Vertex.__init__(self, vertex_id)
 
+    def copy(self) -> 'Port':
+        port = Vertex.copy(self)
+        port.resource = self.resource
+        return port
 
-
-
-
-
+    @property
+    def ratio(self) -> Tuple[int, int]:
+        return (2, 1) if self.resource is not RESOURCE.ANY else (3, 1)
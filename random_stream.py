@@ -0,0 +1,75 @@
+from typing import List, Sequence, TypeVar, Union
+
+import numpy as np
+
+T = TypeVar('T')
+Seed = Union[None, int, Sequence[int], np.random.SeedSequence]
+
+
+class RandomStream:
+    """
+    Source of randomness for one game (or one agent), built on a numpy Generator. Dice totals and uniform numbers are
+    drawn in batches with one array operation each and handed out one at a time, which costs far less than a call
+    into numpy (or the random module) per draw.
+
+    Everything drawn from a stream is fixed by its seed, and spawn() derives independent streams from it without
+    drawing anything, so a run is reproducible from a single root seed however its games are spread across processes.
+    """
+
+    def __init__(self, seed: Seed = None, batch_size: int = 1024):
+        """
+        :param seed: Anything np.random.default_rng() accepts; fresh entropy if None
+        :param batch_size: Number of dice totals and of uniform numbers drawn at a time
+        """
+        self.generator = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        # pre-drawn values, handed out from the end
+        self._dice: List[int] = []
+        self._uniforms: List[float] = []
+
+    def roll(self) -> int:
+        """
+        Total of two six-sided dice.
+        """
+        if not self._dice:
+            self._dice = self.generator.integers(1, 7, (self.batch_size, 2)).sum(axis=1).tolist()
+        return self._dice.pop()
+
+    def random(self) -> float:
+        """
+        Uniform number in [0, 1).
+        """
+        if not self._uniforms:
+            self._uniforms = self.generator.random(self.batch_size).tolist()
+        return self._uniforms.pop()
+
+    def choice(self, items: Sequence[T]) -> T:
+        """
+        Item picked uniformly from a non-empty sequence.
+        """
+        return items[int(self.random() * len(items))]
+
+    def shuffle(self, items: list):
+        """
+        Shuffles a list in place.
+        """
+        for i in range(len(items) - 1, 0, -1):
+            j = int(self.random() * (i + 1))
+            items[i], items[j] = items[j], items[i]
+
+    def sample(self, items: Sequence[T], k: int) -> List[T]:
+        """
+        k items picked from a sequence without replacement.
+        """
+        return [items[i] for i in self.generator.permutation(len(items))[:k].tolist()]
+
+    def spawn(self) -> 'RandomStream':
+        """
+        A new stream independent of this one. Spawning draws nothing from this stream.
+        """
+        stream = RandomStream.__new__(RandomStream)
+        stream.generator = self.generator.spawn(1)[0]
+        stream.batch_size = self.batch_size
+        stream._dice = []
+        stream._uniforms = []
+        return stream
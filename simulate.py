@@ -0,0 +1,125 @@
+"""
+Plays bot-only games without a GUI, spread over a pool of worker processes.
+
+Usage: python simulate.py --games 1000 --processes 8
+"""
+import argparse
+import multiprocessing
+import time
+from collections import Counter
+from typing import Dict, Iterator, NamedTuple, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+import instrumentation
+from board import get_board_template
+from game import Game
+from player import Agent, RandomAgent
+from random_stream import Seed
+
+
+class GameResult(NamedTuple):
+    # position of the game in the batch; results arrive in the order games finish, not this order
+    index: int
+    # winning player, or -1 if the game was abandoned
+    winner: int
+    num_turns: int
+    num_actions: int
+    victory_points: Tuple[int, ...]
+    seconds: float
+    # instrumentation.snapshot() of the game, if it was instrumented
+    instrumentation: Optional[Dict[str, Dict]] = None
+
+
+def play_game(index: int, agents: Sequence[Type[Agent]], six_players: bool = False,
+              max_actions: int = 10000, seed: Seed = None, instrument: bool = False) -> GameResult:
+    """
+    Plays one game to the end.
+    :param index: Position of the game in its batch
+    :param agents: Agent class controlling each player
+    :param six_players: True for the 5-6 player extension
+    :param max_actions: Number of actions after which the game is abandoned
+    :param seed: Seed of the game (see Game)
+    :param instrument: True to record the game's hot paths with instrumentation, in the result. Instrumentation is
+    turned off again afterwards unless it was already on.
+    """
+    was_enabled = instrumentation.is_enabled()
+    if instrument:
+        instrumentation.enable()
+        instrumentation.reset()
+    try:
+        start = time.perf_counter()
+        game = Game(six_players, agents=agents, seed=seed)
+        winner = game.play(max_actions)
+        seconds = time.perf_counter() - start
+        snapshot = instrumentation.snapshot() if instrument else None
+    finally:
+        if instrument and not was_enabled:
+            instrumentation.disable()
+    return GameResult(index, winner, game.num_turns, game.num_actions,
+                      tuple(player.victory_points for player in game.players), seconds, snapshot)
+
+
+def _init_worker(board_size: int):
+    # build the board template once per worker rather than in the first game each worker plays
+    get_board_template(board_size)
+
+
+def _play_game(args) -> GameResult:
+    return play_game(*args)
+
+
+def simulate(num_games: int, agents: Sequence[Type[Agent]], processes: Optional[int] = None,
+             six_players: bool = False, max_actions: int = 10000, chunksize: int = 4,
+             seed: Seed = None, instrument: bool = False) -> Iterator[GameResult]:
+    """
+    Plays many games with the same agents, yielding each result as soon as its game finishes.
+    :param num_games: Number of games to play
+    :param agents: Agent class controlling each player; classes must be importable by the workers
+    :param processes: Number of worker processes, by default one per CPU. With 1, games are played in this process.
+    :param six_players: True for the 5-6 player extension
+    :param max_actions: Number of actions after which a game is abandoned
+    :param chunksize: Number of games handed to a worker at a time
+    :param seed: Root seed of the run. Every game gets its own seed spawned from it, so a run with the same seed plays
+    the same games whatever the number of processes.
+    :param instrument: True to record every game's hot paths; merge the results' snapshots with
+    instrumentation.merge()
+    """
+    board_size = 4 if six_players else 3
+    seeds = np.random.SeedSequence(seed).spawn(num_games)
+    tasks = ((i, agents, six_players, max_actions, seeds[i], instrument) for i in range(num_games))
+    if processes == 1:
+        get_board_template(board_size)
+        yield from map(_play_game, tasks)
+        return
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(board_size,)) as pool:
+        yield from pool.imap_unordered(_play_game, tasks, chunksize)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--six-players', action='store_true')
+    parser.add_argument('--max-actions', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--instrument', metavar='FILE', help='record the hot paths and write the counts to FILE')
+    args = parser.parse_args()
+
+    num_players = 6 if args.six_players else 4
+    wins = Counter()
+    num_actions = 0
+    snapshots = []
+    start = time.perf_counter()
+    for result in simulate(args.games, [RandomAgent] * num_players, args.processes, args.six_players,
+                           args.max_actions, seed=args.seed, instrument=bool(args.instrument)):
+        wins[result.winner] += 1
+        num_actions += result.num_actions
+        snapshots.append(result.instrumentation)
+    elapsed = time.perf_counter() - start
+    if args.instrument:
+        instrumentation.write_snapshot(args.instrument, instrumentation.merge(snapshots))
+    print(f"{args.games} games in {elapsed:.2f}s ({60 * args.games / elapsed:.0f} games/min, "
+          f"{num_actions / elapsed:.0f} actions/s)")
+    for player_id in sorted(wins):
+        print(f"  {'abandoned' if player_id == -1 else f'player {player_id} won'}: {wins[player_id]}")
@@ -0,0 +1,134 @@
+"""
+Cache of the GUI's sprites, resized once and kept on disk in a single atlas image.
+
+The atlas (sprites/atlas.png) holds every sprite in SPRITES side by side at its display size. Its index, stored in a
+text chunk of the same PNG, records where each sprite is and the modification time and size of the file it was made
+from. Loading the sprites is then one decode of the atlas and one crop per sprite; the atlas is only rebuilt when a
+source file or a display size changes. Resized images are loaded once per process, and the Tk images made from them
+are shared by every window under the same Tk root (GameWindow opens all of its windows under one root):
+
+    sprites = sprite_cache.load_photo_images(root)
+"""
+import json
+import os
+import weakref
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+if TYPE_CHECKING:
+    import tkinter
+    from PIL import ImageTk
+
+SPRITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sprites')
+ATLAS_FILE = os.path.join(SPRITE_DIR, 'atlas.png')
+# bumped whenever the atlas or index format changes, so that old caches are rebuilt
+ATLAS_VERSION = 2
+# PNG text chunk holding the index
+INDEX_KEY = 'sprite-index'
+
+# sprite name -> (source file relative to the sprite directory, size to display it at)
+SPRITES: Dict[str, Tuple[str, Tuple[int, int]]] = {
+    **{name: (f'{name}.png', (32, 32)) for name in ('grain', 'brick', 'lumber', 'ore', 'wool', 'any')},
+    **{f'settlement_{color}': (f'settlements/settlement_{color}.png', (20, 20))
+       for color in ('red', 'orange', 'blue', 'green', 'white', 'brown', 'placeholder')},
+}
+
+# atlas file -> sprite name -> resized image
+_images: Dict[str, Dict[str, Image.Image]] = {}
+# Tk root -> sprite name -> Tk image; Tk images belong to one interpreter, so they can only be shared within a root
+_photo_images: 'weakref.WeakKeyDictionary[tkinter.Tk, Dict[str, ImageTk.PhotoImage]]' = weakref.WeakKeyDictionary()
+
+
+def _stamp(path: str) -> List[int]:
+    """
+    Modification time (in nanoseconds) and size of a file, which change whenever it is rewritten.
+    """
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _is_current(index: Dict, sprite_dir: str, sprites: Dict[str, Tuple[str, Tuple[int, int]]]) -> bool:
+    """
+    True if every sprite is in the index, made from the current version of its source at its display size.
+    """
+    if index.get('version') != ATLAS_VERSION:
+        return False
+    try:
+        for name, (source, size) in sprites.items():
+            entry = index['sprites'].get(name)
+            if (entry is None or entry['source'] != source or entry['size'] != list(size)
+                    or entry['stamp'] != _stamp(os.path.join(sprite_dir, source))):
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def build_atlas(atlas_file: str = ATLAS_FILE, sprite_dir: str = SPRITE_DIR,
+                sprites: Dict[str, Tuple[str, Tuple[int, int]]] = SPRITES) -> Dict[str, Image.Image]:
+    """
+    Resizes every sprite from its source file and writes them all, with their index, to a new atlas. The file is
+    replaced atomically, so that other processes never read a half-written cache.
+    :return: Sprite name -> resized image
+    """
+    images = {}
+    entries = {}
+    x = 0
+    for name, (source, size) in sprites.items():
+        path = os.path.join(sprite_dir, source)
+        stamp = _stamp(path)
+        with Image.open(path) as image:
+            images[name] = image.convert('RGBA').resize(size, Image.LANCZOS)
+        entries[name] = {'source': source, 'size': list(size), 'stamp': stamp, 'box': [x, 0, x + size[0], size[1]]}
+        x += size[0]
+    atlas = Image.new('RGBA', (max(x, 1), max((size[1] for _, size in sprites.values()), default=1)))
+    for name, entry in entries.items():
+        atlas.paste(images[name], tuple(entry['box'][:2]))
+    info = PngInfo()
+    info.add_text(INDEX_KEY, json.dumps({'version': ATLAS_VERSION, 'sprites': entries}))
+    temp_file = f'{atlas_file}.{os.getpid()}.tmp'
+    atlas.save(temp_file, format='PNG', pnginfo=info)
+    os.replace(temp_file, atlas_file)
+    return images
+
+
+def load_images(atlas_file: str = ATLAS_FILE, sprite_dir: str = SPRITE_DIR,
+                sprites: Dict[str, Tuple[str, Tuple[int, int]]] = SPRITES) -> Dict[str, Image.Image]:
+    """
+    Returns every sprite at its display size, from the atlas if it is up to date and by rebuilding it otherwise. The
+    images are loaded once per process and shared; do not modify them.
+    :return: Sprite name -> resized image
+    """
+    images = _images.get(atlas_file)
+    if images is not None:
+        return images
+    try:
+        with Image.open(atlas_file) as atlas:
+            # text chunks come before the pixels, so the index is read without decoding the image
+            index = json.loads(atlas.info[INDEX_KEY])
+            if _is_current(index, sprite_dir, sprites):
+                atlas.load()
+                images = {name: atlas.crop(tuple(index['sprites'][name]['box'])) for name in sprites}
+    except (OSError, KeyError, ValueError):
+        pass
+    if images is None:
+        images = build_atlas(atlas_file, sprite_dir, sprites)
+    _images[atlas_file] = images
+    return images
+
+
+def load_photo_images(root: 'tkinter.Tk') -> Dict[str, 'ImageTk.PhotoImage']:
+    """
+    Returns Tk images of every sprite, made on first use and shared by every window under the root. Tk images belong
+    to the interpreter of one root and cannot be displayed under another.
+    :param root: Tk root the images will be displayed under
+    :return: Sprite name -> Tk image
+    """
+    photo_images = _photo_images.get(root)
+    if photo_images is None:
+        from PIL import ImageTk
+        photo_images = {name: ImageTk.PhotoImage(image, master=root) for name, image in load_images().items()}
+        _photo_images[root] = photo_images
+    return photo_images
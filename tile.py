@@ -9,16 +9,31 @@ class Tile:
     'LUMBER', 'ORE', 'WOOL'}.
     """
 
+    __slots__ = ('q', 'r', 'index', 'resource', 'dice_num', 'vertices', 'robber', 'is_water_tile')
+
     def __init__(self):
         self.q = -1
         self.r = -1
+        # dense id assigned by the board's topology
+        self.index = -1
         self.resource = None
         self.dice_num = -1
         self.vertices = None
         self.robber = False
         self.is_water_tile = False
-        # used for drawing the game
-        self.canvas_pos = None
+
+    def copy(self) -> 'Tile':
+        """
+        Copies the tile, except for its vertices, which belong to the board.
+        """
+        tile = Tile()
+        tile.q, tile.r = self.q, self.r
+        tile.index = self.index
+        tile.resource = self.resource
+        tile.dice_num = self.dice_num
+        tile.robber = self.robber
+        tile.is_water_tile = self.is_water_tile
+        return tile
 
     def __hash__(self):
         return hash((self.q, self.r, self.resource))
@@ -0,0 +1,126 @@
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+import numpy as np
+
+from custom_types import GraphVertex
+
+
+def _csr(num_rows: int, pairs: Sequence[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Builds a compressed sparse row adjacency structure from (row, column) pairs. Columns within a row keep the order in
+    which they were given.
+
+    :param num_rows: Number of rows in the structure.
+    :param pairs: (row, column) pairs.
+    :return: (indptr, indices), where the columns of row i are indices[indptr[i]:indptr[i + 1]].
+    """
+    pairs = np.asarray(pairs, dtype=np.int32).reshape(-1, 2)
+    indptr = np.zeros(num_rows + 1, dtype=np.int32)
+    np.cumsum(np.bincount(pairs[:, 0], minlength=num_rows), out=indptr[1:])
+    # a stable sort keeps the columns of every row in the order given
+    indices = pairs[np.argsort(pairs[:, 0], kind='stable'), 1]
+    return indptr, indices
+
+
+def _rows(indptr: np.ndarray, indices: np.ndarray) -> List[Tuple[int, ...]]:
+    """
+    Unpacks a CSR structure into a list of tuples, which is faster than NumPy slicing for scalar lookups.
+    """
+    flat = indices.tolist()
+    bounds = indptr.tolist()
+    return [tuple(flat[bounds[i]:bounds[i + 1]]) for i in range(len(bounds) - 1)]
+
+
+def _freeze(*arrays: np.ndarray):
+    for arr in arrays:
+        arr.flags.writeable = False
+
+
+class BoardTopology:
+    """
+    Integer-indexed description of how the tiles, vertices and edges of a board fit together.
+
+    Tiles, vertices and edges are assigned dense ids in [0, num_tiles), [0, num_vertices) and [0, num_edges). Adjacency
+    is stored as CSR-style NumPy arrays (for vectorized use) and mirrored as lists of tuples (for scalar lookups on hot
+    paths). The topology only depends on the board size, so it never changes once built.
+    """
+
+    def __init__(self, tile_coords: Sequence[Tuple[int, int]], tile_water: Sequence[bool],
+                 vertex_ids: Sequence[GraphVertex], vertex_on_shore: Sequence[bool],
+                 edge_vertex_ids: Sequence[Tuple[GraphVertex, GraphVertex]], edge_coords: Sequence[Tuple[int, int]],
+                 tile_adjacency: Sequence[Tuple[int, int]]):
+        """
+        :param tile_coords: Axial (q, r) coordinates of every tile, in id order.
+        :param tile_water: Whether each tile is a water tile, in id order.
+        :param vertex_ids: Graph vertex (set of incident tile coordinates) of every vertex, in id order.
+        :param vertex_on_shore: Whether each vertex touches a water tile, in id order.
+        :param edge_vertex_ids: Pair of graph vertices joined by every edge, in id order.
+        :param edge_coords: Edge coordinates of every edge, in id order.
+        :param tile_adjacency: (tile, tile) id pairs for every pair of neighboring tiles, in both directions.
+        """
+        self.num_tiles = len(tile_coords)
+        self.num_vertices = len(vertex_ids)
+        self.num_edges = len(edge_vertex_ids)
+
+        self.tile_index: Dict[Tuple[int, int], int] = {c: i for i, c in enumerate(tile_coords)}
+        self.vertex_index: Dict[GraphVertex, int] = {v: i for i, v in enumerate(vertex_ids)}
+        self.edge_index: Dict[Tuple[int, int], int] = {c: i for i, c in enumerate(edge_coords)}
+        # unordered vertex pair -> edge, the inverse of edge_vertex_ids
+        self.graph_edge_index: Dict[FrozenSet[GraphVertex], int] = {frozenset(pair): i for i, pair in
+                                                                     enumerate(edge_vertex_ids)}
+        self.graph_edges: List[Tuple[GraphVertex, GraphVertex]] = [tuple(pair) for pair in edge_vertex_ids]
+        self.tile_coords = list(tile_coords)
+        self.vertex_ids = list(vertex_ids)
+        self.edge_coords = list(edge_coords)
+
+        self.tile_water = np.array(tile_water, dtype=bool)
+        self.vertex_on_shore = np.array(vertex_on_shore, dtype=bool)
+
+        # edge -> (vertex, vertex)
+        self.edge_vertices = np.array([(self.vertex_index[a], self.vertex_index[b]) for a, b in edge_vertex_ids],
+                                      dtype=np.int32).reshape(-1, 2)
+
+        # vertex -> vertices and vertex -> edges share the same indptr: the kth neighbor is reached via the kth edge
+        vv_pairs, ve_pairs = [], []
+        for e, (a, b) in enumerate(self.edge_vertices.tolist()):
+            vv_pairs.append((a, b))
+            ve_pairs.append((a, e))
+            vv_pairs.append((b, a))
+            ve_pairs.append((b, e))
+        self.vertex_vertex_ptr, self.vertex_vertex_idx = _csr(self.num_vertices, vv_pairs)
+        self.vertex_edge_ptr, self.vertex_edge_idx = _csr(self.num_vertices, ve_pairs)
+
+        # vertex -> tiles and tile -> vertices
+        vt_pairs = []
+        for v, vertex_id in enumerate(vertex_ids):
+            for coords in sorted(vertex_id):
+                vt_pairs.append((v, self.tile_index[coords]))
+        self.vertex_tile_ptr, self.vertex_tile_idx = _csr(self.num_vertices, vt_pairs)
+        self.tile_vertex_ptr, self.tile_vertex_idx = _csr(self.num_tiles, [(t, v) for v, t in vt_pairs])
+
+        # tile -> tiles
+        self.tile_tile_ptr, self.tile_tile_idx = _csr(self.num_tiles, sorted(tile_adjacency))
+
+        _freeze(self.tile_tile_ptr, self.tile_tile_idx, self.tile_water, self.vertex_on_shore, self.edge_vertices,
+                self.vertex_vertex_ptr, self.vertex_vertex_idx, self.vertex_edge_ptr, self.vertex_edge_idx,
+                self.vertex_tile_ptr, self.vertex_tile_idx, self.tile_vertex_ptr, self.tile_vertex_idx)
+
+        # tuple mirrors for scalar lookups
+        self.vertex_vertices = _rows(self.vertex_vertex_ptr, self.vertex_vertex_idx)
+        self.vertex_edges = _rows(self.vertex_edge_ptr, self.vertex_edge_idx)
+        self.vertex_tiles = _rows(self.vertex_tile_ptr, self.vertex_tile_idx)
+        self.tile_vertices = _rows(self.tile_vertex_ptr, self.tile_vertex_idx)
+        self.tile_tiles = _rows(self.tile_tile_ptr, self.tile_tile_idx)
+        self.edge_endpoints: List[Tuple[int, int]] = [tuple(x) for x in self.edge_vertices.tolist()]
+
+    def vertices_are_adjacent(self, v1: int, v2: int) -> bool:
+        return v2 in self.vertex_vertices[v1]
+
+    def edge_between(self, v1: int, v2: int) -> int:
+        """
+        Returns the id of the edge joining two vertices, or -1 if they are not adjacent.
+        """
+        for neighbor, edge in zip(self.vertex_vertices[v1], self.vertex_edges[v1]):
+            if neighbor == v2:
+                return edge
+        return -1
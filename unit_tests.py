@@ -1,6 +1,30 @@
+import os
+import random
+import tempfile
+import time
 import unittest
+from collections import defaultdict
 
-from board import Board
+import numpy as np
+from PIL import Image
+
+from benchmark import BENCHMARKS, CORE_MODULES, compare, time_import
+from board import Board, generate_boards, get_board_template
+from board_generation import PIPS, BoardLayout, generate_layouts, score_layouts
+from constants import ACTION, EVENT, RESOURCE
+from edge import Edge
+from env import VecCatanEnv
+from event_log import EventLog, read_events
+from game import Game
+from game_window import R, board_geometry
+from game_state import TranspositionTable, full_hash, state_bytes
+import instrumentation
+from longest_road import connected_roads, longest_trail
+from mcts import MCTSAgent
+from observation import ObservationEncoder
+from player import Mask, RandomAgent
+from simulate import simulate
+import sprite_cache
 
 
 class TestTileAndEdgeNeighbors(unittest.TestCase):
@@ -62,3 +86,587 @@ class TestTileAndEdgeNeighbors(unittest.TestCase):
                 print("="*50)
                 print('\n')
         self.assertTrue(flag)
+
+
+class TestBoardTopology(unittest.TestCase):
+
+    def test_topology_matches_graph(self):
+        b = Board(3)
+        topology = b.topology
+        self.assertEqual(topology.num_vertices, b.vertex_graph.number_of_nodes())
+        self.assertEqual(topology.num_edges, b.vertex_graph.number_of_edges())
+        for vertex in b.get_vertices():
+            neighbors = {topology.vertex_ids[v] for v in topology.vertex_vertices[vertex.index]}
+            self.assertEqual(neighbors, set(b.vertex_graph.neighbors(vertex.vertex_id)))
+            self.assertEqual({t.coords for t in b.get_tiles_from_vertex(vertex)}, set(vertex.vertex_id))
+            for edge in b.get_edges_from_vertex(vertex):
+                self.assertIn(vertex.index, topology.edge_endpoints[edge.index])
+        for tile in b.get_tiles():
+            self.assertEqual(b.get_vertices_from_tile(tile), tile.vertices)
+
+    def test_edge_index_round_trip(self):
+        b = Board(4)
+        for graph_edge in b.vertex_graph.edges:
+            edge = b.get_edge_from_graph_edge(graph_edge)
+            self.assertEqual(frozenset(b.get_graph_edge_from_edge(edge)), frozenset(graph_edge))
+            self.assertEqual({v.vertex_id for v in b.get_vertices_from_edge(edge)}, set(graph_edge))
+        self.assertIsNone(b.get_graph_edge_from_edge(Edge(0, 0)))
+
+    def test_boards_share_template(self):
+        b1, b2 = Board(3), Board(3)
+        self.assertIs(b1.topology, b2.topology)
+        self.assertIs(b1.vertex_graph, b2.vertex_graph)
+        self.assertIsNot(b1.vertex_list[0], b2.vertex_list[0])
+        self.assertEqual(b1.tile_graph.number_of_nodes(), len(b1.tile_list) + len(b1.vertex_list))
+
+    def test_large_board_counts(self):
+        for n in (1, 6, 15):
+            topology = get_board_template(n).topology
+            self.assertEqual(len(topology.tile_coords), 1 + 3 * n * (n + 1))
+            self.assertEqual(topology.num_vertices, 6 * n * n)
+            self.assertEqual(topology.num_edges, 9 * n * n - 3 * n)
+            self.assertTrue(all(len(tiles) == 3 for tiles in topology.vertex_tiles))
+            self.assertTrue(all(2 <= len(vertices) <= 3 for vertices in topology.vertex_vertices))
+
+
+class TestBoardGeneration(unittest.TestCase):
+
+    def test_no_adjacent_six_or_eight(self):
+        template = get_board_template(4)
+        layouts = generate_layouts(template, 500, np.random.default_rng(0))
+        hot = np.isin(layouts.chits, [6, 8]).astype(int)
+        self.assertFalse(np.any(hot * (hot @ template.land_adjacency.astype(int))))
+        self.assertTrue(np.all((layouts.resources == RESOURCE.DESERT) == (layouts.chits == -1)))
+
+    def test_boards_from_layouts(self):
+        boards = generate_boards(3, 10)
+        for b in boards:
+            self.assertEqual(len(b.get_desert_tiles()), 1)
+            for tile in b.get_tiles():
+                if tile.dice_num in (6, 8):
+                    self.assertFalse({n.dice_num for n in b.get_neighboring_tiles(tile)} & {6, 8})
+
+    def test_scores_match_board(self):
+        template = get_board_template(3)
+        layouts = generate_layouts(template, 20, np.random.default_rng(0))
+        scores = score_layouts(template, layouts)
+        for i in range(20):
+            b = Board(3, layouts.select(i))
+            vertex_pips = [sum(PIPS[chit] for _, chit, _ in tiles) for tiles in b.vertex_production]
+            self.assertAlmostEqual(scores[1][i], np.std(vertex_pips), places=4)
+            pair_tiles = defaultdict(set)
+            for v, pair in template.port_slots.items():
+                pair_tiles[pair, b.vertex_port[v]].update(b.vertex_production[v])
+            port_bias = sum(PIPS[chit] for (_, port), tiles in pair_tiles.items() for _, chit, resource in tiles
+                            if resource == port)
+            self.assertEqual(scores[2][i], port_bias)
+            clusters = sum(n.resource == tile.resource for tile in b.get_tiles() for n in b.get_neighboring_tiles(tile)
+                           if tile.resource not in (RESOURCE.WATER, RESOURCE.DESERT))
+            self.assertEqual(scores[3][i], clusters / 2)
+
+    def test_balanced_board_is_fairer(self):
+        template = get_board_template(3)
+        random_scores = score_layouts(template, generate_layouts(template, 1000, np.random.default_rng(0)))
+        b = Board(3, rng=np.random.default_rng(1), balanced=True)
+        ports = [0] * template.num_port_pairs
+        for v, pair in template.port_slots.items():
+            ports[pair] = b.vertex_port[v]
+        layout = BoardLayout(np.array([[int(b.tile_list[t].resource) for t in template.land_tiles]]),
+                             np.array([[b.tile_list[t].dice_num for t in template.land_tiles]]), np.array([ports]))
+        for balanced, random_score in zip(score_layouts(template, layout), random_scores):
+            self.assertLess(balanced[0], random_score.mean())
+
+
+def naive_production(game: Game, roll: int) -> np.ndarray:
+    res = np.zeros((game.num_players, 5), dtype=np.int64)
+    for tile in game.board.get_tiles_with_chit(roll):
+        if tile.robber:
+            continue
+        for vertex in tile.vertices:
+            if vertex.player_id != -1:
+                res[vertex.player_id, tile.resource] += 2 if vertex.is_city else 1
+    return res
+
+
+class TestProduction(unittest.TestCase):
+
+    def test_production_matches_board(self):
+        random.seed(1)
+        game = Game(seed=1)
+        for player_id in game.setup_turn_order:
+            game.build_settlement(player_id, random.choice(game.get_available_settlement_spots(player_id)))
+        game.is_game_start = False
+        for player in game.get_players():
+            player.give_resource(RESOURCE.GRAIN, 2)
+            player.give_resource(RESOURCE.ORE, 3)
+            game.build_city(player.id, next(iter(game.player_buildings[player.id])))
+        for tile in random.sample(list(game.board.get_tiles()), 5):
+            game.move_robber(tile)
+            for roll in range(2, 13):
+                if roll != 7:
+                    self.assertTrue(np.array_equal(game.production[:, roll], naive_production(game, roll)))
+        before = game.hands.copy()
+        game.hands += game.production[:, 8]
+        self.assertTrue(np.array_equal(game.players[0].resources, game.hands[0]))
+        self.assertTrue(np.array_equal(game.hands - before, naive_production(game, 8)))
+
+
+def simple_path(topology, length: int):
+    """
+    Finds a path of `length` edges through the vertex graph, returned as (vertices, edges).
+    """
+    def extend(vertices, edges):
+        if len(edges) == length:
+            return vertices, edges
+        for w, e in zip(topology.vertex_vertices[vertices[-1]], topology.vertex_edges[vertices[-1]]):
+            if w not in vertices:
+                res = extend(vertices + [w], edges + [e])
+                if res:
+                    return res
+        return None
+    return extend([0], [])
+
+
+class TestLongestRoad(unittest.TestCase):
+
+    def test_chain_split_by_settlement(self):
+        game = Game()
+        vertices, edges = simple_path(game.board.topology, 6)
+        for e in edges:
+            game.build_road(0, game.board.edge_list[e])
+        self.assertEqual(game.longest_road.longest_road(0), 6)
+        self.assertEqual(game.longest_road_holder, 0)
+        self.assertTrue(game.board.check_longest_road(game.board.edge_list[edges[0]], 5))
+        game.build_settlement(1, game.board.vertex_list[vertices[2]])
+        self.assertEqual(game.longest_road.longest_road(0), 4)
+        self.assertEqual(game.longest_road_holder, -1)
+        self.assertFalse(game.board.check_longest_road(game.board.edge_list[edges[0]], 2))
+
+    def test_incremental_matches_scratch(self):
+        random.seed(3)
+        game = Game(seed=3)
+        board = game.board
+        for _ in range(60):
+            player_id = random.randrange(2)
+            if random.random() < 0.2:
+                spots = game.get_available_settlement_spots(player_id)
+                if spots:
+                    game.build_settlement(player_id, random.choice(spots))
+                continue
+            free = [e for e in board.edge_list if e.player_road_id == -1]
+            game.build_road(player_id, random.choice(free))
+            for p in range(2):
+                expected = max((longest_trail(board, p, connected_roads(board, p, e.index))
+                                for e in board.edge_list if e.player_road_id == p), default=0)
+                self.assertEqual(game.longest_road.longest_road(p), expected)
+
+
+class TestLegalPlacements(unittest.TestCase):
+
+    @staticmethod
+    def scan_settlement_spots(game: Game, player_id: int):
+        board = game.board
+        res = set()
+        for vertex in board.get_vertices():
+            if vertex.player_id != -1 or any(n.player_id != -1 for n in board.get_neighboring_vertices(vertex)):
+                continue
+            if game.is_game_start or any(e.player_road_id == player_id for e in board.get_edges_from_vertex(vertex)):
+                res.add(vertex)
+        return res
+
+    @staticmethod
+    def scan_road_spots(game: Game, player_id: int):
+        board = game.board
+        res = set()
+        for edge in board.get_edges():
+            if edge.player_road_id != -1:
+                continue
+            for vertex in board.get_vertices_from_edge(edge):
+                if vertex.player_id == player_id or (vertex.player_id == -1 and any(
+                        e.player_road_id == player_id for e in board.get_edges_from_vertex(vertex) if e != edge)):
+                    res.add(edge)
+        return res
+
+    def test_incremental_matches_scan(self):
+        random.seed(5)
+        game = Game(seed=5)
+        for player_id in game.setup_turn_order:
+            game.build_settlement(player_id, random.choice(game.get_available_settlement_spots(player_id)))
+            game.build_road(player_id, random.choice(game.get_available_road_spots(player_id)))
+        game.is_game_start = False
+        for _ in range(80):
+            player_id = random.randrange(game.num_players)
+            settlement_spots = game.get_available_settlement_spots(player_id)
+            if settlement_spots and game.players[player_id].settlements < 5 and random.random() < 0.3:
+                game.hands[player_id] += 1
+                game.build_settlement(player_id, random.choice(settlement_spots))
+            elif road_spots := game.get_available_road_spots(player_id):
+                game.build_road(player_id, random.choice(road_spots), free=True)
+            for p in range(game.num_players):
+                self.assertEqual(set(game.get_available_settlement_spots(p)), self.scan_settlement_spots(game, p))
+                self.assertEqual(set(game.get_available_road_spots(p)), self.scan_road_spots(game, p))
+
+
+class TestMask(unittest.TestCase):
+
+    def test_masks_match_game(self):
+        random.seed(7)
+        game = Game(seed=7)
+        for player_id in game.setup_turn_order:
+            game.build_settlement(player_id, random.choice(game.get_available_settlement_spots(player_id)))
+            game.build_road(player_id, random.choice(game.get_available_road_spots(player_id)))
+        game.is_game_start = False
+        game.dice_rolled_this_turn = True
+        player = game.players[game.current_turn]
+        mask = Mask(player, game)
+        masks = mask.all_masks()
+        board = game.board
+        self.assertEqual(set(np.flatnonzero(masks['road'])),
+                         {e.index for e in game.get_available_road_spots(player.id)})
+        self.assertEqual(set(np.flatnonzero(masks['city'])), {v.index for v in game.player_buildings[player.id]})
+        self.assertEqual(masks['robber'].sum(), len(game.board.template.land_tiles) - 1)
+        self.assertFalse(masks['action_type'][12])
+
+        player.give_resource(RESOURCE.GRAIN, 2)
+        player.give_resource(RESOURCE.ORE, 4)
+        self.assertTrue(mask.action_type_mask()[12])
+        self.assertTrue(mask.exchange_mask()[RESOURCE.ORE])
+
+        victim = next(p for p in game.players if p.id != player.id)
+        victim.give_resource(RESOURCE.WOOL, 1)
+        victim_vertex = next(iter(game.player_buildings[victim.id]))
+        game.move_robber(board.tile_list[board.topology.vertex_tiles[victim_vertex.index][0]])
+        steal = mask.steal_from_mask()
+        self.assertTrue(steal[victim.id])
+        self.assertFalse(steal[player.id])
+
+
+def game_state(game: Game):
+    """
+    Everything apply_action() can change, in comparable form.
+    """
+    board = game.board
+    return (board.vertex_owner.tolist(), board.vertex_city.tolist(), board.edge_owner.tolist(),
+            [(v.player_id, v.is_city) for v in board.vertex_list], [e.player_road_id for e in board.edge_list],
+            [t.robber for t in board.tile_list], game.hands.tolist(), game.production.tolist(),
+            sorted(game.placements.free_vertices), [sorted(s) for s in game.placements.settlement_spots],
+            [sorted(s) for s in game.placements.road_spots],
+            [game.longest_road.longest_road(p) for p in range(game.num_players)],
+            [p.save_state() for p in game.players], game.legal_actions())
+
+
+class TestCloneAndUndo(unittest.TestCase):
+
+    def test_undo_restores_every_state(self):
+        random.seed(11)
+        game = Game(seed=11)
+        states = [game_state(game)]
+        while game.winner == -1:
+            game.apply_action(random.choice(game.legal_actions()))
+            states.append(game_state(game))
+        while game.journal:
+            game.undo_action()
+            states.pop()
+            self.assertEqual(game_state(game), states[-1])
+
+    def test_clone_is_independent(self):
+        random.seed(12)
+        game = Game(seed=12)
+        for _ in range(60):
+            game.apply_action(random.choice(game.legal_actions()))
+        clone = game.clone()
+        self.assertIs(clone.board.topology, game.board.topology)
+        self.assertEqual(game_state(clone), game_state(game))
+        before = game_state(game)
+        while clone.winner == -1:
+            clone.apply_action(random.choice(clone.legal_actions()))
+        self.assertEqual(game_state(game), before)
+
+
+class TestGameState(unittest.TestCase):
+
+    def test_incremental_hash(self):
+        random.seed(13)
+        game = Game(seed=13)
+        seen = [(game.state_hash, state_bytes(game))]
+        while game.winner == -1:
+            game.apply_action(random.choice(game.legal_actions()))
+            self.assertEqual(game.state_hash, full_hash(game))
+            seen.append((game.state_hash, state_bytes(game)))
+        clone = game.clone()
+        self.assertEqual((clone.state_hash, state_bytes(clone)), seen[-1])
+        while game.journal:
+            game.undo_action()
+            seen.pop()
+            self.assertEqual((game.state_hash, state_bytes(game)), seen[-1])
+
+    def test_transposition_table_evicts_least_recently_used(self):
+        table = TranspositionTable(2)
+        table.put(1, 'a')
+        table.put(2, 'b')
+        self.assertEqual(table.get(1), 'a')
+        table.put(3, 'c')
+        self.assertNotIn(2, table)
+        self.assertIn(1, table)
+        self.assertEqual(len(table), 2)
+        self.assertEqual((table.hits, table.misses), (1, 0))
+
+
+class TestSimulate(unittest.TestCase):
+
+    def test_games_finish(self):
+        for processes in (1, 2):
+            results = list(simulate(4, [RandomAgent] * 4, processes=processes))
+            self.assertEqual(sorted(result.index for result in results), [0, 1, 2, 3])
+            for result in results:
+                if result.winner != -1:
+                    self.assertGreaterEqual(result.victory_points[result.winner], 10)
+
+    def test_seeded_runs_repeat(self):
+        def run(processes):
+            return sorted(result._replace(seconds=0) for result in simulate(6, [RandomAgent] * 4, processes=processes,
+                                                                             seed=19))
+        self.assertEqual(run(1), run(2))
+
+
+class TestImports(unittest.TestCase):
+
+    def test_core_loads_no_gui_or_networkx(self):
+        for module in CORE_MODULES:
+            self.assertEqual(time_import(module)['loaded'], [], module)
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_benchmarks_run(self):
+        for name, setup in BENCHMARKS.items():
+            with self.subTest(name):
+                setup()()
+
+    def test_compare_flags_slowdowns(self):
+        baseline = {'a': {'best': 1.0}, 'b': {'best': 1.0}}
+        results = {'a': {'best': 1.2}, 'b': {'best': 1.5}, 'c': {'best': 9.0}}
+        self.assertEqual(compare(results, baseline, tolerance=0.25), {'b': 1.5})
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_counts_calls_and_unwraps(self):
+        roll = vars(Game)['roll']
+        instrumentation.enable()
+        try:
+            instrumentation.reset()
+            game = Game(agents=[RandomAgent] * 4, seed=21)
+            game.play()
+            snapshot = instrumentation.snapshot()
+        finally:
+            instrumentation.disable()
+        self.assertIs(vars(Game)['roll'], roll)
+        self.assertEqual(snapshot['Game.apply_action']['count'], game.num_actions)
+        self.assertEqual(sum(snapshot['Game.apply_action']['histogram'].values()), game.num_actions)
+        stats = snapshot['Game.legal_actions']
+        self.assertLessEqual(stats['p50'], stats['p99'])
+        merged = instrumentation.merge([snapshot, snapshot])
+        self.assertEqual(merged['Game.roll']['count'], 2 * snapshot['Game.roll']['count'])
+        self.assertEqual(merged['Game.roll']['p90'], snapshot['Game.roll']['p90'])
+
+    def test_simulate_in_process_disables_afterwards(self):
+        roll = vars(Game)['roll']
+        results = list(simulate(2, [RandomAgent] * 4, processes=1, seed=3, instrument=True))
+        self.assertFalse(instrumentation.is_enabled())
+        self.assertIs(vars(Game)['roll'], roll)
+        for result in results:
+            self.assertEqual(result.instrumentation['Game.apply_action']['count'], result.num_actions)
+
+
+class TestBoardGeometry(unittest.TestCase):
+
+    def test_vertices_are_hexagon_corners(self):
+        b = Board(4)
+        geometry = board_geometry(b)
+        topology = b.topology
+        for v, tiles in enumerate(topology.vertex_tiles):
+            for t in tiles:
+                distances = np.linalg.norm(geometry.hexagons[t] - geometry.vertices[v], axis=1)
+                self.assertAlmostEqual(distances.min(), 0)
+        lengths = np.linalg.norm(np.diff(geometry.vertices[topology.edge_vertices], axis=1)[:, 0], axis=1)
+        self.assertTrue(np.allclose(lengths, R))
+
+
+class TestSpriteCache(unittest.TestCase):
+
+    def test_atlas_matches_sources_and_is_reused(self):
+        sprites = {name: sprite_cache.SPRITES[name] for name in ('ore', 'settlement_red')}
+        with tempfile.TemporaryDirectory() as tmp:
+            atlas_file = os.path.join(tmp, 'atlas.png')
+            images = sprite_cache.load_images(atlas_file, sprites=sprites)
+            self.assertIs(sprite_cache.load_images(atlas_file, sprites=sprites), images)
+            # the index is kept inside the atlas
+            self.assertEqual(os.listdir(tmp), ['atlas.png'])
+            with Image.open(atlas_file) as atlas:
+                self.assertIn(sprite_cache.INDEX_KEY, atlas.info)
+            stamp = os.stat(atlas_file).st_mtime_ns
+            # a new process reads the atlas rather than resizing again
+            del sprite_cache._images[atlas_file]
+            reloaded = sprite_cache.load_images(atlas_file, sprites=sprites)
+            self.assertEqual(os.stat(atlas_file).st_mtime_ns, stamp)
+            for name, (source, size) in sprites.items():
+                with Image.open(os.path.join(sprite_cache.SPRITE_DIR, source)) as image:
+                    expected = image.convert('RGBA').resize(size, Image.LANCZOS)
+                self.assertEqual(reloaded[name].tobytes(), expected.tobytes())
+            # changing a display size rebuilds the atlas
+            del sprite_cache._images[atlas_file]
+            sprites['ore'] = (sprites['ore'][0], (16, 16))
+            self.assertEqual(sprite_cache.load_images(atlas_file, sprites=sprites)['ore'].size, (16, 16))
+            del sprite_cache._images[atlas_file]
+
+
+class TestVecCatanEnv(unittest.TestCase):
+
+    def test_masks_match_legal_actions(self):
+        env = VecCatanEnv(8, max_actions=300, seed=15)
+        rng = np.random.default_rng(15)
+        _, infos = env.reset()
+        space = env.action_space
+        for _ in range(400):
+            for game, mask in zip(env.games, infos['action_mask']):
+                self.assertEqual(sorted(space.encode(a) for a in game.legal_actions()), np.flatnonzero(mask).tolist())
+            actions = (rng.random(infos['action_mask'].shape) * infos['action_mask']).argmax(axis=1)
+            _, rewards, dones, truncated, infos = env.step(actions)
+            self.assertTrue(np.all(rewards[~dones] == 0))
+            for i in np.flatnonzero(dones | truncated):
+                self.assertEqual(env.games[i].num_actions, 0)
+
+
+class TestObservationEncoder(unittest.TestCase):
+
+    def test_planes_match_game(self):
+        random.seed(16)
+        game = Game(seed=16)
+        for _ in range(300):
+            game.apply_action(random.choice(game.legal_actions()))
+        encoder = ObservationEncoder(game.board.topology, game.num_players)
+        self.assertIs(encoder.static_planes(game.board), encoder.static_planes(game.board))
+        for player_id in range(game.num_players):
+            planes = encoder.unpack(encoder.encode(game, player_id))
+            seats = [(player_id + i) % game.num_players for i in range(game.num_players)]
+            for column, p in enumerate(seats):
+                vertices = {v.index for v in game.player_buildings[p]}
+                cities = {v.index for v in game.player_buildings[p] if v.is_city}
+                self.assertEqual(set(np.flatnonzero(planes['settlements'][:, column])), vertices - cities)
+                self.assertEqual(set(np.flatnonzero(planes['cities'][:, column])), cities)
+                roads = {e.index for e in game.player_roads[p]}
+                self.assertEqual(set(np.flatnonzero(planes['roads'][:, column])), roads)
+                # only the observer's own hand is shown by resource, the others' as a number of cards
+                hand = game.hands[p].tolist() if p == player_id else [0] * 5
+                self.assertEqual(planes['players'][column, :5].tolist(), hand)
+                self.assertEqual(planes['players'][column, 5], game.hands[p].sum())
+                self.assertEqual(planes['players'][column, 6], game.dev_cards[p].sum())
+            self.assertEqual(np.flatnonzero(planes['robber']).tolist(), [game.robber_tile.index])
+            self.assertEqual(planes['tile_terrain'].sum(), game.board.topology.num_tiles)
+
+
+class TestMCTSAgent(unittest.TestCase):
+
+    def test_search_leaves_game_alone_and_reuses_tree(self):
+        game = Game(agents=(), seed=17)
+        agent = MCTSAgent(game.players[game.current_turn], game, time_budget=None, iterations=30)
+        state_hash = game.state_hash
+        action = agent.take_turn(game.legal_actions())
+        self.assertIn(action, game.legal_actions())
+        self.assertEqual(agent.last_iterations, 30)
+        self.assertEqual(game.state_hash, state_hash)
+        child = agent.root.children[action]
+        visits = child.visits
+        game.apply_action(action)
+        agent.player = game.players[game.current_turn]
+        agent.take_turn(game.legal_actions())
+        self.assertIs(agent.root, child)
+        self.assertEqual(child.visits, visits + 30)
+
+    def test_dice_rolls_are_chance_nodes(self):
+        game = Game(agents=(), seed=17)
+        rng = random.Random(17)
+        while [action.type for action in game.legal_actions()] != [ACTION.ROLL]:
+            game.apply_action(rng.choice(game.legal_actions()))
+        agent = MCTSAgent(game.players[game.current_turn], game, time_budget=None, iterations=50, rollout_depth=10)
+        root = agent.search(game)
+        self.assertTrue(root.is_chance)
+        self.assertLessEqual(set(root.children), set(range(2, 13)))
+        for total, child in root.children.items():
+            self.assertEqual((child.action.type, child.action.target), (ACTION.ROLL, total))
+        self.assertEqual(sum(child.visits for child in root.children.values()), 50)
+
+    def test_time_budget(self):
+        game = Game(agents=(), seed=17)
+        agent = MCTSAgent(game.players[game.current_turn], game, time_budget=0.0)
+        # the budget runs out before the search starts, but one iteration is still run
+        self.assertIn(agent.take_turn(game.legal_actions()), game.legal_actions())
+        self.assertEqual(agent.last_iterations, 1)
+        agent = MCTSAgent(game.players[game.current_turn], game, time_budget=0.2, rollout_depth=10)
+        start = time.perf_counter()
+        agent.take_turn(game.legal_actions())
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+        self.assertGreater(agent.last_iterations, 1)
+
+    def test_root_parallel_search(self):
+        game = Game(agents=(), seed=17)
+        agent = MCTSAgent(game.players[game.current_turn], game, time_budget=None, iterations=10, rollout_depth=10,
+                          processes=2)
+        try:
+            self.assertIn(agent.take_turn(game.legal_actions()), game.legal_actions())
+            self.assertEqual(agent.last_iterations, 20)
+        finally:
+            agent.close()
+
+
+class TestEventLog(unittest.TestCase):
+
+    def test_hands_replay_from_log(self):
+        costs = {EVENT.BUILD_ROAD: [1, 0, 1, 0, 0], EVENT.BUILD_SETTLEMENT: [1, 1, 1, 0, 1],
+                 EVENT.BUILD_CITY: [0, 2, 0, 3, 0]}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.bin')
+            games = []
+            with EventLog(path) as log:
+                for seed in range(2):
+                    game = Game(agents=[RandomAgent] * 4, event_log=log, seed=seed)
+                    game.play()
+                    games.append(game)
+            events = np.concatenate(list(read_events(path, chunk_size=100)))
+            for game_id, game in enumerate(games):
+                records = events[events['game'] == game_id]
+                self.assertEqual(records['kind'][0], EVENT.GAME_START)
+                self.assertEqual(records['kind'][-1], EVENT.WIN)
+                self.assertEqual(records['player'][-1], game.winner)
+                hands = np.zeros_like(game.hands)
+                # the first two settlements and roads of every player are placed for free in setup
+                free_builds = {(p, kind): 2 for p in range(game.num_players)
+                               for kind in (EVENT.BUILD_ROAD, EVENT.BUILD_SETTLEMENT)}
+                for record in records.tolist():
+                    _, _, kind, player, target, extra, resources = record
+                    if player == -1:
+                        continue
+                    hands[player] += resources
+                    if kind == EVENT.STEAL:
+                        hands[player, target] += 1
+                        hands[extra, target] -= 1
+                    elif kind in costs and not (kind == EVENT.BUILD_ROAD and extra == 1):
+                        if free_builds.get((player, kind), 0) > 0:
+                            free_builds[player, kind] -= 1
+                        else:
+                            hands[player] -= costs[kind]
+                np.testing.assert_array_equal(hands, game.hands)
+
+    def test_appending_continues_game_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'events.bin')
+            for run in range(2):
+                with EventLog(path) as log:
+                    for seed in range(2):
+                        Game(agents=[RandomAgent] * 4, event_log=log, seed=2 * run + seed).play()
+            events = np.concatenate(list(read_events(path)))
+            starts = events[events['kind'] == EVENT.GAME_START]
+            self.assertEqual(starts['game'].tolist(), [0, 1, 2, 3])
+            self.assertEqual(np.count_nonzero(events['kind'] == EVENT.WIN), 4)
+
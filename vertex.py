@@ -4,19 +4,28 @@ from custom_types import GraphVertex
 
 
 class Vertex:
+    __slots__ = ('vertex_id', 'index', 'player_id', 'is_city')
 
     def __init__(self, vertex_id: GraphVertex):
         """
         Vertex uniquely identified by coordinates of its incident tiles.
         """
         self.vertex_id = vertex_id
+        # dense id assigned by the board's topology
+        self.index = -1
         self.player_id = -1
         self.is_city = False
-        # used for drawing the game
-        self.canvas_pos = None
 
     def __hash__(self):
         return hash(self.vertex_id)
 
+    def copy(self) -> 'Vertex':
+        vertex = object.__new__(type(self))
+        vertex.vertex_id = self.vertex_id
+        vertex.index = self.index
+        vertex.player_id = self.player_id
+        vertex.is_city = self.is_city
+        return vertex
+
     def upgrade_to_city(self) -> bool:
         self.is_city = True